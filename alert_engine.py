@@ -0,0 +1,260 @@
+"""
+监控告警规则引擎
+采集器每写入一条样本就对适用的规则做一次增量判断，每条 (规则, 服务器) 只在内存中保留有界的滑动窗口，
+不回查历史数据。规则类型：
+- threshold: 当前值超过（低于）阈值
+- sustained: 持续超过（低于）阈值 duration 秒
+- rate: window 秒内的变化速率（每分钟）超过（低于）阈值
+- zscore: 与最近 window 个样本相比的 z 分数绝对值超过阈值（operator 为 > 时只检测突增，< 时只检测突降）
+
+同一 (规则, 服务器) 只在从正常变为告警时触发一次，恢复正常后才能再次触发，且两次触发间隔不少于 cooldown 秒。
+触发的告警由 MetricsWriter 在写入样本的同一事务中生成管理员通知。
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import timezone
+from config import Config
+from models import db, AlertRule, Server, User, Notification
+from event_bus import event_bus, notifications_channel
+
+logger = logging.getLogger(__name__)
+
+ALERT_KINDS = ('threshold', 'sustained', 'rate', 'zscore')
+ALERT_OPERATORS = ('>', '<')
+
+# 可配置告警的指标：样本字段 -> 显示名称和单位
+ALERT_METRICS = {
+    'cpu_usage': ('CPU使用率', '%'),
+    'cpu_iowait': ('CPU iowait', '%'),
+    'memory_usage': ('内存使用率', '%'),
+    'swap_usage': ('交换分区使用率', '%'),
+    'disk_usage': ('磁盘使用率', '%'),
+    'load1': ('1分钟负载', ''),
+    'load5': ('5分钟负载', ''),
+    'load15': ('15分钟负载', ''),
+    'process_count': ('进程数', ''),
+    'net_rx_rate': ('网络接收速率', 'B/s'),
+    'net_tx_rate': ('网络发送速率', 'B/s'),
+    'disk_read_rate': ('磁盘读取速率', 'B/s'),
+    'disk_write_rate': ('磁盘写入速率', 'B/s'),
+    'disk_read_iops': ('磁盘读IOPS', ''),
+    'disk_write_iops': ('磁盘写IOPS', ''),
+}
+
+# 首次启动时创建的默认规则
+DEFAULT_ALERT_RULES = [
+    {'name': '磁盘空间不足', 'metric': 'disk_usage', 'kind': 'threshold', 'operator': '>', 'threshold': 90},
+    {'name': '内存持续紧张', 'metric': 'memory_usage', 'kind': 'sustained', 'operator': '>', 'threshold': 95,
+     'duration': 300},
+    {'name': '磁盘快速写满', 'metric': 'disk_usage', 'kind': 'rate', 'operator': '>', 'threshold': 1,
+     'window': 600},
+    {'name': 'CPU负载异常', 'metric': 'load1', 'kind': 'zscore', 'operator': '>', 'threshold': 4,
+     'window': 120},
+]
+
+
+class RuleState:
+    """单条规则在单台服务器上的滑动窗口和触发状态"""
+
+    def __init__(self, rule):
+        self.signature = rule.signature
+        self.window = deque()  # sustained/rate: (时间, 值)；zscore: 值
+        self.total = 0.0  # zscore 窗口内的和与平方和，增量维护
+        self.total_squares = 0.0
+        self.breach_since = None
+        self.firing = False
+        self.last_fired = None
+
+    def push_value(self, value, max_size):
+        self.window.append(value)
+        self.total += value
+        self.total_squares += value * value
+        if len(self.window) > max_size:
+            old = self.window.popleft()
+            self.total -= old
+            self.total_squares -= old * old
+
+
+class Rule:
+    """从数据库加载的规则快照（引擎在采集线程中使用，不持有ORM对象）"""
+
+    __slots__ = ('id', 'name', 'server_id', 'metric', 'kind', 'operator', 'threshold',
+                 'duration', 'window', 'cooldown', 'signature')
+
+    def __init__(self, rule):
+        self.id = rule.id
+        self.name = rule.name
+        self.server_id = rule.server_id
+        self.metric = rule.metric
+        self.kind = rule.kind
+        self.operator = rule.operator
+        self.threshold = rule.threshold
+        self.duration = rule.duration or 0
+        self.window = rule.window or Config.ALERT_DEFAULT_WINDOW
+        self.cooldown = Config.ALERT_DEFAULT_COOLDOWN if rule.cooldown is None else rule.cooldown
+        # 窗口相关参数变化时重置状态
+        self.signature = (self.metric, self.kind, self.operator, self.threshold, self.duration, self.window)
+
+    def breached(self, value):
+        return value > self.threshold if self.operator == '>' else value < self.threshold
+
+
+class AlertEngine:
+    """进程级告警引擎"""
+
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = refresh_interval or Config.ALERT_RULES_REFRESH_INTERVAL
+        self._rules = []
+        self._states = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def set_rules(self, rules):
+        """替换规则快照，保留参数未变化的规则状态"""
+        with self._lock:
+            self._rules = list(rules)
+            valid = {rule.id: rule.signature for rule in self._rules}
+            self._states = {key: state for key, state in self._states.items()
+                            if valid.get(key[0]) == state.signature}
+            self._loaded_at = time.monotonic()
+
+    def load_rules(self):
+        """从数据库加载启用的规则（需在应用上下文中调用）"""
+        self.set_rules(Rule(rule) for rule in AlertRule.query.filter_by(enabled=True).all())
+
+    def refresh_rules_if_due(self):
+        """规则从未加载、已失效或超过刷新间隔时重新加载（规则可能在其他进程中修改）"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+            self.load_rules()
+
+    def invalidate_rules(self):
+        self._loaded_at = None
+
+    def evaluate(self, server_id, metrics, timestamp):
+        """用一条样本增量判断适用的规则，返回本次触发的告警列表"""
+        now = timestamp.replace(tzinfo=timezone.utc).timestamp()
+        alerts = []
+        with self._lock:
+            for rule in self._rules:
+                if rule.server_id is not None and rule.server_id != server_id:
+                    continue
+                value = metrics.get(rule.metric)
+                if value is None:
+                    continue
+                key = (rule.id, server_id)
+                state = self._states.get(key)
+                if state is None or state.signature != rule.signature:
+                    state = self._states[key] = RuleState(rule)
+
+                detail = self._check(rule, state, float(value), now)
+                if detail is None:
+                    state.firing = False
+                    continue
+                if state.firing:
+                    continue  # 持续告警中，不重复触发
+                state.firing = True
+                if state.last_fired is not None and now - state.last_fired < rule.cooldown:
+                    continue  # 冷却期内，不再通知
+                state.last_fired = now
+                alerts.append({
+                    'rule_id': rule.id,
+                    'rule_name': rule.name,
+                    'server_id': server_id,
+                    'metric': rule.metric,
+                    'value': round(float(value), 2),
+                    'detail': detail,
+                    'timestamp': timestamp
+                })
+        return alerts
+
+    @staticmethod
+    def _check(rule, state, value, now):
+        """判断一条规则，告警时返回描述文字，否则返回 None"""
+        name, unit = ALERT_METRICS.get(rule.metric, (rule.metric, ''))
+        condition = '超过' if rule.operator == '>' else '低于'
+
+        if rule.kind == 'threshold':
+            if rule.breached(value):
+                return f"{name} {value:.2f}{unit}，{condition}阈值 {rule.threshold:g}{unit}"
+            return None
+
+        if rule.kind == 'sustained':
+            if not rule.breached(value):
+                state.breach_since = None
+                return None
+            if state.breach_since is None:
+                state.breach_since = now
+            if now - state.breach_since >= rule.duration:
+                return (f"{name} 持续 {int(now - state.breach_since)} 秒{condition} {rule.threshold:g}{unit}"
+                        f"（当前 {value:.2f}{unit}）")
+            return None
+
+        if rule.kind == 'rate':
+            state.window.append((now, value))
+            while state.window and now - state.window[0][0] > rule.window:
+                state.window.popleft()
+            first_time, first_value = state.window[0]
+            # 窗口内至少覆盖一半时长才计算，避免刚启动时两点相距过近
+            if now - first_time < rule.window / 2:
+                return None
+            per_minute = (value - first_value) / (now - first_time) * 60
+            if rule.breached(per_minute):
+                return f"{name} 变化速率 {per_minute:+.2f}{unit}/分钟，{condition} {rule.threshold:g}{unit}/分钟"
+            return None
+
+        if rule.kind == 'zscore':
+            # 用加入当前值之前的窗口计算均值和标准差
+            count = len(state.window)
+            detail = None
+            if count >= Config.ALERT_ZSCORE_MIN_SAMPLES:
+                mean = state.total / count
+                variance = max(state.total_squares / count - mean * mean, 0.0)
+                std = math.sqrt(variance)
+                if std > 0:
+                    z = (value - mean) / std
+                    if (z > rule.threshold) if rule.operator == '>' else (z < -rule.threshold):
+                        detail = f"{name} {value:.2f}{unit} 偏离最近 {count} 个样本均值 {mean:.2f}{unit}（z={z:+.1f}）"
+            state.push_value(value, rule.window)
+            return detail
+
+        return None
+
+
+# 进程级共享告警引擎
+alert_engine = AlertEngine()
+
+
+def create_alert_notifications(alerts):
+    """为触发的告警给所有管理员创建通知（加入当前会话，由调用方提交），返回 (管理员ID列表, 消息列表)"""
+    if not alerts:
+        return [], []
+    names = dict(db.session.query(Server.id, Server.name).filter(
+        Server.id.in_({alert['server_id'] for alert in alerts})).all())
+    admin_ids = [admin_id for (admin_id,) in db.session.query(User.id).filter_by(role='admin')]
+
+    messages = []
+    for alert in alerts:
+        server_name = names.get(alert['server_id'], f"#{alert['server_id']}")
+        message = f"[告警] 服务器 {server_name} {alert['rule_name']}：{alert['detail']}"[:500]
+        messages.append(message)
+        for admin_id in admin_ids:
+            db.session.add(Notification(admin_id=admin_id, message=message, created_at=alert['timestamp']))
+    return admin_ids, messages
+
+
+def publish_alerts(admin_ids, messages):
+    """事务提交后把告警内容推送给在线的管理员页面"""
+    for admin_id in admin_ids:
+        for message in messages:
+            event_bus.publish(notifications_channel(admin_id), 'alert', {'message': message})
+
+
+def seed_default_alert_rules():
+    """规则表为空时创建默认规则（需在应用上下文中调用，由调用方提交）"""
+    if AlertRule.query.first() is None:
+        for rule in DEFAULT_ALERT_RULES:
+            db.session.add(AlertRule(**rule))
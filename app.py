@@ -1,12 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, Response
+from werkzeug.http import is_resource_modified
 from sqlalchemy.orm import joinedload
-from models import db, User, Server, Application, ApplicationBatch, PermissionType, ServerMetric, Notification
-from server_monitor import collect_all_servers_metrics, get_server_latest_metrics, get_server_metrics_history
+from models import (db, User, Server, Application, ApplicationBatch, PermissionType, ServerMetric, Notification,
+                    AlertRule, ServerMetricRollup, ServerGpuMetric, ServerUserUsage)
+from server_monitor import (get_server_latest_metrics, get_server_metrics_history,
+                            get_server_metrics_last_modified, get_fleet_metrics, parse_load_average,
+                            get_server_gpu_history, get_server_user_usage)
+from metric_downsample import downsample_history, DOWNSAMPLE_METHODS, MIN_DOWNSAMPLE_POINTS
+from metric_stats import get_fleet_stats, SORT_KEYS
+from ssh_pool import ssh_pool
+from metrics_cache import latest_metrics
+from server_health import server_health
+from metric_rollups import backfill_rollups
+from metrics_retention import run_retention, get_retention_stats
+import metrics_archive
+from metrics_scheduler import start_metrics_scheduler, get_latest_sweep, is_local_collector, collect_if_no_collector
+from alert_engine import (alert_engine, seed_default_alert_rules, ALERT_KINDS, ALERT_OPERATORS, ALERT_METRICS)
+from event_bus import (event_bus, format_sse, METRICS_CHANNEL, notifications_channel,
+                       count_unread_notifications, mark_notifications_changed)
 from username_generator import generate_username_for_user, validate_username_format
 from config import Config
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 import logging
+import os
+import time
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -113,6 +131,92 @@ def migrate_database():
         except Exception as e:
             print(f"applications表迁移错误: {e}")
             db.session.rollback()
+        
+        # 检查并添加server_metrics表的(server_id, timestamp)复合索引
+        try:
+            table_exists = db.session.execute(db.text(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='server_metrics'"
+            )).fetchone()
+            if table_exists:
+                result = db.session.execute(db.text("PRAGMA index_list(server_metrics)")).fetchall()
+                metric_indexes = [row[1] for row in result]  # 第二个元素是索引名
+                
+                if 'ix_server_metrics_server_id_timestamp' not in metric_indexes:
+                    print("正在为server_metrics表创建(server_id, timestamp)索引...")
+                    db.session.execute(db.text(
+                        "CREATE INDEX ix_server_metrics_server_id_timestamp ON server_metrics (server_id, timestamp)"
+                    ))
+                    db.session.commit()
+                    print("server_metrics索引创建成功")
+                
+        except Exception as e:
+            print(f"server_metrics表迁移错误: {e}")
+            db.session.rollback()
+        
+        # 检查并添加server_metrics表的数值指标字段，并根据load_average字符串分批回填负载数值
+        try:
+            result = db.session.execute(db.text("PRAGMA table_info(server_metrics)")).fetchall()
+            metric_columns = [row[1] for row in result]
+            
+            if metric_columns:
+                new_columns = [
+                    ('cpu_iowait', 'FLOAT'), ('swap_usage', 'FLOAT'),
+                    ('load1', 'FLOAT'), ('load5', 'FLOAT'), ('load15', 'FLOAT'),
+                    ('process_count', 'INTEGER'), ('uptime_seconds', 'INTEGER'),
+                    ('net_rx_rate', 'FLOAT'), ('net_tx_rate', 'FLOAT'),
+                    ('disk_read_rate', 'FLOAT'), ('disk_write_rate', 'FLOAT'),
+                    ('disk_read_iops', 'FLOAT'), ('disk_write_iops', 'FLOAT')
+                ]
+                for column, column_type in new_columns:
+                    if column not in metric_columns:
+                        print(f"正在添加{column}字段到server_metrics表...")
+                        db.session.execute(db.text(f"ALTER TABLE server_metrics ADD COLUMN {column} {column_type}"))
+                db.session.commit()
+                
+                if 'load1' not in metric_columns:
+                    backfilled = 0
+                    last_id = 0
+                    while True:
+                        rows = db.session.execute(db.text(
+                            "SELECT id, load_average FROM server_metrics "
+                            "WHERE id > :last_id AND load1 IS NULL AND load_average IS NOT NULL "
+                            "ORDER BY id LIMIT :batch_size"
+                        ), {'last_id': last_id, 'batch_size': Config.METRICS_BACKFILL_BATCH_SIZE}).fetchall()
+                        if not rows:
+                            break
+                        last_id = rows[-1][0]
+                        updates = []
+                        for metric_id, load_average in rows:
+                            load1, load5, load15 = parse_load_average(load_average)
+                            if load1 is not None:
+                                updates.append({'id': metric_id, 'load1': load1, 'load5': load5, 'load15': load15})
+                        if updates:
+                            db.session.execute(db.text(
+                                "UPDATE server_metrics SET load1 = :load1, load5 = :load5, load15 = :load15 WHERE id = :id"
+                            ), updates)
+                        # 每批单独提交，避免长时间持有写锁
+                        db.session.commit()
+                        backfilled += len(updates)
+                    print(f"server_metrics负载数值回填完成，共 {backfilled} 行")
+                
+        except Exception as e:
+            print(f"server_metrics字段迁移错误: {e}")
+            db.session.rollback()
+        
+        # 启用增量VACUUM，清理过期监控数据后可以分批归还空闲页（已有数据库需要执行一次完整VACUUM才能切换）
+        try:
+            auto_vacuum = db.session.execute(db.text("PRAGMA auto_vacuum")).scalar()
+            if auto_vacuum != 2:
+                print("正在启用增量VACUUM...")
+                db.session.commit()
+                with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.execute(db.text("PRAGMA auto_vacuum = INCREMENTAL"))
+                    conn.execute(db.text("VACUUM"))
+                print("增量VACUUM启用成功")
+                
+        except Exception as e:
+            print(f"启用增量VACUUM错误: {e}")
+            db.session.rollback()
 
 def create_tables():
     """创建数据库表"""
@@ -123,6 +227,18 @@ def create_tables():
         # 创建所有表
         db.create_all()
         
+        # 新建的降采样汇总表根据已有监控数据回填
+        try:
+            backfilled = backfill_rollups()
+            if backfilled:
+                print(f"已根据历史监控数据生成 {backfilled} 个汇总桶")
+        except Exception as e:
+            print(f"监控数据汇总回填错误: {e}")
+            db.session.rollback()
+        
+        # 创建默认告警规则
+        seed_default_alert_rules()
+        
         # 创建默认管理员用户
         admin = User.query.filter_by(username='admin').first()
         if not admin:
@@ -347,17 +463,117 @@ def dashboard():
 @app.route('/api/server_metrics/<int:server_id>')
 @login_required
 def api_server_metrics(server_id):
-    """获取服务器实时监控数据API"""
+    """获取服务器实时监控数据API（优先读取采集器发布的进程内缓存）"""
     metrics = get_server_latest_metrics(server_id)
     return jsonify(metrics) if metrics else jsonify({})
 
+@app.route('/api/fleet_metrics')
+@login_required
+def api_fleet_metrics():
+    """批量获取服务器最新监控数据和状态API，ids 参数（逗号分隔）可只返回指定服务器"""
+    ids = request.args.get('ids', '')
+    try:
+        server_ids = [int(i) for i in ids.split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'success': False, 'message': f'无效的服务器ID: {ids}'}), 400
+    return jsonify(get_fleet_metrics(server_ids or None))
+
+@app.route('/api/fleet_stats')
+@admin_required
+def api_fleet_stats():
+    """服务器群统计API：时间窗口内每台服务器及整体的 CPU/内存/磁盘 平均值、P50、P95、最大值
+
+    参数: hours（默认24，不超过原始数据保留期）、sort（如 cpu_p95、memory_max、samples、name）、
+    order（asc/desc，按名称默认升序，其余默认降序）、limit（正整数）、ids
+    """
+    hours = request.args.get('hours', 24, type=float)
+    sort = request.args.get('sort', 'cpu_p95')
+    order = request.args.get('order', 'asc' if sort == 'name' else 'desc')
+    limit = request.args.get('limit', type=int)
+    if not hours > 0:
+        return jsonify({'success': False, 'message': 'hours 必须大于0'}), 400
+    if limit is not None and limit < 1:
+        return jsonify({'success': False, 'message': 'limit 必须大于0'}), 400
+    # 统计只读取原始数据，超过原始数据保留期的窗口按保留期计算
+    hours = min(hours, Config.METRICS_RAW_RETENTION_DAYS * 24)
+    if sort not in SORT_KEYS:
+        return jsonify({'success': False, 'message': f'不支持的排序字段: {sort}'}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'success': False, 'message': f'不支持的排序方向: {order}'}), 400
+    ids = request.args.get('ids', '')
+    try:
+        server_ids = [int(i) for i in ids.split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'success': False, 'message': f'无效的服务器ID: {ids}'}), 400
+    return jsonify(get_fleet_stats(hours, server_ids or None, sort, order == 'desc', limit))
+
 @app.route('/api/server_metrics_history/<int:server_id>')
 @login_required
 def api_server_metrics_history(server_id):
     """获取服务器历史监控数据API"""
     hours = request.args.get('hours', 24, type=int)
-    metrics = get_server_metrics_history(server_id, hours)
-    return jsonify(metrics)
+    points = request.args.get('points', type=int)
+    # max_points: 图表最多绘制的点数，超出时在服务端降采样（lttb 保留曲线形状，avg 按桶平均）
+    max_points = request.args.get('max_points', type=int)
+    method = request.args.get('method', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'success': False, 'message': f'不支持的降采样方法: {method}'}), 400
+    if max_points is not None and max_points < MIN_DOWNSAMPLE_POINTS:
+        return jsonify({'success': False, 'message': f'max_points 不能少于 {MIN_DOWNSAMPLE_POINTS}'}), 400
+    
+    # since: 上次返回的最后一个时间戳，只返回之后的新数据，图表据此追加数据点
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since.replace('Z', '+00:00'))
+        except ValueError:
+            return jsonify({'success': False, 'message': f'无效的since时间: {since}'}), 400
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    # ETag 只由查询窗口和最新数据时间决定（与 since 无关），没有新数据时增量请求直接返回 304
+    last_modified = get_server_metrics_last_modified(server_id)
+    etag = f'{server_id}-{hours}-{points}-{max_points}-{method}-{last_modified.isoformat() if last_modified else None}'
+    last_modified = last_modified.replace(tzinfo=timezone.utc) if last_modified else None
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = app.response_class(status=304)
+    else:
+        metrics = get_server_metrics_history(server_id, hours, points or max_points, since)
+        if max_points:
+            metrics = downsample_history(metrics, max_points, method)
+        response = jsonify(metrics)
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/server_gpu_history/<int:server_id>')
+@login_required
+def api_server_gpu_history(server_id):
+    """获取服务器每块GPU的历史监控数据API（max_points 按利用率曲线降采样）"""
+    hours = request.args.get('hours', 24, type=int)
+    max_points = request.args.get('max_points', type=int)
+    method = request.args.get('method', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'success': False, 'message': f'不支持的降采样方法: {method}'}), 400
+    if max_points is not None and max_points < MIN_DOWNSAMPLE_POINTS:
+        return jsonify({'success': False, 'message': f'max_points 不能少于 {MIN_DOWNSAMPLE_POINTS}'}), 400
+    
+    history = get_server_gpu_history(server_id, hours)
+    if max_points:
+        history = {index: downsample_history(points, max_points, method, field='utilization')
+                   for index, points in history.items()}
+    return jsonify({'server_id': server_id, 'hours': hours, 'gpus': history})
+
+@app.route('/api/server_user_usage/<int:server_id>')
+@admin_required
+def api_server_user_usage(server_id):
+    """获取服务器最近一次采样中资源占用最多的账户及其对应的系统用户（需启用 MONITOR_USER_ACCOUNTING）"""
+    Server.query.get_or_404(server_id)
+    usage = get_server_user_usage(server_id)
+    usage['enabled'] = Config.MONITOR_USER_ACCOUNTING
+    return jsonify(usage)
 
 @app.route('/api/test_connection/<int:server_id>')
 @admin_required
@@ -369,18 +585,24 @@ def api_test_connection(server_id):
         from server_monitor import ServerMonitor
         monitor = ServerMonitor(server)
         
-        # 尝试连接服务器
+        # 尝试连接服务器（熔断中的服务器会被直接短路）
         if monitor.connect():
             message = f'连接到服务器 {server.name} 成功'
             monitor.disconnect()
+            server.status = 'online'
+            db.session.commit()
             return jsonify({
                 'success': True,
                 'message': message
             })
         else:
+            server.status = 'offline'
+            db.session.commit()
             return jsonify({
                 'success': False,
-                'error': f'无法连接到服务器 {server.name}，请检查网络连接和SSH配置'
+                'error': f'无法连接到服务器 {server.name}，请检查网络连接和SSH配置',
+                'detail': monitor.last_error,
+                'circuit': server_health.status(server.id)
             })
     except Exception as e:
         return jsonify({
@@ -501,9 +723,108 @@ def api_retrieve_server_info(server_id):
 @app.route('/api/collect_metrics')
 @admin_required
 def api_collect_metrics():
-    """手动触发监控数据收集API"""
-    results = collect_all_servers_metrics()
-    return jsonify(results)
+    """获取最近一次监控采集结果API，未启用后台采集且没有独立采集进程时手动触发采集"""
+    if Config.MONITOR_SCHEDULER_ENABLED:
+        return jsonify(get_latest_sweep())
+    return jsonify(collect_if_no_collector(app))
+
+@app.route('/api/metrics_retention', methods=['GET', 'POST'])
+@admin_required
+def api_metrics_retention():
+    """监控数据保留策略、归档和清理统计API，POST 立即执行一次归档和清理"""
+    if request.method == 'POST':
+        run_retention()
+    return jsonify(get_retention_stats())
+
+@app.route('/api/ssh_pool_stats')
+@admin_required
+def api_ssh_pool_stats():
+    """SSH连接池和私钥缓存统计API"""
+    return jsonify(ssh_pool.stats())
+
+def _apply_alert_rule(rule, data):
+    """用请求JSON更新告警规则，参数无效时返回错误信息"""
+    if 'name' in data:
+        rule.name = (data['name'] or '').strip()
+    if 'metric' in data:
+        rule.metric = data['metric']
+    if 'kind' in data:
+        rule.kind = data['kind']
+    if 'operator' in data:
+        rule.operator = data['operator']
+    if 'enabled' in data:
+        rule.enabled = bool(data['enabled'])
+    if 'server_id' in data:
+        rule.server_id = data['server_id'] or None
+        if rule.server_id is not None and not Server.query.get(rule.server_id):
+            return f'服务器不存在: {rule.server_id}'
+    try:
+        if 'threshold' in data:
+            rule.threshold = float(data['threshold'])
+        for field in ('duration', 'window', 'cooldown'):
+            if field in data:
+                setattr(rule, field, None if data[field] in (None, '') else int(data[field]))
+    except (TypeError, ValueError):
+        return '阈值、持续时间、窗口和冷却时间必须是数字'
+    
+    if not rule.name:
+        return '请填写规则名称'
+    if rule.metric not in ALERT_METRICS:
+        return f'不支持的指标: {rule.metric}'
+    if rule.kind not in ALERT_KINDS:
+        return f'不支持的规则类型: {rule.kind}'
+    if rule.operator not in ALERT_OPERATORS:
+        return f'不支持的比较方式: {rule.operator}'
+    if rule.threshold is None:
+        return '请填写阈值'
+    if rule.kind == 'sustained' and not rule.duration:
+        return '持续告警规则需要填写持续时间'
+    if any(value is not None and value < 0 for value in (rule.duration, rule.window, rule.cooldown)):
+        return '持续时间、窗口和冷却时间不能为负数'
+    if rule.kind == 'zscore' and (rule.window or Config.ALERT_DEFAULT_WINDOW) < Config.ALERT_ZSCORE_MIN_SAMPLES:
+        return f'Z分数规则的窗口至少需要 {Config.ALERT_ZSCORE_MIN_SAMPLES} 个样本'
+    return None
+
+@app.route('/api/alert_rules', methods=['GET', 'POST'])
+@admin_required
+def api_alert_rules():
+    """告警规则列表和创建API"""
+    if request.method == 'POST':
+        rule = AlertRule(operator='>', kind='threshold', enabled=True)
+        error = _apply_alert_rule(rule, request.get_json(silent=True) or {})
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        db.session.add(rule)
+        db.session.commit()
+        alert_engine.invalidate_rules()
+        return jsonify({'success': True, 'rule': rule.to_dict()})
+    
+    rules = AlertRule.query.order_by(AlertRule.id).all()
+    return jsonify({
+        'rules': [rule.to_dict() for rule in rules],
+        'metrics': {metric: name for metric, (name, _) in ALERT_METRICS.items()},
+        'kinds': list(ALERT_KINDS),
+        'enabled': Config.ALERT_ENABLED
+    })
+
+@app.route('/api/alert_rules/<int:rule_id>', methods=['PUT', 'DELETE'])
+@admin_required
+def api_alert_rule(rule_id):
+    """修改或删除告警规则API"""
+    rule = AlertRule.query.get_or_404(rule_id)
+    if request.method == 'DELETE':
+        db.session.delete(rule)
+        db.session.commit()
+        alert_engine.invalidate_rules()
+        return jsonify({'success': True})
+    
+    error = _apply_alert_rule(rule, request.get_json(silent=True) or {})
+    if error:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': error}), 400
+    db.session.commit()
+    alert_engine.invalidate_rules()
+    return jsonify({'success': True, 'rule': rule.to_dict()})
 
 @app.route('/apply', methods=['GET', 'POST'])
 @login_required
@@ -777,8 +1098,9 @@ def admin_review():
         
         batches_json.append(batch_dict)
     
-    # 标记通知为已读
+    # 标记通知为已读（批量UPDATE不经过flush，手动登记以便提交后推送未读数）
     Notification.query.filter_by(admin_id=session['user_id'], is_read=False).update({'is_read': True})
+    mark_notifications_changed(db.session, [session['user_id']])
     db.session.commit()
     
     return render_template('admin_review.html', 
@@ -1104,6 +1426,9 @@ def admin_servers():
             server.system_arch = request.form.get('system_arch', '')
                 
             db.session.commit()
+            # 连接参数可能已修改，关闭连接池中的旧连接并清除缓存的监控数据
+            ssh_pool.invalidate(server.id)
+            latest_metrics.invalidate(server.id)
             flash('服务器信息更新成功', 'success')
             
         elif action == 'delete':
@@ -1116,8 +1441,16 @@ def admin_servers():
             if applications_count > 0:
                 flash(f'无法删除服务器，存在 {applications_count} 个相关申请记录', 'warning')
             else:
+                AlertRule.query.filter_by(server_id=server.id).delete()
+                ServerMetric.query.filter_by(server_id=server.id).delete()
+                ServerMetricRollup.query.filter_by(server_id=server.id).delete()
+                ServerGpuMetric.query.filter_by(server_id=server.id).delete()
+                ServerUserUsage.query.filter_by(server_id=server.id).delete()
                 db.session.delete(server)
                 db.session.commit()
+                metrics_archive.remove_server(server.id)
+                ssh_pool.invalidate(server.id)
+                latest_metrics.invalidate(server.id)
                 flash('服务器删除成功', 'success')
         
         return redirect(url_for('admin_servers'))
@@ -1885,6 +2218,65 @@ def api_notifications():
         return jsonify({'unread_count': unread_count})
     return jsonify({'unread_count': 0})
 
+@app.route('/api/events')
+@login_required
+def api_events():
+    """Server-Sent Events 推送API
+
+    管理员订阅未读通知数；channels 参数包含 metrics 时同时订阅监控样本。
+    连接建立时先推送一次当前状态，之后只在有变化时推送，每 SSE_HEARTBEAT_INTERVAL 秒发送一次心跳。
+    每条连接占用一个 worker 线程：连接最长保持 SSE_MAX_LIFETIME 秒后结束（浏览器按 retry 自动重连），
+    本进程已有 SSE_MAX_CONNECTIONS 条连接时返回 204，页面回退为轮询
+    """
+    user = User.query.get(session['user_id'])
+    channels = set()
+    hello = {'metrics_push': False, 'alerts_push': False}
+    unread_count = None
+    if user.is_admin():
+        channels.add(notifications_channel(user.id))
+        unread_count = count_unread_notifications([user.id])[user.id]
+        # 告警通知由采集进程写入，采集在其他进程运行时本进程收不到告警，页面需要继续轮询通知
+        hello['alerts_push'] = is_local_collector()
+        if 'metrics' in request.args.get('channels', '').split(','):
+            channels.add(METRICS_CHANNEL)
+            # 采集在其他进程运行时本进程收不到样本，页面需要继续轮询
+            hello['metrics_push'] = is_local_collector()
+    if not channels:
+        # 没有可订阅的内容，204 让浏览器不再重连
+        return Response(status=204)
+    # 流式响应期间不占用数据库连接
+    db.session.remove()
+    
+    subscription = event_bus.subscribe(channels, limit=Config.SSE_MAX_CONNECTIONS)
+    if subscription is None:
+        # 推送连接数已满，204 让浏览器不再重连，页面回退为轮询
+        return Response(status=204)
+    
+    def stream():
+        try:
+            yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+            yield format_sse('hello', hello)
+            if unread_count is not None:
+                yield format_sse('notifications', {'unread_count': unread_count})
+            # 到期后结束响应，释放 worker 线程，浏览器在 retry 之后重新连接
+            closes_at = time.monotonic() + Config.SSE_MAX_LIFETIME
+            while True:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                item = subscription.get(timeout=min(Config.SSE_HEARTBEAT_INTERVAL, remaining))
+                if item is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(*item)
+        finally:
+            subscription.close()
+    
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/generate_username', methods=['POST'])
 @login_required
 @admin_required
@@ -2126,4 +2518,7 @@ def api_generate_batch_usernames():
 
 if __name__ == '__main__':
     create_tables()
+    # debug模式下只在重载器的子进程中启动后台采集
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_metrics_scheduler(app)
     app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
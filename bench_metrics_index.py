@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+server_metrics 复合索引基准测试
+在临时SQLite数据库中生成监控数据，对比创建 (server_id, timestamp) 索引前后
+最新数据查询和历史范围查询的耗时
+
+用法: python bench_metrics_index.py [行数] [服务器数]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 与 get_server_latest_metrics / get_server_metrics_history 生成的SQL一致
+LATEST_SQL = """
+SELECT cpu_usage, memory_usage, disk_usage, load_average, timestamp
+FROM server_metrics WHERE server_id = ? ORDER BY timestamp DESC LIMIT 1
+"""
+HISTORY_SQL = """
+SELECT cpu_usage, memory_usage, disk_usage, timestamp
+FROM server_metrics WHERE server_id = ? AND timestamp >= ? ORDER BY timestamp
+"""
+
+
+def populate(conn, rows, servers, interval_seconds=30):
+    """按每台服务器每 interval_seconds 一条的频率生成 rows 条监控数据"""
+    conn.execute("""
+        CREATE TABLE server_metrics (
+            id INTEGER PRIMARY KEY,
+            server_id INTEGER NOT NULL,
+            cpu_usage FLOAT,
+            memory_usage FLOAT,
+            disk_usage FLOAT,
+            load_average VARCHAR(50),
+            timestamp DATETIME
+        )
+    """)
+    per_server = rows // servers
+    end = datetime(2026, 1, 1)
+    start = end - timedelta(seconds=per_server * interval_seconds)
+
+    def generate():
+        for i in range(per_server):
+            ts = (start + timedelta(seconds=i * interval_seconds)).strftime('%Y-%m-%d %H:%M:%S.%f')
+            for server_id in range(1, servers + 1):
+                yield (server_id, (i * 7 + server_id) % 100, 50.0, 40.0, '0.10, 0.20, 0.30', ts)
+
+    conn.executemany(
+        "INSERT INTO server_metrics (server_id, cpu_usage, memory_usage, disk_usage, load_average, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?)", generate())
+    conn.commit()
+    return end
+
+
+def time_query(conn, sql, params, repeat):
+    """返回多次执行的平均耗时（毫秒）和结果行数"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        count = len(conn.execute(sql, params).fetchall())
+    return (time.perf_counter() - started) / repeat * 1000, count
+
+
+def run_queries(conn, end, servers):
+    since = (end - timedelta(hours=12)).strftime('%Y-%m-%d %H:%M:%S.%f')
+    server_id = servers // 2 or 1
+    latest_ms, _ = time_query(conn, LATEST_SQL, (server_id,), repeat=5)
+    history_ms, history_rows = time_query(conn, HISTORY_SQL, (server_id, since), repeat=5)
+    return latest_ms, history_ms, history_rows
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    servers = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = sqlite3.connect(os.path.join(tmpdir, 'bench.db'))
+
+        print(f"📊 生成 {rows} 行监控数据（{servers} 台服务器）...")
+        started = time.perf_counter()
+        end = populate(conn, rows, servers)
+        print(f"   耗时 {time.perf_counter() - started:.1f}s")
+
+        before = run_queries(conn, end, servers)
+
+        started = time.perf_counter()
+        conn.execute("CREATE INDEX ix_server_metrics_server_id_timestamp ON server_metrics (server_id, timestamp)")
+        conn.commit()
+        print(f"   创建索引耗时 {time.perf_counter() - started:.1f}s")
+
+        after = run_queries(conn, end, servers)
+        conn.close()
+
+    print(f"\n{'查询':<28}{'无索引(ms)':>12}{'有索引(ms)':>12}{'加速':>10}")
+    print("-" * 62)
+    print(f"{'最新数据 (LIMIT 1)':<28}{before[0]:>12.2f}{after[0]:>12.2f}{before[0] / after[0]:>9.0f}x")
+    print(f"{f'12小时历史 ({after[2]}行)':<28}{before[1]:>12.2f}{after[1]:>12.2f}{before[1] / after[1]:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
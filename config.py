@@ -8,8 +8,88 @@ class Config:
     # SSH连接超时设置
     SSH_TIMEOUT = 10
     
+    # SSH连接池设置：空闲连接回收时间和keepalive间隔（秒）
+    SSH_POOL_IDLE_TIMEOUT = 300
+    SSH_KEEPALIVE_INTERVAL = 30
+    
+    # SSH连接熔断：连续失败次数阈值、首次退避时间和最大退避时间（秒）
+    SSH_BREAKER_FAILURE_THRESHOLD = 2
+    SSH_BREAKER_BASE_BACKOFF = 30
+    SSH_BREAKER_MAX_BACKOFF = 600
+    
+    # 服务器软硬件信息采集脚本的超时时间（秒）
+    INVENTORY_TIMEOUT = 60
+    
     # 监控数据刷新间隔（秒）
     MONITOR_REFRESH_INTERVAL = 30
     
+    # 后台采集调度：是否启用、每台服务器的采集时间抖动比例、采集进程锁文件（默认在instance目录）
+    MONITOR_SCHEDULER_ENABLED = os.environ.get('MONITOR_SCHEDULER_ENABLED', '1') != '0'
+    MONITOR_JITTER_RATIO = 0.1
+    MONITOR_LOCK_FILE = os.environ.get('MONITOR_LOCK_FILE')
+    
+    # 流式采集：这些服务器（ID，逗号分隔）改为在持久通道上按 MONITOR_STREAM_INTERVAL 秒持续采样
+    MONITOR_STREAM_SERVER_IDS = [int(i) for i in os.environ.get('MONITOR_STREAM_SERVER_IDS', '').split(',') if i.strip()]
+    MONITOR_STREAM_INTERVAL = 5
+    
+    # 并发采集设置：最大线程数、单台服务器超时和整轮采集超时（秒）
+    MONITOR_MAX_WORKERS = 16
+    MONITOR_HOST_TIMEOUT = 15
+    MONITOR_SWEEP_TIMEOUT = 30
+    
+    # 监控数据批量写入：累积样本数或时间窗口（秒）达到任一阈值时写入数据库
+    MONITOR_WRITE_FLUSH_SIZE = 200
+    MONITOR_WRITE_FLUSH_INTERVAL = 10
+    
+    # 最新监控数据缓存：采集器发布的数据有效期（秒），过期后回退到数据库
+    METRICS_CACHE_MAX_AGE = MONITOR_REFRESH_INTERVAL * 3
+    
+    # Server-Sent Events 推送：心跳间隔（秒）和断线后浏览器重连等待（毫秒）
+    SSE_HEARTBEAT_INTERVAL = 15
+    SSE_RETRY_MS = 5000
+    # 每条推送连接都占用一个 worker 线程：单条连接最长保持时间（秒，到期后浏览器自动重连），
+    # 以及每个进程的最大推送连接数（超出时返回204，页面回退为轮询）；应小于 WSGI 服务器的线程数
+    SSE_MAX_LIFETIME = int(os.environ.get('SSE_MAX_LIFETIME', 300))
+    SSE_MAX_CONNECTIONS = int(os.environ.get('SSE_MAX_CONNECTIONS', 2))
+    
+    # 监控数据降采样汇总粒度（秒）和历史查询默认期望点数
+    METRICS_ROLLUP_RESOLUTIONS = [60, 300, 3600]
+    METRICS_HISTORY_TARGET_POINTS = 300
+    
+    # 监控数据保留策略：原始数据和各汇总粒度（秒 -> 天）的保留天数
+    METRICS_RAW_RETENTION_DAYS = int(os.environ.get('METRICS_RAW_RETENTION_DAYS', 7))
+    METRICS_ROLLUP_RETENTION_DAYS = {60: 30, 300: 180, 3600: 730}
+    
+    # 过期数据清理：执行间隔（秒）、每批删除行数、批次间暂停（秒）和每批增量VACUUM归还的页数
+    METRICS_PURGE_INTERVAL = 3600
+    METRICS_PURGE_CHUNK_SIZE = 2000
+    METRICS_PURGE_CHUNK_PAUSE = 0.05
+    METRICS_VACUUM_PAGES = 1000
+    
+    # 数据库迁移回填监控数据时每批处理的行数
+    METRICS_BACKFILL_BATCH_SIZE = 5000
+    
+    # 原始数据列式归档：是否启用、归档目录（默认在instance目录）、数据库中保留的天数（不少于原始数据保留天数）和归档文件保留天数
+    METRICS_ARCHIVE_ENABLED = os.environ.get('METRICS_ARCHIVE_ENABLED', '1') != '0'
+    METRICS_ARCHIVE_DIR = os.environ.get('METRICS_ARCHIVE_DIR')
+    METRICS_ARCHIVE_AFTER_DAYS = METRICS_RAW_RETENTION_DAYS
+    METRICS_ARCHIVE_RETENTION_DAYS = 365
+    
+    # 按用户统计资源占用：是否在采集脚本中读取进程列表（环境变量 MONITOR_USER_ACCOUNTING=1 启用）和每次保存的用户数
+    MONITOR_USER_ACCOUNTING = os.environ.get('MONITOR_USER_ACCOUNTING', '0') == '1'
+    MONITOR_USER_TOP_N = 5
+    
+    # 告警规则引擎：是否启用（环境变量 ALERT_ENABLED=0 关闭）、规则重新加载间隔（秒）、默认通知冷却时间（秒）、
+    # 未指定 window 时的默认窗口（rate 为秒数，zscore 为样本数）和 zscore 规则开始判断前需要的最少样本数
+    ALERT_ENABLED = os.environ.get('ALERT_ENABLED', '1') != '0'
+    ALERT_RULES_REFRESH_INTERVAL = 60
+    ALERT_DEFAULT_COOLDOWN = 3600
+    ALERT_DEFAULT_WINDOW = 60
+    ALERT_ZSCORE_MIN_SAMPLES = 10
+    
+    # GPU空闲判定：利用率（%）和显存占用比例（%）都低于阈值的GPU视为空闲
+    GPU_FREE_UTILIZATION = 10
+    GPU_FREE_MEMORY_PERCENT = 10
+    
     # 分页设置
     APPLICATIONS_PER_PAGE = 20
\ No newline at end of file
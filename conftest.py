@@ -0,0 +1,32 @@
+"""
+pytest 公共配置
+需要数据库的测试使用临时 SQLite 数据库和临时归档目录，不启动后台采集；必须在导入 config 之前设置环境变量
+"""
+import os
+import tempfile
+import pytest
+
+_test_dir = tempfile.mkdtemp(prefix='server-manager-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_test_dir, 'test.db')
+os.environ['METRICS_ARCHIVE_DIR'] = os.path.join(_test_dir, 'metrics_archive')
+os.environ['MONITOR_SCHEDULER_ENABLED'] = '0'
+
+# 采集脚本的基本输出段（/proc/stat、/proc/meminfo、/proc/loadavg、df），各测试在后面追加自己的段
+PROBE_OUTPUT = """@@stat
+cpu  100 0 100 800 0 0 0 0 0 0
+@@meminfo
+MemTotal:       16000000 kB
+MemAvailable:    8000000 kB
+SwapTotal:             0 kB
+SwapFree:              0 kB
+@@loadavg
+0.50 0.40 0.30 1/200 12345
+@@df
+/dev/sda1 100000 40000 60000 40% /
+"""
+
+
+@pytest.fixture
+def probe_output():
+    """预先录制的采集脚本输出"""
+    return PROBE_OUTPUT
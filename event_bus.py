@@ -0,0 +1,158 @@
+"""
+进程内事件发布/订阅模块
+采集器发布监控样本，通知表的增删改在事务提交后发布未读通知数；
+/api/events 为每个浏览器连接订阅需要的频道，通过 Server-Sent Events 推送，页面不再定时轮询。
+"""
+
+import json
+import logging
+import queue
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, Notification
+
+logger = logging.getLogger(__name__)
+
+METRICS_CHANNEL = 'metrics'
+
+
+def notifications_channel(admin_id):
+    return f'notifications:{admin_id}'
+
+
+class Subscription:
+    """单个连接的事件队列，消费过慢时丢弃新事件（监控数据会被下一条样本覆盖）"""
+
+    def __init__(self, bus, channels, max_size=100):
+        self.bus = bus
+        self.channels = set(channels)
+        self.queue = queue.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout):
+        """等待下一条事件 (event, data)，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """进程级事件总线"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, limit=None):
+        """订阅频道；已有 limit 个连接时返回 None"""
+        subscription = Subscription(self, channels)
+        with self._lock:
+            if limit is not None and len(self._subscriptions) >= limit:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def has_subscribers(self, channel):
+        with self._lock:
+            return any(channel in subscription.channels for subscription in self._subscriptions)
+
+    def publish(self, channel, event_name, data):
+        """向订阅了 channel 的所有连接发布事件，返回接收的连接数"""
+        with self._lock:
+            targets = [s for s in self._subscriptions if channel in s.channels]
+        for subscription in targets:
+            subscription.put((event_name, data))
+        return len(targets)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+def format_sse(event_name, data):
+    """编码为一条 SSE 消息"""
+    return f"event: {event_name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# 进程级共享事件总线
+event_bus = EventBus()
+
+
+def publish_metric_sample(server_id, status, metrics):
+    """发布一条监控样本（格式与 /api/fleet_metrics 中的单台服务器一致）"""
+    if metrics:
+        metrics = {key: value for key, value in metrics.items() if key != 'cpu_per_core'}
+    event_bus.publish(METRICS_CHANNEL, 'metrics', {
+        'server_id': server_id,
+        'status': status,
+        'metrics': metrics
+    })
+
+
+def count_unread_notifications(admin_ids, connection=None):
+    """批量统计管理员的未读通知数 {admin_id: count}"""
+    table = Notification.__table__
+    stmt = db.select(table.c.admin_id, db.func.count()).where(
+        table.c.admin_id.in_(admin_ids), table.c.is_read == False  # noqa: E712
+    ).group_by(table.c.admin_id)
+    if connection is None:
+        rows = db.session.execute(stmt).all()
+    else:
+        rows = connection.execute(stmt).all()
+    counts = {admin_id: 0 for admin_id in admin_ids}
+    counts.update({admin_id: count for admin_id, count in rows})
+    return counts
+
+
+def publish_unread_counts(admin_ids):
+    """重新统计并推送未读通知数（只统计有连接订阅的管理员）"""
+    admin_ids = [a for a in set(admin_ids) if event_bus.has_subscribers(notifications_channel(a))]
+    if not admin_ids:
+        return
+    with db.engine.connect() as connection:
+        counts = count_unread_notifications(admin_ids, connection)
+    for admin_id, count in counts.items():
+        event_bus.publish(notifications_channel(admin_id), 'notifications', {'unread_count': count})
+
+
+def mark_notifications_changed(session, admin_ids):
+    """记录本事务中通知有变化的管理员，提交后推送未读数（批量 UPDATE 不经过 flush 时手动调用）"""
+    session.info.setdefault('notified_admins', set()).update(admin_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_notification_changes(session, flush_context):
+    admin_ids = {obj.admin_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+                 if isinstance(obj, Notification)}
+    if admin_ids:
+        mark_notifications_changed(session, admin_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_notification_changes(session):
+    admin_ids = session.info.pop('notified_admins', None)
+    if admin_ids:
+        try:
+            publish_unread_counts(admin_ids)
+        except Exception as e:
+            logger.error(f"推送未读通知数失败: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notification_changes(session):
+    session.info.pop('notified_admins', None)
@@ -0,0 +1,125 @@
+"""
+监控历史数据降采样模块
+在服务端把历史数据压缩到图表实际绘制的点数，支持两种方法：
+- lttb: Largest-Triangle-Three-Buckets，保留曲线形状（峰值/谷值）
+- avg: 按桶求平均值（最小/最大值字段分别取桶内最小/最大）
+"""
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ('lttb', 'avg')
+
+# 降采样的最少点数：LTTB 固定保留首尾两点，至少还需要一个桶
+MIN_DOWNSAMPLE_POINTS = 3
+
+# 参与降采样的数值字段（服务器指标和GPU指标）
+VALUE_FIELDS = ('cpu_usage', 'memory_usage', 'disk_usage', 'cpu_iowait', 'swap_usage',
+                'load1', 'load5', 'load15', 'process_count', 'uptime_seconds',
+                'net_rx_rate', 'net_tx_rate', 'disk_read_rate', 'disk_write_rate',
+                'disk_read_iops', 'disk_write_iops',
+                'utilization', 'memory_used', 'memory_total', 'temperature')
+
+
+def _column(points, field):
+    """提取一列数值为 float 数组，None 转为 NaN"""
+    return np.fromiter((np.nan if p.get(field) is None else p[field] for p in points),
+                       dtype=float, count=len(points))
+
+
+def _timestamps(points):
+    return np.array([p['timestamp'] for p in points], dtype='datetime64[ms]').astype(np.int64).astype(float)
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 选点，返回保留点的下标数组
+
+    每个桶内的三角形面积用数组运算一次算完，只在桶之间按顺序推进（依赖上一个选中点）
+    """
+    n = len(x)
+    if threshold < MIN_DOWNSAMPLE_POINTS:
+        raise ValueError(f"降采样点数不能少于 {MIN_DOWNSAMPLE_POINTS}: {threshold}")
+    if threshold >= n:
+        return np.arange(n)
+
+    y = np.nan_to_num(y)
+    # 首尾两点固定保留，中间 n-2 个点均分到 threshold-2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一个桶的平均点（最后一个桶使用末尾点）
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return selected
+
+
+def bucket_average(points, max_points):
+    """按桶求平均值，返回降采样后的数据点列表"""
+    if max_points < MIN_DOWNSAMPLE_POINTS:
+        raise ValueError(f"降采样点数不能少于 {MIN_DOWNSAMPLE_POINTS}: {max_points}")
+    n = len(points)
+    if max_points >= n:
+        return points
+    starts = np.linspace(0, n, max_points, endpoint=False).astype(int)
+    counts = np.diff(np.append(starts, n))
+
+    timestamps = _timestamps(points)
+    bucket_times = (np.add.reduceat(timestamps, starts) / counts).astype('datetime64[ms]')
+
+    columns = {}
+    for field in points[0]:
+        if field in VALUE_FIELDS:
+            values = _column(points, field)
+            valid = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            valid_counts = np.add.reduceat(valid.astype(int), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[field] = np.round(sums / valid_counts, 2)
+        elif field.endswith('_min') or field.endswith('_max'):
+            values = _column(points, field)
+            reducer = np.fmin if field.endswith('_min') else np.fmax
+            columns[field] = reducer.reduceat(values, starts)
+
+    result = []
+    for i in range(len(starts)):
+        point = {'timestamp': bucket_times[i].item().isoformat()}
+        for field, values in columns.items():
+            point[field] = None if np.isnan(values[i]) else float(values[i])
+        if 'resolution' in points[0]:
+            point['resolution'] = points[0]['resolution']
+        result.append(point)
+    return result
+
+
+def downsample_history(points, max_points, method='lttb', field='cpu_usage'):
+    """把历史数据降采样到不超过 max_points 个点
+
+    lttb 方法按 field 指定的曲线选点，返回原始数据点的子集；max_points 为空时不降采样，
+    少于 MIN_DOWNSAMPLE_POINTS 时抛出 ValueError
+    """
+    if max_points is None:
+        return points
+    if max_points < MIN_DOWNSAMPLE_POINTS:
+        raise ValueError(f"降采样点数不能少于 {MIN_DOWNSAMPLE_POINTS}: {max_points}")
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    if len(points) <= max_points:
+        return points
+
+    if method == 'avg':
+        return bucket_average(points, max_points)
+
+    indices = lttb_indices(_timestamps(points), _column(points, field), max_points)
+    return [points[i] for i in indices]
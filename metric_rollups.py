@@ -0,0 +1,153 @@
+"""
+监控数据降采样汇总模块
+原始样本写入时增量维护 1分钟/5分钟/1小时 汇总桶（最小值/最大值/平均值），
+历史查询按请求的点数选择最粗的可用粒度，长时间范围的图表不再需要读取全部原始数据。
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import Config
+from models import db, ServerMetric, ServerMetricRollup
+
+# 参与汇总的指标：汇总表列名前缀 -> 原始样本字段
+ROLLUP_METRICS = {
+    'cpu': 'cpu_usage',
+    'memory': 'memory_usage',
+    'disk': 'disk_usage',
+}
+
+
+def bucket_start(timestamp, resolution):
+    """时间戳所在分桶的起始时间"""
+    epoch = int((timestamp - datetime(1970, 1, 1)).total_seconds())
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % resolution)
+
+
+def build_rollup_deltas(rows):
+    """把一批原始样本合并为各粒度分桶的增量 {(server_id, resolution, bucket_start): {...}}"""
+    deltas = {}
+    for row in rows:
+        for resolution in Config.METRICS_ROLLUP_RESOLUTIONS:
+            key = (row['server_id'], resolution, bucket_start(row['timestamp'], resolution))
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = {
+                    'server_id': key[0],
+                    'resolution': resolution,
+                    'bucket_start': key[2],
+                    'sample_count': 0,
+                }
+                for prefix in ROLLUP_METRICS:
+                    delta.update({f'{prefix}_min': None, f'{prefix}_max': None,
+                                  f'{prefix}_sum': 0.0, f'{prefix}_count': 0})
+            delta['sample_count'] += 1
+            for prefix, field in ROLLUP_METRICS.items():
+                value = row.get(field)
+                if value is None:
+                    continue
+                current_min, current_max = delta[f'{prefix}_min'], delta[f'{prefix}_max']
+                delta[f'{prefix}_min'] = value if current_min is None else min(current_min, value)
+                delta[f'{prefix}_max'] = value if current_max is None else max(current_max, value)
+                delta[f'{prefix}_sum'] += value
+                delta[f'{prefix}_count'] += 1
+    return deltas
+
+
+def upsert_rollups(rows):
+    """将一批原始样本增量合并到汇总表（在调用方的事务中执行，不提交）"""
+    deltas = build_rollup_deltas(rows)
+    if not deltas:
+        return 0
+
+    table = ServerMetricRollup.__table__
+    stmt = sqlite_insert(table)
+    excluded = stmt.excluded
+    update = {'sample_count': table.c.sample_count + excluded.sample_count}
+    for prefix in ROLLUP_METRICS:
+        current_min, new_min = table.c[f'{prefix}_min'], excluded[f'{prefix}_min']
+        current_max, new_max = table.c[f'{prefix}_max'], excluded[f'{prefix}_max']
+        # SQLite 的多参数 min()/max() 遇到 NULL 返回 NULL，用 COALESCE 兜底
+        update[f'{prefix}_min'] = db.func.coalesce(db.func.min(current_min, new_min), current_min, new_min)
+        update[f'{prefix}_max'] = db.func.coalesce(db.func.max(current_max, new_max), current_max, new_max)
+        update[f'{prefix}_sum'] = table.c[f'{prefix}_sum'] + excluded[f'{prefix}_sum']
+        update[f'{prefix}_count'] = table.c[f'{prefix}_count'] + excluded[f'{prefix}_count']
+
+    stmt = stmt.on_conflict_do_update(index_elements=['server_id', 'resolution', 'bucket_start'], set_=update)
+    db.session.execute(stmt, list(deltas.values()))
+    return len(deltas)
+
+
+def backfill_rollups():
+    """根据已有原始数据重建汇总表（汇总表为空时在建表后调用一次）"""
+    if db.session.query(ServerMetricRollup.id).first() is not None:
+        return 0
+    if db.session.query(ServerMetric.id).first() is None:
+        return 0
+
+    columns = []
+    selects = []
+    for prefix, field in ROLLUP_METRICS.items():
+        columns += [f'{prefix}_min', f'{prefix}_max', f'{prefix}_sum', f'{prefix}_count']
+        selects += [f'MIN({field})', f'MAX({field})', f'COALESCE(SUM({field}), 0)', f'COUNT({field})']
+
+    total = 0
+    for resolution in Config.METRICS_ROLLUP_RESOLUTIONS:
+        # 分桶时间按 SQLAlchemy 的 DateTime 存储格式生成，与增量写入的桶保持一致
+        bucket_sql = (f"strftime('%Y-%m-%d %H:%M:%S', "
+                      f"(CAST(strftime('%s', timestamp) AS INTEGER) / {resolution}) * {resolution}, 'unixepoch')"
+                      f" || '.000000'")
+        result = db.session.execute(db.text(f"""
+            INSERT INTO server_metric_rollups (server_id, resolution, bucket_start, sample_count, {', '.join(columns)})
+            SELECT server_id, {resolution}, {bucket_sql} AS bucket, COUNT(*), {', '.join(selects)}
+            FROM server_metrics
+            GROUP BY server_id, bucket
+        """))
+        total += result.rowcount
+    db.session.commit()
+    return total
+
+
+def _covers(resolution, hours):
+    """该粒度的汇总数据保留期是否覆盖整个时间范围"""
+    return Config.METRICS_ROLLUP_RETENTION_DAYS.get(resolution, 0) * 24 >= hours
+
+
+def select_resolution(hours, points):
+    """选择能提供至少 points 个点的最粗汇总粒度，都不满足时返回 None（使用原始数据）
+
+    时间范围超过原始数据（含归档）保留期时，改用保留期能覆盖该范围的最细汇总粒度
+    """
+    span = hours * 3600
+    resolutions = sorted(Config.METRICS_ROLLUP_RESOLUTIONS)
+    for resolution in reversed(resolutions):
+        if span / resolution >= points and _covers(resolution, hours):
+            return resolution
+    raw_days = Config.METRICS_RAW_RETENTION_DAYS
+    if Config.METRICS_ARCHIVE_ENABLED:
+        raw_days = max(raw_days, Config.METRICS_ARCHIVE_RETENTION_DAYS)
+    if hours <= raw_days * 24:
+        return None
+    for resolution in resolutions:
+        if _covers(resolution, hours):
+            return resolution
+    return resolutions[-1]
+
+
+def get_rollup_history(server_id, since, resolution):
+    """读取指定粒度的汇总历史数据，格式与原始历史数据兼容（取平均值），并附带最小/最大值"""
+    rollups = ServerMetricRollup.query.filter(
+        ServerMetricRollup.server_id == server_id,
+        ServerMetricRollup.resolution == resolution,
+        ServerMetricRollup.bucket_start >= bucket_start(since, resolution)
+    ).order_by(ServerMetricRollup.bucket_start).all()
+
+    history = []
+    for rollup in rollups:
+        point = {'timestamp': rollup.bucket_start.isoformat(), 'resolution': resolution}
+        for prefix, field in ROLLUP_METRICS.items():
+            count = getattr(rollup, f'{prefix}_count')
+            point[field] = round(getattr(rollup, f'{prefix}_sum') / count, 2) if count else None
+            point[f'{prefix}_min'] = getattr(rollup, f'{prefix}_min')
+            point[f'{prefix}_max'] = getattr(rollup, f'{prefix}_max')
+        history.append(point)
+    return history
@@ -0,0 +1,146 @@
+"""
+服务器群监控统计模块
+一次读取时间窗口内所有服务器的 CPU/内存/磁盘 样本列（数据库 + 归档），
+用 NumPy 分组计算每台服务器和整个服务器群的 平均值/P50/P95/最大值。
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+from config import Config
+from models import db, Server, ServerMetric
+from metrics_archive import read_archived_arrays
+
+# 参与统计的指标：返回字段前缀 -> 原始样本字段
+STATS_METRICS = {
+    'cpu': 'cpu_usage',
+    'memory': 'memory_usage',
+    'disk': 'disk_usage',
+}
+STATS_FIELDS = ('mean', 'p50', 'p95', 'max')
+SORT_KEYS = tuple(f'{prefix}_{field}' for prefix in STATS_METRICS for field in STATS_FIELDS) + ('samples', 'name')
+
+
+def group_percentile(groups, values, group_count, q):
+    """分组百分位数（线性插值，与 numpy.percentile 默认口径一致），忽略 NaN；groups 为 0..group_count-1"""
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    counts = np.bincount(groups, minlength=group_count)
+    result = np.full(group_count, np.nan)
+    if not len(values):
+        return result
+
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    has_values = counts > 0
+    position = (counts[has_values] - 1) * q / 100
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, counts[has_values] - 1)
+    base = starts[has_values]
+    low_values, high_values = ordered[base + lower], ordered[base + upper]
+    result[has_values] = low_values + (high_values - low_values) * (position - lower)
+    return result
+
+
+def group_stats(groups, values, group_count):
+    """分组计算 mean/p50/p95/max，返回 {统计项: 长度为 group_count 的数组}"""
+    valid = ~np.isnan(values)
+    counts = np.bincount(groups[valid], minlength=group_count)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=group_count)
+    maxima = np.full(group_count, -np.inf)
+    np.maximum.at(maxima, groups[valid], values[valid])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    maxima[counts == 0] = np.nan
+    return {
+        'mean': means,
+        'p50': group_percentile(groups, values, group_count, 50),
+        'p95': group_percentile(groups, values, group_count, 95),
+        'max': maxima
+    }
+
+
+def _load_columns(server_ids, since):
+    """读取窗口内所有样本，返回 (服务器下标数组, {原始样本字段: 数组})"""
+    index = {server_id: i for i, server_id in enumerate(server_ids)}
+    fields = list(STATS_METRICS.values())
+
+    rows = db.session.execute(
+        db.select(ServerMetric.server_id, *[getattr(ServerMetric, field) for field in fields])
+        .where(ServerMetric.server_id.in_(server_ids), ServerMetric.timestamp >= since)
+    ).all()
+    groups = [np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows))]
+    columns = {field: [np.array([row[i + 1] for row in rows], dtype=float)] for i, field in enumerate(fields)}
+
+    # 已移入归档的自然日
+    if Config.METRICS_ARCHIVE_ENABLED:
+        for server_id in server_ids:
+            timestamps, archived = read_archived_arrays(server_id, since)
+            if len(timestamps):
+                groups.append(np.full(len(timestamps), index[server_id], dtype=np.int64))
+                for field in fields:
+                    columns[field].append(archived[field])
+
+    return np.concatenate(groups), {field: np.concatenate(values) for field, values in columns.items()}
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def get_fleet_stats(hours=24, server_ids=None, sort='cpu_p95', descending=None, limit=None):
+    """计算时间窗口内每台服务器和整个服务器群的统计值，按 sort 排序（需在应用上下文中调用）
+
+    descending 为空时按名称升序，其余排序字段降序
+    """
+    if descending is None:
+        descending = sort != 'name'
+    since = datetime.utcnow() - timedelta(hours=hours)
+    query = db.session.query(Server.id, Server.name, Server.status)
+    if server_ids:
+        query = query.filter(Server.id.in_(server_ids))
+    servers = query.order_by(Server.id).all()
+    ids = [server.id for server in servers]
+
+    per_server = [{'server_id': server.id, 'name': server.name, 'status': server.status, 'samples': 0}
+                  for server in servers]
+    fleet = {'samples': 0}
+    if ids:
+        groups, columns = _load_columns(ids, since)
+        counts = np.bincount(groups, minlength=len(ids))
+        fleet['samples'] = int(len(groups))
+        for i, entry in enumerate(per_server):
+            entry['samples'] = int(counts[i])
+
+        for prefix, field in STATS_METRICS.items():
+            values = columns[field]
+            stats = group_stats(groups, values, len(ids))
+            for i, entry in enumerate(per_server):
+                entry[prefix] = {name: _round(stats[name][i]) for name in STATS_FIELDS}
+            # 整个服务器群视为一个分组
+            overall = group_stats(np.zeros(len(values), dtype=np.int64), values, 1)
+            fleet[prefix] = {name: _round(overall[name][0]) for name in STATS_FIELDS}
+    else:
+        for prefix in STATS_METRICS:
+            fleet[prefix] = {name: None for name in STATS_FIELDS}
+
+    def sort_value(entry):
+        if sort in ('samples', 'name'):
+            return entry[sort]
+        prefix, _, name = sort.partition('_')
+        return entry.get(prefix, {}).get(name)
+
+    # 没有数据的服务器始终排在最后
+    with_values = [entry for entry in per_server if sort_value(entry) is not None]
+    without_values = [entry for entry in per_server if sort_value(entry) is None]
+    with_values.sort(key=sort_value, reverse=descending)
+    ranked = with_values + without_values
+
+    return {
+        'hours': hours,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+        'fleet': fleet,
+        'servers': ranked[:limit] if limit else ranked,
+        'generated_at': datetime.utcnow().isoformat()
+    }
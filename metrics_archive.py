@@ -0,0 +1,228 @@
+"""
+监控数据列式归档模块
+超过 Config.METRICS_ARCHIVE_AFTER_DAYS 天（不少于原始数据保留天数）的完整自然日（UTC）原始数据从 server_metrics 移到
+按服务器、按天存放的列式文件 <归档目录>/<server_id>/<YYYY-MM-DD>.npy，保留 Config.METRICS_ARCHIVE_RETENTION_DAYS 天。
+
+文件为 NumPy 结构化数组：当天毫秒偏移(uint32) + server_metrics 的各数值指标(float32，运行时间为 float64，缺失为 NaN)；
+读取时用 mmap_mode='r' 内存映射，按时间二分定位后只读取需要的区间。旧版本文件中没有的列读取为 NaN。
+"""
+
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from config import Config
+from models import db, ServerMetric
+
+logger = logging.getLogger(__name__)
+
+# 归档文件列：当天毫秒偏移 + 指标列（列名 -> 原始样本字段），包含 server_metrics 的全部数值列
+ARCHIVE_COLUMNS = {
+    'cpu': 'cpu_usage',
+    'memory': 'memory_usage',
+    'disk': 'disk_usage',
+    'iowait': 'cpu_iowait',
+    'swap': 'swap_usage',
+    'load1': 'load1',
+    'load5': 'load5',
+    'load15': 'load15',
+    'processes': 'process_count',
+    'uptime': 'uptime_seconds',
+    'net_rx': 'net_rx_rate',
+    'net_tx': 'net_tx_rate',
+    'disk_read': 'disk_read_rate',
+    'disk_write': 'disk_write_rate',
+    'disk_read_iops': 'disk_read_iops',
+    'disk_write_iops': 'disk_write_iops',
+}
+# 运行时间可达数亿秒，float32 会丢失精度（吞吐只用于画图，保留 float32 的7位有效数字即可）
+ARCHIVE_FLOAT64_COLUMNS = {'uptime'}
+# 数据库中为整数的字段，读取时转换回整数
+ARCHIVE_INTEGER_FIELDS = {'process_count', 'uptime_seconds'}
+ARCHIVE_DTYPE = np.dtype([('t', '<u4')] + [(column, '<f8' if column in ARCHIVE_FLOAT64_COLUMNS else '<f4')
+                                           for column in ARCHIVE_COLUMNS])
+
+
+def archive_dir():
+    return Config.METRICS_ARCHIVE_DIR or os.path.join(current_app.instance_path, 'metrics_archive')
+
+
+def archive_path(server_id, day):
+    return os.path.join(archive_dir(), str(server_id), f'{day.isoformat()}.npy')
+
+
+def _day_start(day):
+    return datetime(day.year, day.month, day.day)
+
+
+def _to_array(metrics, day):
+    """把一天的 ServerMetric 行转换为归档数组"""
+    start = _day_start(day)
+    array = np.empty(len(metrics), dtype=ARCHIVE_DTYPE)
+    # 用整数除法计算毫秒偏移，浮点秒数乘1000会截断掉1毫秒
+    array['t'] = [(m.timestamp - start) // timedelta(milliseconds=1) for m in metrics]
+    for column, field in ARCHIVE_COLUMNS.items():
+        array[column] = [np.nan if getattr(m, field) is None else getattr(m, field) for m in metrics]
+    return array
+
+
+def _upgrade(array):
+    """把旧版本归档数组转换为当前格式，缺少的列填充 NaN"""
+    if array.dtype == ARCHIVE_DTYPE:
+        return array
+    upgraded = np.empty(len(array), dtype=ARCHIVE_DTYPE)
+    upgraded['t'] = array['t']
+    for column in ARCHIVE_COLUMNS:
+        upgraded[column] = array[column] if column in array.dtype.names else np.nan
+    return upgraded
+
+
+def _write_day(server_id, day, array):
+    """写入一天的归档文件（先写临时文件再替换，已有文件时合并去重）"""
+    path = archive_path(server_id, day)
+    if os.path.exists(path):
+        array = np.concatenate([_upgrade(np.load(path)), array])
+    array = np.sort(array, order='t', kind='stable')
+    # 重复归档（如上次写入文件后删除数据库行前中断）时按时间戳去重
+    keep = np.ones(len(array), dtype=bool)
+    keep[1:] = array['t'][1:] != array['t'][:-1]
+    array = array[keep]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+    return len(array)
+
+
+def archive_cutoff(now=None):
+    """归档分界：此时间（UTC零点）之前的完整自然日可以移入归档
+
+    不早于原始数据保留期，数据库中的完整原始数据至少保留 Config.METRICS_RAW_RETENTION_DAYS 天
+    """
+    now = now or datetime.utcnow()
+    days = max(Config.METRICS_ARCHIVE_AFTER_DAYS, Config.METRICS_RAW_RETENTION_DAYS)
+    return _day_start((now - timedelta(days=days)).date())
+
+
+def archive_aged_metrics(now=None):
+    """把已过归档期的完整自然日原始数据移入归档文件，返回统计信息（需在应用上下文中调用）"""
+    now = now or datetime.utcnow()
+    started = time.monotonic()
+    cutoff = archive_cutoff(now)
+    cutoff_day = cutoff.date()
+
+    archived = 0
+    files = 0
+    server_ids = [row[0] for row in db.session.query(ServerMetric.server_id).distinct()]
+    for server_id in server_ids:
+        oldest = db.session.query(db.func.min(ServerMetric.timestamp)).filter(
+            ServerMetric.server_id == server_id).scalar()
+        if oldest is None or oldest >= cutoff:
+            continue
+        day = oldest.date()
+        while day < cutoff_day:
+            start, end = _day_start(day), _day_start(day + timedelta(days=1))
+            in_day = db.and_(ServerMetric.server_id == server_id,
+                             ServerMetric.timestamp >= start, ServerMetric.timestamp < end)
+            metrics = ServerMetric.query.filter(in_day).order_by(ServerMetric.timestamp).all()
+            if metrics:
+                _write_day(server_id, day, _to_array(metrics, day))
+                # 文件落盘后再删除数据库行
+                db.session.execute(db.delete(ServerMetric).where(in_day))
+                db.session.commit()
+                archived += len(metrics)
+                files += 1
+            day += timedelta(days=1)
+
+    expired_files = purge_expired_archives(now)
+    stats = {
+        'archived': archived,
+        'files': files,
+        'expired_files': expired_files,
+        'elapsed_ms': int((time.monotonic() - started) * 1000)
+    }
+    if archived or expired_files:
+        logger.info(f"监控数据归档完成: 移出 {archived} 行，写入 {files} 个文件，删除 {expired_files} 个过期文件，"
+                    f"耗时 {stats['elapsed_ms']}ms")
+    return stats
+
+
+def purge_expired_archives(now=None):
+    """删除超过归档保留期的文件，返回删除的文件数"""
+    now = now or datetime.utcnow()
+    root = archive_dir()
+    if not os.path.isdir(root):
+        return 0
+    oldest_kept = (now - timedelta(days=Config.METRICS_ARCHIVE_RETENTION_DAYS)).date().isoformat()
+    removed = 0
+    for server_dir in os.listdir(root):
+        server_path = os.path.join(root, server_dir)
+        if not os.path.isdir(server_path):
+            continue
+        for name in os.listdir(server_path):
+            # 文件名为 YYYY-MM-DD.npy，按字符串比较即可
+            if name.endswith('.npy') and name[:-4] < oldest_kept:
+                os.remove(os.path.join(server_path, name))
+                removed += 1
+        if not os.listdir(server_path):
+            shutil.rmtree(server_path, ignore_errors=True)
+    return removed
+
+
+def remove_server(server_id):
+    """删除服务器的全部归档文件（服务器删除后调用，避免复用ID的新服务器读到旧数据）"""
+    shutil.rmtree(os.path.join(archive_dir(), str(server_id)), ignore_errors=True)
+
+
+def read_archived_arrays(server_id, start, after=None):
+    """读取 start 之后（after 不为空时为严格晚于 after）的归档数据
+
+    返回 (时间戳 datetime64[ms] 数组, {原始样本字段: float64 数组})，缺失值为 NaN
+    """
+    lower = max(start, after) if after else start
+    timestamps = []
+    columns = {field: [] for field in ARCHIVE_COLUMNS.values()}
+    day = lower.date()
+    today = datetime.utcnow().date()
+    while day <= today:
+        path = archive_path(server_id, day)
+        if os.path.exists(path):
+            array = np.load(path, mmap_mode='r')
+            day_start = _day_start(day)
+            offset = max(0, (lower - day_start) // timedelta(milliseconds=1))
+            side = 'right' if after and lower == after else 'left'
+            selected = array[np.searchsorted(array['t'], offset, side=side):]
+            timestamps.append(np.datetime64(day_start, 'ms') + selected['t'].astype('timedelta64[ms]'))
+            for column, field in ARCHIVE_COLUMNS.items():
+                if column in selected.dtype.names:
+                    columns[field].append(selected[column].astype(float))
+                else:
+                    columns[field].append(np.full(len(selected), np.nan))
+        day += timedelta(days=1)
+
+    if not timestamps:
+        return np.array([], dtype='datetime64[ms]'), {field: np.array([]) for field in columns}
+    return np.concatenate(timestamps), {field: np.concatenate(values) for field, values in columns.items()}
+
+
+def read_archived_history(server_id, start, after=None):
+    """读取归档数据，格式与原始历史数据一致"""
+    timestamps, columns = read_archived_arrays(server_id, start, after)
+    columns = {field: np.round(values, 0 if field in ARCHIVE_INTEGER_FIELDS else 2)
+               for field, values in columns.items()}
+    history = []
+    for i, timestamp in enumerate(timestamps.tolist()):
+        point = {}
+        for field, values in columns.items():
+            if np.isnan(values[i]):
+                point[field] = None
+            else:
+                point[field] = int(values[i]) if field in ARCHIVE_INTEGER_FIELDS else float(values[i])
+        point['timestamp'] = timestamp.isoformat()
+        history.append(point)
+    return history
@@ -0,0 +1,68 @@
+"""
+最新监控数据缓存模块
+采集器每拿到一条样本就写入进程内缓存（按服务器ID），/api/server_metrics 等接口直接读取缓存，
+不再每次查询数据库；缓存缺失或过期（冷启动、采集在其他进程）时才回退到数据库并回填缓存。
+"""
+
+import threading
+import time
+from config import Config
+
+
+class CacheEntry:
+    """单台服务器的最新数据，metrics 为 None 表示还没有任何监控数据"""
+
+    __slots__ = ('metrics', 'status', 'updated_at', 'expires_at')
+
+    def __init__(self, metrics, status, max_age):
+        self.metrics = metrics
+        self.status = status
+        self.updated_at = time.time()
+        self.expires_at = time.monotonic() + max_age
+
+
+class LatestMetricsCache:
+    """进程级最新监控数据缓存
+
+    - 采集器发布的数据在 Config.METRICS_CACHE_MAX_AGE 秒内有效（正常情况下下一轮采集前就会被覆盖）
+    - 从数据库回填的数据只在 Config.MONITOR_REFRESH_INTERVAL 秒内有效，采集在其他进程时按采集周期刷新
+    """
+
+    def __init__(self, max_age=None, fallback_max_age=None):
+        self.max_age = max_age or Config.METRICS_CACHE_MAX_AGE
+        self.fallback_max_age = fallback_max_age or Config.MONITOR_REFRESH_INTERVAL
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def publish(self, server_id, metrics, status='online'):
+        """采集器发布一条样本；metrics 为 None 表示服务器不可达，保留上一条数据只更新状态"""
+        with self._lock:
+            if metrics is None:
+                previous = self._entries.get(server_id)
+                metrics = previous.metrics if previous else None
+            self._entries[server_id] = CacheEntry(metrics, status, self.max_age)
+
+    def fill(self, server_id, metrics, status=None):
+        """用数据库中的数据回填缓存"""
+        with self._lock:
+            self._entries[server_id] = CacheEntry(metrics, status, self.fallback_max_age)
+
+    def get(self, server_id):
+        """返回未过期的缓存条目，缺失或过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(server_id)
+        if entry is None or time.monotonic() >= entry.expires_at:
+            return None
+        return entry
+
+    def invalidate(self, server_id):
+        with self._lock:
+            self._entries.pop(server_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 进程级共享缓存
+latest_metrics = LatestMetricsCache()
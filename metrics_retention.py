@@ -0,0 +1,177 @@
+"""
+监控数据保留策略模块
+原始数据（含GPU数据和按用户统计数据）保留 Config.METRICS_RAW_RETENTION_DAYS 天，各粒度汇总数据按 Config.METRICS_ROLLUP_RETENTION_DAYS 保留更久。
+后台任务先把到期的原始数据移入列式归档(metrics_archive)，再分批删除过期数据（每批单独提交，
+避免长时间持有SQLite写锁），随后通过增量 VACUUM 分批归还空闲页，并记录删除行数和耗时。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from config import Config
+from models import db, ServerMetric, ServerGpuMetric, ServerUserUsage, ServerMetricRollup
+from metrics_archive import archive_aged_metrics, archive_cutoff
+
+logger = logging.getLogger(__name__)
+
+# 最近一次清理的统计信息和累计值
+_stats = {'last_run': None, 'last_archive': None, 'runs': 0, 'total_deleted': 0, 'total_archived': 0}
+_stats_lock = threading.Lock()
+
+
+def _delete_in_chunks(model, condition, chunk_size, pause):
+    """按 chunk_size 分批删除满足条件的行，每批提交一次，返回 (删除行数, 批次数)"""
+    deleted = 0
+    chunks = 0
+    while True:
+        ids = db.select(model.id).where(condition).limit(chunk_size)
+        result = db.session.execute(db.delete(model).where(model.id.in_(ids)))
+        db.session.commit()
+        if result.rowcount <= 0:
+            break
+        deleted += result.rowcount
+        chunks += 1
+        if result.rowcount < chunk_size:
+            break
+        # 批次之间让出写锁，采集写入不会被长时间阻塞
+        time.sleep(pause)
+    return deleted, chunks
+
+
+def incremental_vacuum(max_pages=None, pause=None):
+    """分批执行 PRAGMA incremental_vacuum，返回归还的页数（数据库未启用增量 VACUUM 时返回 0）"""
+    max_pages = max_pages or Config.METRICS_VACUUM_PAGES
+    pause = Config.METRICS_PURGE_CHUNK_PAUSE if pause is None else pause
+
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if conn.execute(db.text("PRAGMA auto_vacuum")).scalar() != 2:
+            return 0
+        freed = 0
+        while True:
+            free_pages = conn.execute(db.text("PRAGMA freelist_count")).scalar()
+            if not free_pages:
+                break
+            # incremental_vacuum 每执行一步只归还一页，sqlite3 的 execute 只执行一步；
+            # executescript 会把语句执行完，一次归还整批页
+            conn.connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum({min(free_pages, max_pages)});")
+            remaining = conn.execute(db.text("PRAGMA freelist_count")).scalar()
+            if remaining >= free_pages:
+                break
+            freed += free_pages - remaining
+            if remaining:
+                # 批次之间让出写锁
+                time.sleep(pause)
+        return freed
+
+
+def purge_expired_metrics(now=None, chunk_size=None, pause=None):
+    """删除超过保留期的原始数据和汇总数据并回收空间，返回本次清理的统计信息（需在应用上下文中调用）"""
+    now = now or datetime.utcnow()
+    chunk_size = chunk_size or Config.METRICS_PURGE_CHUNK_SIZE
+    pause = Config.METRICS_PURGE_CHUNK_PAUSE if pause is None else pause
+    started = time.monotonic()
+
+    raw_cutoff = now - timedelta(days=Config.METRICS_RAW_RETENTION_DAYS)
+    # 启用归档时原始数据只在归档后移出数据库，这里只删除归档分界之前的残留行（如归档被关闭期间写入的旧数据），
+    # 归档分界所在的那一天不会在归档前被删除
+    metric_cutoff = archive_cutoff(now) if Config.METRICS_ARCHIVE_ENABLED else raw_cutoff
+    raw_deleted, chunks = _delete_in_chunks(
+        ServerMetric, ServerMetric.timestamp < metric_cutoff, chunk_size, pause)
+    # GPU数据和按用户统计数据不归档，到期直接删除
+    gpu_deleted, gpu_chunks = _delete_in_chunks(
+        ServerGpuMetric, ServerGpuMetric.timestamp < raw_cutoff, chunk_size, pause)
+    chunks += gpu_chunks
+    user_deleted, user_chunks = _delete_in_chunks(
+        ServerUserUsage, ServerUserUsage.timestamp < raw_cutoff, chunk_size, pause)
+    chunks += user_chunks
+
+    rollups_deleted = {}
+    for resolution, days in Config.METRICS_ROLLUP_RETENTION_DAYS.items():
+        condition = db.and_(ServerMetricRollup.resolution == resolution,
+                            ServerMetricRollup.bucket_start < now - timedelta(days=days))
+        rollups_deleted[resolution], resolution_chunks = _delete_in_chunks(
+            ServerMetricRollup, condition, chunk_size, pause)
+        chunks += resolution_chunks
+
+    delete_ms = int((time.monotonic() - started) * 1000)
+    # 归档移出的行同样留下空闲页，这里统一回收
+    pages_freed = incremental_vacuum(pause=pause)
+
+    stats = {
+        'raw_deleted': raw_deleted,
+        'gpu_deleted': gpu_deleted,
+        'user_usage_deleted': user_deleted,
+        'rollups_deleted': rollups_deleted,
+        'chunks': chunks,
+        'pages_freed': pages_freed,
+        'delete_ms': delete_ms,
+        'elapsed_ms': int((time.monotonic() - started) * 1000),
+        'finished_at': datetime.utcnow().isoformat()
+    }
+    with _stats_lock:
+        _stats['last_run'] = stats
+        _stats['runs'] += 1
+        _stats['total_deleted'] += raw_deleted + gpu_deleted + user_deleted + sum(rollups_deleted.values())
+
+    logger.info(f"监控数据清理完成: 原始数据 {raw_deleted} 行，GPU数据 {gpu_deleted} 行，用户统计 {user_deleted} 行，"
+                f"汇总数据 {sum(rollups_deleted.values())} 行，"
+                f"归还 {pages_freed} 页，耗时 {stats['elapsed_ms']}ms")
+    return stats
+
+
+def run_retention():
+    """先归档到期的原始数据，再清理过期数据（归档失败时不清理，避免删除未归档的数据）"""
+    if Config.METRICS_ARCHIVE_ENABLED:
+        stats = archive_aged_metrics()
+        with _stats_lock:
+            _stats['last_archive'] = stats
+            _stats['total_archived'] += stats['archived']
+    return purge_expired_metrics()
+
+
+def get_retention_stats():
+    """保留策略配置和清理统计"""
+    with _stats_lock:
+        return {
+            'raw_retention_days': Config.METRICS_RAW_RETENTION_DAYS,
+            'rollup_retention_days': dict(Config.METRICS_ROLLUP_RETENTION_DAYS),
+            'runs': _stats['runs'],
+            'total_deleted': _stats['total_deleted'],
+            'last_run': _stats['last_run'],
+            'archive_enabled': Config.METRICS_ARCHIVE_ENABLED,
+            'total_archived': _stats['total_archived'],
+            'last_archive': _stats['last_archive']
+        }
+
+
+class RetentionJob:
+    """后台清理线程，每 Config.METRICS_PURGE_INTERVAL 秒执行一次归档和清理"""
+
+    def __init__(self, app, interval=None):
+        self.app = app
+        self.interval = interval or Config.METRICS_PURGE_INTERVAL
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    run_retention()
+            except Exception as e:
+                logger.error(f"监控数据清理失败: {e}")
+            self._stop_event.wait(self.interval)
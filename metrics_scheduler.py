@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+后台监控采集调度模块
+按 Config.MONITOR_REFRESH_INTERVAL 周期采集所有服务器，每台服务器带随机抖动错开SSH负载；
+Config.MONITOR_STREAM_SERVER_IDS 中的服务器改用流式采集(metrics_stream)；
+采集进程同时负责按保留策略清理过期监控数据(metrics_retention)；
+通过文件锁保证同一部署只有一个采集进程。
+
+由 python app.py 或 WSGI 入口 wsgi.py 在 Web 进程内启动，也可单独运行: python metrics_scheduler.py
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from config import Config
+from models import Server
+from server_monitor import collect_all_servers_metrics, get_server_latest_metrics, metrics_writer
+from metrics_stream import MetricsStream
+from metrics_retention import RetentionJob
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，退化为单进程部署
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class CollectorLock:
+    """基于文件锁的采集进程互斥锁，进程退出时由操作系统自动释放"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """尝试获取锁（非阻塞），成功返回 True"""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+        self._file = None
+
+
+def collector_lock_path(app):
+    """采集进程互斥锁文件路径"""
+    return Config.MONITOR_LOCK_FILE or os.path.join(app.instance_path, 'metrics_collector.lock')
+
+
+class MetricsScheduler:
+    """周期性后台采集调度器"""
+
+    def __init__(self, app, interval=None, jitter_ratio=None, lock_path=None):
+        self.app = app
+        self.interval = interval or Config.MONITOR_REFRESH_INTERVAL
+        self.jitter_ratio = Config.MONITOR_JITTER_RATIO if jitter_ratio is None else jitter_ratio
+        self.lock = CollectorLock(lock_path or collector_lock_path(app))
+        self.is_collector = False
+        self._next_due = {}
+        self.streams = {}
+        self.retention = RetentionJob(app)
+        self._latest = None
+        self._latest_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"监控采集调度器已启动，采集间隔 {self.interval} 秒")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        for stream in self.streams.values():
+            stream.stop()
+        self.streams.clear()
+        self.retention.stop()
+        with self.app.app_context():
+            metrics_writer.flush()
+        self.lock.release()
+        self.is_collector = False
+
+    def _jitter(self):
+        spread = self.interval * self.jitter_ratio
+        return random.uniform(-spread, spread)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self.is_collector:
+                self.is_collector = self.lock.acquire()
+                if not self.is_collector:
+                    # 其他进程正在采集，稍后再尝试接管
+                    self._stop_event.wait(self.interval)
+                    continue
+                logger.info(f"获得采集锁 {self.lock.path}，本进程负责后台采集")
+                self.retention.start()
+
+            try:
+                with self.app.app_context():
+                    wait_seconds = self.run_due()
+            except Exception as e:
+                logger.error(f"后台采集失败: {e}")
+                wait_seconds = self.interval
+
+            self._stop_event.wait(max(1.0, wait_seconds))
+
+    def run_due(self):
+        """采集到期的服务器，返回距下一台服务器到期的秒数（需在应用上下文中调用）"""
+        now = time.monotonic()
+        servers = Server.query.all()
+        server_ids = {server.id for server in servers}
+
+        # 新服务器在一个周期内随机错开首次采集，已删除的服务器移出调度
+        for server_id in server_ids - self._next_due.keys():
+            self._next_due[server_id] = now + random.uniform(0, self.interval * self.jitter_ratio)
+        for server_id in self._next_due.keys() - server_ids:
+            del self._next_due[server_id]
+
+        self._sync_streams(server_ids)
+        due = [server for server in servers
+               if server.id not in self.streams and self._next_due[server.id] <= now]
+        if due:
+            sweep = collect_all_servers_metrics(servers=due)
+            self._merge_sweep(sweep)
+            finished = time.monotonic()
+            for server in due:
+                self._next_due[server.id] = finished + self.interval + self._jitter()
+
+        # 流式采集的样本按时间窗口批量写入，这里兜底写入窗口已到期的样本
+        metrics_writer.flush_if_due()
+
+        if not self._next_due:
+            return self.interval
+        return min(self._next_due.values()) - time.monotonic()
+
+    def _sync_streams(self, server_ids):
+        """为配置了流式采集的服务器启动采集线程，停止已删除服务器的线程"""
+        for server_id in set(Config.MONITOR_STREAM_SERVER_IDS) & server_ids:
+            stream = self.streams.get(server_id)
+            if stream is None:
+                stream = self.streams[server_id] = MetricsStream(
+                    self.app, server_id, Config.MONITOR_STREAM_INTERVAL, on_sample=self._record_stream_sample)
+            if not stream.is_alive():
+                stream.start()
+        for server_id in self.streams.keys() - server_ids:
+            self.streams.pop(server_id).stop()
+
+    def _record_stream_sample(self, server_id, result, error=None):
+        """流式采集的样本回调，result 为 None 表示连接失败或通道中断"""
+        self._merge_sweep({
+            'results': {server_id: result},
+            'hosts': {server_id: {'status': 'online' if result else 'offline', 'elapsed_ms': 0,
+                                  'error': error, 'stream': True}}
+        })
+
+    def _merge_sweep(self, sweep):
+        with self._latest_lock:
+            latest = self._latest or {'results': {}, 'hosts': {}, 'elapsed_ms': None}
+            latest['results'].update(sweep['results'])
+            latest['hosts'].update(sweep['hosts'])
+            if 'elapsed_ms' in sweep:
+                latest['elapsed_ms'] = sweep['elapsed_ms']
+            latest['updated_at'] = datetime.utcnow().isoformat()
+            latest['source'] = 'scheduler'
+            self._latest = latest
+
+    def latest_sweep(self):
+        """最近一次采集结果，尚未采集时返回 None"""
+        with self._latest_lock:
+            if self._latest is None:
+                return None
+            return {
+                'results': dict(self._latest['results']),
+                'hosts': dict(self._latest['hosts']),
+                'elapsed_ms': self._latest['elapsed_ms'],
+                'updated_at': self._latest['updated_at'],
+                'source': self._latest['source']
+            }
+
+
+_scheduler = None
+
+
+def _reset_after_fork():
+    """fork 出的子进程（如 gunicorn --preload 的 worker）没有父进程的采集线程，不沿用父进程的调度器"""
+    global _scheduler
+    _scheduler = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def start_metrics_scheduler(app):
+    """在当前进程启动后台采集调度器（未启用时返回 None）"""
+    global _scheduler
+    if not Config.MONITOR_SCHEDULER_ENABLED:
+        return None
+    if _scheduler is None:
+        _scheduler = MetricsScheduler(app)
+    _scheduler.start()
+    return _scheduler
+
+
+def is_local_collector():
+    """本进程是否负责后台采集（采集样本会直接推送到本进程的事件总线）"""
+    return _scheduler is not None and _scheduler.is_collector
+
+
+def get_latest_sweep():
+    """返回最近一次采集结果
+
+    优先使用本进程调度器的内存结果；采集由其他进程负责时从数据库读取各服务器最新数据
+    """
+    if _scheduler is not None:
+        sweep = _scheduler.latest_sweep()
+        if sweep is not None:
+            return sweep
+
+    results = {}
+    hosts = {}
+    for server in Server.query.all():
+        results[server.id] = get_server_latest_metrics(server.id)
+        hosts[server.id] = {'status': server.status}
+    return {
+        'results': results,
+        'hosts': hosts,
+        'updated_at': datetime.utcnow().isoformat(),
+        'source': 'database'
+    }
+
+
+def collect_if_no_collector(app):
+    """本进程未启用后台采集时手动采集一次
+
+    只有拿到采集锁（没有其他采集进程运行）时才在本进程采集，否则返回采集进程最近一次的结果，
+    保证同一部署始终只有一个采集者
+    """
+    lock = CollectorLock(collector_lock_path(app))
+    if not lock.acquire():
+        return get_latest_sweep()
+    try:
+        return collect_all_servers_metrics()
+    finally:
+        lock.release()
+
+
+if __name__ == '__main__':
+    # 独立采集进程由下面的调度器采集，导入 app 时不再启动进程内调度器
+    Config.MONITOR_SCHEDULER_ENABLED = False
+    from app import app, create_tables
+
+    logging.basicConfig(level=logging.INFO)
+    create_tables()
+    scheduler = MetricsScheduler(app)
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
@@ -0,0 +1,140 @@
+"""
+流式监控采集模块
+对高频采样的服务器，在一条持久SSH通道上运行远端采集循环，本地读取线程逐条解析入库；
+稳态下每次采样不需要重新握手，也不需要在本地开新通道。通道中断后自动重连。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from models import db, Server
+from server_monitor import ServerMonitor, ServerSnapshot, METRICS_STREAM_END, metrics_writer, format_metric_sample
+from ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsStream:
+    """单台服务器的流式采集线程"""
+
+    # 通道中断后的重连等待（秒），连续失败时指数增长
+    RESTART_DELAY = 5
+    MAX_RESTART_DELAY = 300
+
+    def __init__(self, app, server_id, interval, on_sample=None):
+        self.app = app
+        self.server_id = server_id
+        self.interval = interval
+        self.on_sample = on_sample
+        self.restarts = 0
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._channel = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f'metrics-stream-{self.server_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        channel = self._channel
+        if channel is not None:
+            channel.close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _load_server(self):
+        """每次(重新)连接时从数据库读取最新的连接参数"""
+        with self.app.app_context():
+            server = db.session.get(Server, self.server_id)
+            return ServerSnapshot(server) if server else None
+
+    def _run(self):
+        delay = self.RESTART_DELAY
+        while not self._stop_event.is_set():
+            snapshot = self._load_server()
+            if snapshot is None:
+                logger.info(f"服务器 {self.server_id} 已删除，停止流式采集")
+                return
+
+            started = time.monotonic()
+            error = '流式采集通道已关闭'
+            try:
+                error = self._consume(snapshot) or error
+            except Exception as e:
+                logger.warning(f"服务器 {snapshot.name} 流式采集中断: {e}")
+                error = f"流式采集中断: {e}"
+
+            if self._stop_event.is_set():
+                return
+            # 连接失败或通道中断时记为离线，重连成功后由下一条样本恢复为在线
+            self._ingest_offline(error)
+            # 稳定运行过一段时间后再断开，视为偶发中断，重置等待时间
+            if time.monotonic() - started > self.MAX_RESTART_DELAY:
+                delay = self.RESTART_DELAY
+            self.restarts += 1
+            logger.info(f"服务器 {snapshot.name} 流式采集将在 {delay} 秒后重启")
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, self.MAX_RESTART_DELAY)
+
+    def _consume(self, snapshot):
+        """打开远端采集循环并逐条读取，直到通道关闭或停止；连接失败时返回错误信息"""
+        monitor = ServerMonitor(snapshot)
+        if not monitor.connect():
+            return monitor.last_error or '连接失败'
+
+        broken = True
+        try:
+            self._channel = monitor.open_metrics_stream(self.interval)
+            record = []
+            for line in self._channel.makefile('r'):
+                if self._stop_event.is_set():
+                    broken = False
+                    return
+                if line.strip() != METRICS_STREAM_END:
+                    record.append(line)
+                    continue
+
+                sample = monitor.parse_metrics_output(''.join(record))
+                record = []
+                if sample:
+                    sample['timestamp'] = datetime.utcnow()
+                    self._ingest(sample)
+        finally:
+            if self._channel is not None:
+                self._channel.close()
+                self._channel = None
+            # 通道异常结束时丢弃底层连接，重启时重新握手
+            ssh_pool.release(snapshot, broken=broken and not self._stop_event.is_set(), client=monitor.ssh_client)
+            monitor.ssh_client = None
+
+    def _ingest(self, sample):
+        """样本交给共享批量写入器，按时间窗口合并写入数据库"""
+        with self.app.app_context():
+            metrics_writer.add(self.server_id, sample)
+            try:
+                metrics_writer.flush_if_due()
+            except Exception as e:
+                logger.error(f"保存服务器 {self.server_id} 流式监控数据失败: {e}")
+        self.samples += 1
+        if self.on_sample:
+            self.on_sample(self.server_id, format_metric_sample(sample))
+
+    def _ingest_offline(self, error):
+        """记录服务器离线：更新服务器状态、最新数据缓存和推送"""
+        with self.app.app_context():
+            metrics_writer.add(self.server_id, None)
+            try:
+                metrics_writer.flush()
+            except Exception as e:
+                logger.error(f"保存服务器 {self.server_id} 离线状态失败: {e}")
+        if self.on_sample:
+            self.on_sample(self.server_id, None, error)
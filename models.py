@@ -140,17 +140,133 @@ class Application(db.Model):
 
 class ServerMetric(db.Model):
     __tablename__ = 'server_metrics'
+    __table_args__ = (
+        # 按服务器查询最新数据和时间范围历史数据
+        db.Index('ix_server_metrics_server_id_timestamp', 'server_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
     cpu_usage = db.Column(db.Float)  # CPU使用率百分比
+    cpu_iowait = db.Column(db.Float)  # CPU iowait 占比百分比
     memory_usage = db.Column(db.Float)  # 内存使用率百分比
+    swap_usage = db.Column(db.Float)  # 交换分区使用率百分比
     disk_usage = db.Column(db.Float)  # 磁盘使用率百分比
     load_average = db.Column(db.String(50))  # 系统负载
+    load1 = db.Column(db.Float)  # 1分钟平均负载
+    load5 = db.Column(db.Float)  # 5分钟平均负载
+    load15 = db.Column(db.Float)  # 15分钟平均负载
+    process_count = db.Column(db.Integer)  # 进程数
+    uptime_seconds = db.Column(db.Integer)  # 运行时间（秒）
+    net_rx_rate = db.Column(db.Float)  # 所有网卡接收速率（字节/秒）
+    net_tx_rate = db.Column(db.Float)  # 所有网卡发送速率（字节/秒）
+    disk_read_rate = db.Column(db.Float)  # 所有磁盘读取速率（字节/秒）
+    disk_write_rate = db.Column(db.Float)  # 所有磁盘写入速率（字节/秒）
+    disk_read_iops = db.Column(db.Float)  # 所有磁盘每秒读次数
+    disk_write_iops = db.Column(db.Float)  # 所有磁盘每秒写次数
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     server = db.relationship('Server', backref='metrics')
 
+class ServerGpuMetric(db.Model):
+    """每块GPU的监控数据，与 ServerMetric 同一时间戳写入"""
+    __tablename__ = 'server_gpu_metrics'
+    __table_args__ = (
+        db.Index('ix_server_gpu_metrics_server_id_timestamp', 'server_id', 'timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    gpu_index = db.Column(db.Integer, nullable=False)  # nvidia-smi 中的GPU序号
+    utilization = db.Column(db.Float)  # GPU利用率百分比
+    memory_used = db.Column(db.Float)  # 已用显存（MiB）
+    memory_total = db.Column(db.Float)  # 总显存（MiB）
+    temperature = db.Column(db.Float)  # 温度（℃）
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    server = db.relationship('Server', backref='gpu_metrics')
+
+class ServerUserUsage(db.Model):
+    """每次采样中资源占用最多的服务器账户（按用户汇总 ps 和GPU计算进程）"""
+    __tablename__ = 'server_user_usage'
+    __table_args__ = (
+        db.Index('ix_server_user_usage_server_id_timestamp', 'server_id', 'timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    username = db.Column(db.String(64), nullable=False)  # 服务器账户名
+    cpu_percent = db.Column(db.Float)  # 所有进程 %CPU 之和
+    memory_percent = db.Column(db.Float)  # 所有进程 %MEM 之和
+    rss_kb = db.Column(db.Integer)  # 常驻内存（KB）
+    process_count = db.Column(db.Integer)  # 进程数
+    gpu_memory = db.Column(db.Float)  # GPU计算进程占用显存（MiB）
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    server = db.relationship('Server', backref='user_usage')
+
+class ServerMetricRollup(db.Model):
+    """监控数据降采样汇总：每台服务器按 1分钟/5分钟/1小时 分桶保存最小值、最大值和累加值"""
+    __tablename__ = 'server_metric_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('server_id', 'resolution', 'bucket_start', name='uq_server_metric_rollups_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    resolution = db.Column(db.Integer, nullable=False)  # 分桶粒度（秒）
+    bucket_start = db.Column(db.DateTime, nullable=False)  # 分桶起始时间
+    sample_count = db.Column(db.Integer, nullable=False, default=0)  # 桶内原始样本数
+    
+    # 各指标的最小值/最大值/累加值/有效样本数，平均值 = sum / count
+    cpu_min = db.Column(db.Float)
+    cpu_max = db.Column(db.Float)
+    cpu_sum = db.Column(db.Float, default=0)
+    cpu_count = db.Column(db.Integer, default=0)
+    memory_min = db.Column(db.Float)
+    memory_max = db.Column(db.Float)
+    memory_sum = db.Column(db.Float, default=0)
+    memory_count = db.Column(db.Integer, default=0)
+    disk_min = db.Column(db.Float)
+    disk_max = db.Column(db.Float)
+    disk_sum = db.Column(db.Float, default=0)
+    disk_count = db.Column(db.Integer, default=0)
+
+class AlertRule(db.Model):
+    """监控告警规则，server_id 为空时适用于所有服务器"""
+    __tablename__ = 'alert_rules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'))
+    metric = db.Column(db.String(50), nullable=False)  # 样本字段，如 disk_usage
+    kind = db.Column(db.String(20), nullable=False, default='threshold')  # threshold, sustained, rate, zscore
+    operator = db.Column(db.String(2), nullable=False, default='>')  # > 或 <
+    threshold = db.Column(db.Float, nullable=False)  # 阈值（rate 为每分钟变化量，zscore 为 z 分数）
+    duration = db.Column(db.Integer)  # sustained: 持续秒数
+    window = db.Column(db.Integer)  # rate: 窗口秒数；zscore: 窗口样本数
+    cooldown = db.Column(db.Integer)  # 两次通知的最小间隔（秒），为空时使用 Config.ALERT_DEFAULT_COOLDOWN
+    enabled = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    server = db.relationship('Server', backref='alert_rules')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'server_id': self.server_id,
+            'metric': self.metric,
+            'kind': self.kind,
+            'operator': self.operator,
+            'threshold': self.threshold,
+            'duration': self.duration,
+            'window': self.window,
+            'cooldown': self.cooldown,
+            'enabled': self.enabled,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class Notification(db.Model):
     __tablename__ = 'notifications'
     
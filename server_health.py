@@ -0,0 +1,112 @@
+"""
+服务器健康状态模块
+按服务器记录SSH连接的熔断状态(closed/open/half-open)，对已知不可达的服务器直接短路，
+按指数退避的时间表再次探测，避免离线服务器拖慢每一轮采集和管理操作。
+"""
+
+import threading
+import time
+from config import Config
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class ServerUnavailableError(Exception):
+    """服务器处于熔断状态，本次连接被短路"""
+
+    def __init__(self, server_name, retry_in):
+        self.retry_in = retry_in
+        super().__init__(f"服务器 {server_name} 连续连接失败，已暂停连接，{int(retry_in) + 1} 秒后重试")
+
+
+class CircuitBreaker:
+    """单台服务器的熔断器"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = 0
+        self.retry_at = 0.0
+        self.last_error = None
+
+
+class ServerHealthRegistry:
+    """进程级服务器熔断状态表
+
+    - closed: 正常连接；连续失败达到 failure_threshold 次后转为 open
+    - open: 直接拒绝连接，直到退避时间到期后转为 half-open
+    - half-open: 只放行一次探测连接，成功则恢复 closed，失败则退避时间翻倍后重新 open
+    """
+
+    def __init__(self, failure_threshold=None, base_backoff=None, max_backoff=None):
+        self.failure_threshold = failure_threshold or Config.SSH_BREAKER_FAILURE_THRESHOLD
+        self.base_backoff = base_backoff or Config.SSH_BREAKER_BASE_BACKOFF
+        self.max_backoff = max_backoff or Config.SSH_BREAKER_MAX_BACKOFF
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, server_id):
+        breaker = self._breakers.get(server_id)
+        if breaker is None:
+            breaker = self._breakers[server_id] = CircuitBreaker()
+        return breaker
+
+    def before_connect(self, server):
+        """连接前检查熔断状态，熔断中抛出 ServerUnavailableError"""
+        with self._lock:
+            breaker = self._get(server.id)
+            if breaker.state == CLOSED:
+                return
+            now = time.monotonic()
+            if breaker.state == OPEN and now >= breaker.retry_at:
+                # 退避到期，放行一次探测
+                breaker.state = HALF_OPEN
+                return
+            raise ServerUnavailableError(server.name, max(0.0, breaker.retry_at - now))
+
+    def record_success(self, server_id):
+        with self._lock:
+            breaker = self._get(server_id)
+            breaker.state = CLOSED
+            breaker.failures = 0
+            breaker.backoff = 0
+            breaker.last_error = None
+
+    def record_failure(self, server_id, error=None):
+        with self._lock:
+            breaker = self._get(server_id)
+            breaker.failures += 1
+            breaker.last_error = str(error) if error else None
+            if breaker.state == HALF_OPEN or breaker.failures >= self.failure_threshold:
+                breaker.backoff = min(breaker.backoff * 2 or self.base_backoff, self.max_backoff)
+                breaker.retry_at = time.monotonic() + breaker.backoff
+                breaker.state = OPEN
+
+    def reset(self, server_id):
+        """清除熔断状态（服务器配置修改后立即允许重连）"""
+        with self._lock:
+            self._breakers.pop(server_id, None)
+
+    def is_open(self, server_id):
+        with self._lock:
+            breaker = self._breakers.get(server_id)
+            return breaker is not None and breaker.state != CLOSED
+
+    def status(self, server_id):
+        """熔断状态摘要"""
+        with self._lock:
+            breaker = self._breakers.get(server_id)
+            if breaker is None:
+                return {'state': CLOSED, 'failures': 0, 'retry_in': 0}
+            return {
+                'state': breaker.state,
+                'failures': breaker.failures,
+                'retry_in': round(max(0.0, breaker.retry_at - time.monotonic()), 1) if breaker.state == OPEN else 0,
+                'last_error': breaker.last_error
+            }
+
+
+# 进程级共享熔断状态
+server_health = ServerHealthRegistry()
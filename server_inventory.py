@@ -0,0 +1,259 @@
+"""
+服务器软硬件信息一次性采集模块
+把采集脚本内联到一条SSH命令中，用远端的 python3（或 python）一次读取主机名、系统版本、内核、架构、
+CPU、内存条(dmidecode)、GPU 和磁盘(lsblk -J)，输出一个 JSON 文档，在本地解析为 get_complete_info 的格式。
+远端没有 Python、脚本执行失败或某项信息拿不到时，由 ServerMonitor 原有的逐项命令补齐。
+"""
+
+import json
+
+# 远端执行的采集脚本（兼容 Python 2.7 / 3.x，只使用标准库；dmidecode 只尝试 root 或免密 sudo）
+INVENTORY_SCRIPT = r'''
+import json, os, platform, socket, subprocess
+
+def run(command):
+    try:
+        process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output = process.communicate()[0]
+        if process.returncode != 0:
+            return None
+        return output.decode('utf-8', 'replace').strip() or None
+    except Exception:
+        return None
+
+def read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except Exception:
+        return None
+
+def which(name):
+    return run('command -v ' + name) is not None
+
+info = {
+    'version': 1,
+    'os': platform.system(),
+    'hostname': socket.gethostname(),
+    'kernel': platform.release(),
+    'arch': platform.machine(),
+}
+
+os_release = {}
+for line in (read('/etc/os-release') or '').splitlines():
+    key, _, value = line.partition('=')
+    os_release[key] = value.strip().strip('"')
+info['os_release'] = os_release.get('PRETTY_NAME')
+
+cpu_models = []
+for line in (read('/proc/cpuinfo') or '').splitlines():
+    if line.startswith('model name'):
+        cpu_models.append(line.split(':', 1)[1].strip())
+info['cpu_model'] = cpu_models[0] if cpu_models else None
+info['cpu_count'] = run('nproc')
+
+meminfo = {}
+for line in (read('/proc/meminfo') or '').splitlines():
+    key, _, value = line.partition(':')
+    if value.split():
+        meminfo[key] = value.split()[0]
+info['mem_total_kb'] = meminfo.get('MemTotal')
+
+dmidecode = {'available': which('dmidecode'), 'output': None}
+if dmidecode['available']:
+    dmidecode['output'] = run('dmidecode -t 17' if os.geteuid() == 0 else 'sudo -n dmidecode -t 17 2>/dev/null')
+info['dmidecode'] = dmidecode
+info['dmi_vendor'] = read('/sys/class/dmi/id/sys_vendor')
+info['dmi_product'] = read('/sys/class/dmi/id/product_name')
+
+gpus = run('nvidia-smi --query-gpu=name --format=csv,noheader,nounits 2>/dev/null')
+info['gpus'] = [line.strip() for line in gpus.splitlines() if line.strip()] if gpus else []
+info['vga'] = run("lspci 2>/dev/null | grep -i vga | head -1 | cut -d':' -f3") if not info['gpus'] else None
+
+lsblk = run('lsblk -J -d -b -o NAME,MODEL,VENDOR,TYPE,TRAN,SIZE 2>/dev/null')
+try:
+    info['lsblk'] = json.loads(lsblk) if lsblk else None
+except ValueError:
+    info['lsblk'] = None
+
+print(json.dumps(info))
+'''
+
+INVENTORY_HEREDOC_END = '__SERVER_INVENTORY__'
+
+
+def build_inventory_command():
+    """生成内联采集脚本的SSH命令（优先 python3，其次 python）"""
+    return (f"PY=$(command -v python3 || command -v python) && \"$PY\" - <<'{INVENTORY_HEREDOC_END}'\n"
+            f"{INVENTORY_SCRIPT}\n{INVENTORY_HEREDOC_END}")
+
+
+def parse_dmidecode_memory(text):
+    """解析 dmidecode -t 17 输出，返回 {'memory_count': 总容量GB, 'memory_model': 型号}，没有内存条信息时返回 None"""
+    memory_devices = []
+    total_size_gb = 0
+    current_device = {}
+
+    for line in text.split('\n'):
+        line = line.strip()
+
+        if line.startswith('Memory Device'):
+            # 开始新的内存设备
+            if current_device and current_device.get('size_gb', 0) > 0:
+                memory_devices.append(current_device)
+            current_device = {}
+
+        elif line.startswith('Size:'):
+            size_str = line.split(':', 1)[1].strip()
+            if ('No Module Installed' not in size_str and
+                    'Unknown' not in size_str and
+                    any(c.isdigit() for c in size_str)):
+                # 解析大小 (例如: "32 GB", "32768 MB")
+                size_gb = 0
+                try:
+                    if 'GB' in size_str:
+                        size_gb = int(''.join(filter(str.isdigit, size_str.split('GB')[0])))
+                    elif 'MB' in size_str:
+                        size_gb = int(''.join(filter(str.isdigit, size_str.split('MB')[0]))) // 1024
+                except (ValueError, IndexError):
+                    size_gb = 0
+                if size_gb > 0:
+                    current_device['size_gb'] = size_gb
+                    total_size_gb += size_gb
+
+        elif line.startswith('Manufacturer:'):
+            manufacturer = line.split(':', 1)[1].strip()
+            if manufacturer not in ['Unknown', 'Not Specified', '']:
+                current_device['manufacturer'] = manufacturer
+
+        elif line.startswith('Part Number:'):
+            part_number = line.split(':', 1)[1].strip()
+            if part_number not in ['Unknown', 'Not Specified', '']:
+                current_device['part_number'] = part_number
+
+    # 处理最后一个设备
+    if current_device and current_device.get('size_gb', 0) > 0:
+        memory_devices.append(current_device)
+    if not memory_devices:
+        return None
+
+    # 第一个内存条的信息作为主要信息，格式：Samsung M393A4K40EB3-CWE 32GB
+    first_device = memory_devices[0]
+    memory_model_parts = [first_device[key] for key in ('manufacturer', 'part_number') if first_device.get(key)]
+    if memory_model_parts:
+        memory_model = f"{' '.join(memory_model_parts)} {first_device['size_gb']}GB"
+    else:
+        memory_model = f"DDR Memory {first_device['size_gb']}GB"
+    # 如果有多条内存，添加标识
+    if len(memory_devices) > 1:
+        memory_model += " 和其他"
+
+    return {'memory_count': total_size_gb, 'memory_model': memory_model}
+
+
+def summarize_disks(disks):
+    """由磁盘列表 [{'name', 'model', 'vendor', 'size_gb'}, ...] 生成 {'ssd_count': 总容量GB, 'ssd_model': 型号}
+
+    只统计大于10GB的磁盘，没有符合条件的磁盘时返回 None
+    """
+    displays = []
+    total_size_gb = 0
+    for disk in disks:
+        size_gb = disk['size_gb']
+        if size_gb <= 10:
+            continue
+        # 构建显示字符串，格式：Samsung 980 Pro 1TB；没有型号信息时使用设备名
+        display_parts = [part.strip() for part in (disk.get('vendor'), disk.get('model')) if part and part.strip()]
+        display = ' '.join(display_parts) if display_parts else disk['name']
+        display += f" {size_gb // 1024}TB" if size_gb >= 1024 else f" {size_gb}GB"
+        displays.append(display)
+        total_size_gb += size_gb
+
+    if not displays:
+        return None
+    ssd_model = displays[0]
+    # 如果有多个磁盘，添加标识
+    if len(displays) > 1:
+        ssd_model += " 和其他"
+    return {'ssd_count': total_size_gb, 'ssd_model': ssd_model}
+
+
+def _lsblk_disks(lsblk):
+    """从 lsblk -J -b 输出中取出整块磁盘"""
+    disks = []
+    for device in lsblk.get('blockdevices', []):
+        if device.get('type') != 'disk':
+            continue
+        try:
+            size_gb = int(int(device.get('size') or 0) / 1024 ** 3)
+        except (TypeError, ValueError):
+            size_gb = 0
+        disks.append({
+            'name': device.get('name'),
+            'model': device.get('model') or '',
+            'vendor': device.get('vendor') or '',
+            'size_gb': size_gb
+        })
+    return disks
+
+
+def parse_inventory(output):
+    """解析采集脚本输出的 JSON 文档为 get_complete_info 的字段
+
+    返回 (信息字典, 需要用原有方法补齐的项目集合)，输出无法解析时返回 (None, None)
+    """
+    try:
+        inventory = json.loads(output.strip().splitlines()[-1])
+    except (AttributeError, IndexError, ValueError):
+        return None, None
+    if not isinstance(inventory, dict) or inventory.get('version') != 1:
+        return None, None
+
+    cpu_count = inventory.get('cpu_count')
+    info = {
+        'hostname': inventory.get('hostname'),
+        'system_version': inventory.get('os_release'),
+        'kernel_version': inventory.get('kernel'),
+        'system_arch': inventory.get('arch'),
+        'cpu_model': inventory.get('cpu_model'),
+        'cpu_count': int(cpu_count) if cpu_count and str(cpu_count).isdigit() else None,
+    }
+    missing = set()
+    if not info['system_version']:
+        missing.add('system')
+    if not info['cpu_model'] or info['cpu_count'] is None:
+        missing.add('cpu')
+
+    # 内存：dmidecode 可用但需要sudo密码时由原有方法处理；没有 dmidecode 时按 free -g 口径取总容量，型号取 DMI 厂商信息
+    dmidecode = inventory.get('dmidecode') or {}
+    memory_info = parse_dmidecode_memory(dmidecode['output']) if dmidecode.get('output') else None
+    if memory_info:
+        info.update(memory_info)
+    elif dmidecode.get('available') or not inventory.get('mem_total_kb'):
+        missing.add('memory')
+    else:
+        vendor, product = inventory.get('dmi_vendor'), inventory.get('dmi_product')
+        info['memory_count'] = int(inventory['mem_total_kb']) // (1024 * 1024)
+        if vendor and product:
+            info['memory_model'] = f"{vendor} {product} Memory"
+        elif vendor:
+            info['memory_model'] = f"{vendor} Server Memory"
+        else:
+            info['memory_model'] = None
+
+    gpus = inventory.get('gpus') or []
+    if gpus:
+        info['gpu_model'], info['gpu_count'] = gpus[0], len(gpus)
+    elif inventory.get('vga'):
+        info['gpu_model'], info['gpu_count'] = inventory['vga'].strip(), 1
+    else:
+        info['gpu_model'], info['gpu_count'] = None, None
+
+    disk_info = summarize_disks(_lsblk_disks(inventory['lsblk'])) if inventory.get('lsblk') else None
+    if disk_info:
+        info.update(disk_info)
+    else:
+        missing.add('disk')
+
+    info['os'] = inventory.get('os')
+    return info, missing
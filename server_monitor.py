@@ -1,73 +1,471 @@
-import paramiko
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime
-from models import db, Server, ServerMetric
+from models import db, Server, ServerMetric, ServerGpuMetric, ServerUserUsage, Application, User
+from config import Config
+from ssh_pool import ssh_pool
+from server_health import ServerUnavailableError
+from metric_rollups import upsert_rollups, select_resolution, get_rollup_history
+from metrics_cache import latest_metrics
+from metrics_archive import read_archived_history
+from event_bus import publish_metric_sample
+from alert_engine import alert_engine, create_alert_notifications, publish_alerts
+from server_inventory import build_inventory_command, parse_inventory, parse_dmidecode_memory, summarize_disks
+from username_generator import generate_username_for_user
 
-class ServerMonitor:
+# 每块GPU一行: 序号, 利用率(%), 已用显存(MiB), 总显存(MiB), 温度(℃)；没有 nvidia-smi 的主机输出为空
+GPU_QUERY_COMMAND = ("nvidia-smi --query-gpu=index,utilization.gpu,memory.used,memory.total,temperature.gpu "
+                     "--format=csv,noheader,nounits")
+
+# 按用户统计资源占用（可选）：一次 ps 读取所有进程，加上每个GPU计算进程的显存（按PID关联到用户）
+USER_USAGE_PROBE_COMMAND = (
+    "echo @@ps; ps -eo user:64,pid,pcpu,pmem,rss --no-headers; "
+    "echo @@gpuapps; nvidia-smi --query-compute-apps=pid,used_memory --format=csv,noheader,nounits 2>/dev/null || true"
+)
+
+# 单次往返的监控采集脚本：一次 exec_command 读取 /proc/stat、/proc/meminfo、/proc/loadavg、
+# /proc/net/dev、/proc/diskstats 和本地文件系统 statvfs，输出按 "@@段名" 分段，由 parse_probe_output 在本地解析
+# CPU使用率和网络/磁盘吞吐不在远端等待采样，而是与上一次采集缓存的计数做差值
+METRICS_PROBE_COMMAND = (
+    "export LC_ALL=C; "
+    "echo @@stat; grep '^cpu' /proc/stat; "
+    "echo @@meminfo; cat /proc/meminfo; "
+    "echo @@loadavg; cat /proc/loadavg; "
+    "echo @@uptime; cat /proc/uptime; "
+    "echo @@procs; ls /proc | grep -c '^[0-9]'; "
+    "echo @@df; df -Pk / | tail -n1; "
+    "echo @@dfall; df -Pkl -x tmpfs -x devtmpfs -x squashfs -x overlay 2>/dev/null | tail -n +2; "
+    "echo @@netdev; cat /proc/net/dev; "
+    "echo @@diskstats; cat /proc/diskstats; "
+    "echo @@partitions; (cd /sys/class/block 2>/dev/null && ls -d */partition 2>/dev/null) | cut -d/ -f1; "
+    f"echo @@gpu; {GPU_QUERY_COMMAND} 2>/dev/null || true"
+)
+if Config.MONITOR_USER_ACCOUNTING:
+    METRICS_PROBE_COMMAND += "; " + USER_USAGE_PROBE_COMMAND
+
+# 流式采集：远端循环执行采集脚本，每条记录以 METRICS_STREAM_END 结尾
+METRICS_STREAM_END = '@@end'
+
+def build_metrics_stream_command(interval):
+    """生成远端循环采集命令，每 interval 秒输出一条采集记录"""
+    return f"while :; do {METRICS_PROBE_COMMAND}; echo {METRICS_STREAM_END}; sleep {int(interval)}; done"
+
+# 每台服务器上一次采集的 /proc/stat 计数 {server_id: {'cpu': [...], 'cpu0': [...], ...}}
+_cpu_counters = {}
+_cpu_counters_lock = threading.Lock()
+
+# 每台服务器上一次采集的网络/磁盘计数 {server_id: {'clock': 秒, 'net': {...}, 'disk': {...}}}
+_io_counters = {}
+_io_counters_lock = threading.Lock()
+
+# 不参与统计的网卡和块设备（回环、容器虚拟网卡、loop/ram 等虚拟设备）
+IGNORED_INTERFACE_PREFIXES = ('lo', 'veth', 'docker', 'br-', 'virbr', 'cni', 'flannel')
+IGNORED_DEVICE_PREFIXES = ('loop', 'ram', 'zram', 'sr', 'fd')
+# 由其他磁盘组成的 device-mapper（LVM）和软RAID设备：单独展示，但不计入总吞吐，避免与成员盘重复计算
+STACKED_DEVICE_PREFIXES = ('dm-', 'md')
+# 不视为数据文件系统的挂载点
+IGNORED_MOUNT_PREFIXES = ('/boot', '/snap', '/run', '/dev', '/sys', '/proc')
+# /proc/diskstats 的扇区固定为512字节
+SECTOR_SIZE = 512
+
+def parse_probe_output(output):
+    """将采集脚本输出拆分为 {段名: [行, ...]}"""
+    sections = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('@@'):
+            current = sections.setdefault(line[2:], [])
+        elif current is not None and line:
+            current.append(line)
+    return sections
+
+def parse_cpu_counters(lines):
+    """解析 /proc/stat 的 cpu 行为 {'cpu': [user, nice, system, idle, iowait, irq, softirq, steal], 'cpu0': [...]}"""
+    counters = {}
+    for line in lines:
+        fields = line.split()
+        if fields and fields[0].startswith('cpu'):
+            # guest/guest_nice 已计入 user/nice，只取前8列
+            values = [int(v) for v in fields[1:9]]
+            counters[fields[0]] = values + [0] * (8 - len(values))
+    return counters
+
+def _cpu_delta(previous, current):
+    """计算两次计数之间的 (使用率, iowait占比, steal占比)，计数回绕或无变化时返回 None"""
+    deltas = [c - p for p, c in zip(previous, current)]
+    total = sum(deltas)
+    if total <= 0 or any(d < 0 for d in deltas):
+        return None
+    idle, iowait, steal = deltas[3], deltas[4], deltas[7]
+    return (
+        round((total - idle - iowait) / total * 100, 2),
+        round(iowait / total * 100, 2),
+        round(steal / total * 100, 2)
+    )
+
+def compute_cpu_usage(server_id, counters):
+    """用本次与上一次缓存的 /proc/stat 计数计算CPU使用率，并缓存本次计数
+
+    首次采集（或服务器重启导致计数回绕）没有可比较的基准，各项返回 None
+    """
+    with _cpu_counters_lock:
+        previous = _cpu_counters.get(server_id)
+        _cpu_counters[server_id] = counters
+    
+    usage = {'cpu_usage': None, 'cpu_iowait': None, 'cpu_steal': None, 'cpu_per_core': None}
+    if not previous or 'cpu' not in previous or 'cpu' not in counters:
+        return usage
+    
+    total = _cpu_delta(previous['cpu'], counters['cpu'])
+    if total is None:
+        return usage
+    usage['cpu_usage'], usage['cpu_iowait'], usage['cpu_steal'] = total
+    
+    per_core = []
+    core_names = sorted((name for name in counters if name != 'cpu' and name in previous),
+                        key=lambda name: int(name[3:]))
+    for name in core_names:
+        core = _cpu_delta(previous[name], counters[name])
+        per_core.append(core[0] if core else None)
+    usage['cpu_per_core'] = per_core
+    return usage
+
+def parse_load_average(load_average):
+    """把 "1分钟, 5分钟, 15分钟" 格式的负载字符串解析为 (load1, load5, load15)，无法解析时返回 (None, None, None)"""
+    try:
+        values = [float(v) for v in load_average.replace(',', ' ').split()[:3]]
+    except (AttributeError, ValueError):
+        return None, None, None
+    if len(values) != 3:
+        return None, None, None
+    return tuple(values)
+
+def parse_net_counters(lines):
+    """解析 /proc/net/dev 为 {网卡: (接收字节, 发送字节)}"""
+    counters = {}
+    for line in lines:
+        name, sep, values = line.partition(':')
+        name = name.strip()
+        if not sep or name.startswith(IGNORED_INTERFACE_PREFIXES):
+            continue
+        fields = values.split()
+        if len(fields) >= 9:
+            counters[name] = (int(fields[0]), int(fields[8]))
+    return counters
+
+def _is_partition(name, devices):
+    """按名称判断分区：去掉末尾分区号（nvme0n1p1 / mmcblk0p1 还要去掉 p）后是已存在的设备名"""
+    base = name.rstrip('0123456789')
+    if base == name:
+        return False
+    if base.endswith('p') and base[-2:-1].isdigit():
+        base = base[:-1]
+    return base in devices
+
+def parse_disk_counters(lines, partitions=None):
+    """解析 /proc/diskstats 为 {设备: (读完成次数, 读字节, 写完成次数, 写字节)}，只保留整块磁盘（不含分区）
+
+    partitions 为采集脚本从 /sys/class/block/*/partition 列出的分区名；没有该段或为空（旧版本采集脚本、
+    远端无 /sys）时按设备名判断
+    """
+    counters = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 10 or fields[2].startswith(IGNORED_DEVICE_PREFIXES):
+            continue
+        counters[fields[2]] = (int(fields[3]), int(fields[5]) * SECTOR_SIZE,
+                               int(fields[7]), int(fields[9]) * SECTOR_SIZE)
+    if partitions:
+        partitions = set(partitions)
+        return {name: values for name, values in counters.items() if name not in partitions}
+    return {name: values for name, values in counters.items() if not _is_partition(name, counters)}
+
+def parse_filesystems(lines):
+    """解析 df -Pk 输出为数据文件系统列表，同一设备的多个挂载点只保留第一个"""
+    filesystems = []
+    devices = set()
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 6:
+            continue
+        device, mount = fields[0], ' '.join(fields[5:])
+        if device in devices or mount.startswith(IGNORED_MOUNT_PREFIXES):
+            continue
+        used, available = int(fields[2]), int(fields[3])
+        devices.add(device)
+        filesystems.append({
+            'device': device,
+            'mount': mount,
+            'total_kb': used + available,
+            'used_kb': used,
+            'usage': round(used / (used + available) * 100, 2) if used + available else 0.0
+        })
+    return filesystems
+
+def _rate(current, previous, elapsed):
+    """计数差值 / 时间，计数回绕（如网卡重置）时返回 None"""
+    delta = current - previous
+    return round(delta / elapsed, 2) if delta >= 0 else None
+
+def compute_io_rates(server_id, counters):
+    """用本次与上一次缓存的网络/磁盘计数计算每秒吞吐，并缓存本次计数
+
+    时间差优先使用远端 /proc/uptime，不受SSH往返延迟影响；首次采集没有基准，各项为 None/空列表
+    """
+    with _io_counters_lock:
+        previous = _io_counters.get(server_id)
+        _io_counters[server_id] = counters
+    
+    rates = {
+        'network': [], 'disk_io': [],
+        'net_rx_rate': None, 'net_tx_rate': None,
+        'disk_read_rate': None, 'disk_write_rate': None,
+        'disk_read_iops': None, 'disk_write_iops': None
+    }
+    if not previous:
+        return rates
+    elapsed = counters['clock'] - previous['clock']
+    if elapsed <= 0:
+        return rates
+    
+    for name, (rx, tx) in sorted(counters['net'].items()):
+        if name in previous['net']:
+            prev_rx, prev_tx = previous['net'][name]
+            rates['network'].append({
+                'interface': name,
+                'rx_bytes_per_sec': _rate(rx, prev_rx, elapsed),
+                'tx_bytes_per_sec': _rate(tx, prev_tx, elapsed)
+            })
+    for name, values in sorted(counters['disk'].items()):
+        if name in previous['disk']:
+            read_ios, read_bytes, write_ios, write_bytes = (
+                _rate(c, p, elapsed) for c, p in zip(values, previous['disk'][name]))
+            rates['disk_io'].append({
+                'device': name,
+                'read_iops': read_ios,
+                'write_iops': write_ios,
+                'read_bytes_per_sec': read_bytes,
+                'write_bytes_per_sec': write_bytes
+            })
+    
+    # 汇总值写入 server_metrics，用于历史曲线
+    def total(items, key):
+        values = [item[key] for item in items if item[key] is not None]
+        return round(sum(values), 2) if values else None
+    rates['net_rx_rate'] = total(rates['network'], 'rx_bytes_per_sec')
+    rates['net_tx_rate'] = total(rates['network'], 'tx_bytes_per_sec')
+    physical = [item for item in rates['disk_io'] if not item['device'].startswith(STACKED_DEVICE_PREFIXES)]
+    rates['disk_read_rate'] = total(physical, 'read_bytes_per_sec')
+    rates['disk_write_rate'] = total(physical, 'write_bytes_per_sec')
+    rates['disk_read_iops'] = total(physical, 'read_iops')
+    rates['disk_write_iops'] = total(physical, 'write_iops')
+    return rates
+
+def _gpu_value(value, cast=float):
+    """nvidia-smi 不支持的字段输出 [N/A] / [Not Supported]，返回 None"""
+    try:
+        return cast(value.strip())
+    except ValueError:
+        return None
+
+def parse_gpu_metrics(lines):
+    """解析 GPU_QUERY_COMMAND 的输出为 [{'index', 'utilization', 'memory_used', 'memory_total', 'temperature'}, ...]"""
+    gpus = []
+    for line in lines:
+        fields = line.split(',')
+        if len(fields) < 5:
+            continue
+        index = _gpu_value(fields[0], int)
+        if index is None:
+            continue
+        gpus.append({
+            'index': index,
+            'utilization': _gpu_value(fields[1]),
+            'memory_used': _gpu_value(fields[2]),
+            'memory_total': _gpu_value(fields[3]),
+            'temperature': _gpu_value(fields[4])
+        })
+    return gpus
+
+def parse_user_usage(ps_lines, gpu_app_lines=(), top=None):
+    """按用户汇总 ps 输出和GPU计算进程显存，返回资源占用最多的用户
+
+    ps 的 %CPU 为进程生命周期内的平均值（非瞬时值），用于定位长时间占用资源的账户。
+    按CPU排序取前 top 个用户，另外保留所有占用显存的用户
+    """
+    top = top or Config.MONITOR_USER_TOP_N
+    users = {}
+    pid_users = {}
+    for line in ps_lines:
+        fields = line.split()
+        if len(fields) < 5:
+            continue
+        try:
+            pid, cpu, memory, rss = int(fields[1]), float(fields[2]), float(fields[3]), int(fields[4])
+        except ValueError:
+            continue
+        username = fields[0]
+        pid_users[pid] = username
+        usage = users.setdefault(username, {
+            'username': username, 'cpu_percent': 0.0, 'memory_percent': 0.0,
+            'rss_kb': 0, 'process_count': 0, 'gpu_memory': 0.0
+        })
+        usage['cpu_percent'] += cpu
+        usage['memory_percent'] += memory
+        usage['rss_kb'] += rss
+        usage['process_count'] += 1
+    
+    for line in gpu_app_lines:
+        fields = line.split(',')
+        if len(fields) < 2:
+            continue
+        pid, used_memory = _gpu_value(fields[0], int), _gpu_value(fields[1])
+        username = pid_users.get(pid)
+        if username and used_memory:
+            users[username]['gpu_memory'] += used_memory
+    
+    for usage in users.values():
+        usage['cpu_percent'] = round(usage['cpu_percent'], 2)
+        usage['memory_percent'] = round(usage['memory_percent'], 2)
+    
+    ranked = sorted(users.values(), key=lambda u: (u['cpu_percent'], u['memory_percent']), reverse=True)
+    selected = ranked[:top] + [u for u in ranked[top:] if u['gpu_memory'] > 0]
+    return selected
+
+def parse_probe_metrics(output):
+    """解析采集脚本输出为监控指标字典，无法解析时返回 None"""
+    sections = parse_probe_output(output)
+    try:
+        # CPU: 原始计数，由 compute_cpu_usage 与上一次采集做差值
+        cpu_counters = parse_cpu_counters(sections['stat'])
+        if 'cpu' not in cpu_counters:
+            return None
+        
+        # 内存: (MemTotal - MemAvailable) / MemTotal
+        meminfo = {}
+        for line in sections['meminfo']:
+            key, _, value = line.partition(':')
+            meminfo[key] = int(value.split()[0])
+        mem_total = meminfo['MemTotal']
+        mem_available = meminfo.get('MemAvailable',
+                                    meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0))
+        memory_usage = round((mem_total - mem_available) / mem_total * 100, 2)
+        swap_total = meminfo.get('SwapTotal', 0)
+        swap_usage = round((swap_total - meminfo.get('SwapFree', 0)) / swap_total * 100, 2) if swap_total else 0.0
+        
+        # 磁盘: df -Pk 的 已用/(已用+可用)，与 df 的 Use% 口径一致
+        df_fields = sections['df'][-1].split()
+        disk_used, disk_available = int(df_fields[2]), int(df_fields[3])
+        disk_usage = round(disk_used / (disk_used + disk_available) * 100, 2) if disk_used + disk_available else 0.0
+        
+        # 负载: 保持与 uptime 相同的 "1分钟, 5分钟, 15分钟" 格式，同时保存数值
+        load_average = ', '.join(sections['loadavg'][0].split()[:3])
+        load1, load5, load15 = parse_load_average(load_average)
+        
+        # 运行时间(秒)和进程数，旧版本采集脚本的输出中没有这两段
+        uptime_lines = sections.get('uptime')
+        uptime = float(uptime_lines[0].split()[0]) if uptime_lines else None
+        uptime_seconds = int(uptime) if uptime is not None else None
+        procs_lines = sections.get('procs')
+        process_count = int(procs_lines[0]) if procs_lines else None
+        
+        # 网络/磁盘原始计数，由 compute_io_rates 与上一次采集做差值
+        io_counters = {
+            'clock': uptime if uptime is not None else time.monotonic(),
+            'net': parse_net_counters(sections.get('netdev', [])),
+            'disk': parse_disk_counters(sections.get('diskstats', []), sections.get('partitions'))
+        }
+        filesystems = parse_filesystems(sections.get('dfall', []))
+        
+        gpus = parse_gpu_metrics(sections.get('gpu', []))
+        # 未启用按用户统计时没有 ps 段
+        user_usage = parse_user_usage(sections['ps'], sections.get('gpuapps', [])) if 'ps' in sections else None
+    except (KeyError, IndexError, ValueError, ZeroDivisionError):
+        return None
+    
+    return {
+        'cpu_counters': cpu_counters,
+        'io_counters': io_counters,
+        'filesystems': filesystems,
+        'memory_usage': memory_usage,
+        'swap_usage': swap_usage,
+        'disk_usage': disk_usage,
+        'load_average': load_average,
+        'load1': load1,
+        'load5': load5,
+        'load15': load15,
+        'process_count': process_count,
+        'uptime_seconds': uptime_seconds,
+        'gpus': gpus,
+        'user_usage': user_usage
+    }
+
+class ServerSnapshot:
+    """服务器连接参数快照，供采集线程使用，避免在工作线程中访问数据库会话"""
+    
     def __init__(self, server):
+        self.id = server.id
+        self.name = server.name
+        self.host = server.host
+        self.port = server.port
+        self.username = server.username
+        self.password = server.password
+        self.auth_type = getattr(server, 'auth_type', 'password') or 'password'
+        self.key_path = getattr(server, 'key_path', None)
+
+class ServerMonitor:
+    def __init__(self, server, connect_timeout=None, command_timeout=None, deadline=None):
         self.server = server
         self.ssh_client = None
+        self.connect_timeout = connect_timeout or Config.SSH_TIMEOUT
+        self.command_timeout = command_timeout
+        # 整次采集的截止时间(time.monotonic())，设置后命令只能使用连接之后剩余的时间
+        self.deadline = deadline
+        self.last_error = None
+    
+    def time_left(self):
+        """当前命令可用的超时秒数；设置了截止时间且已超时时抛出 TimeoutError"""
+        if self.deadline is None:
+            return self.command_timeout
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('采集超时')
+        return remaining if self.command_timeout is None else min(remaining, self.command_timeout)
     
     def connect(self):
+        """从共享连接池获取已认证的SSH连接"""
         try:
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 基础连接参数
-            connect_params = {
-                'hostname': self.server.host,
-                'port': self.server.port,
-                'username': self.server.username,
-                'timeout': 10
-            }
-            
-            # 根据认证类型设置认证参数
-            auth_type = getattr(self.server, 'auth_type', 'password') or 'password'
-            
-            if auth_type == 'key':
-                # 密钥认证
-                key_path = getattr(self.server, 'key_path', None)
-                if key_path:
-                    try:
-                        # 尝试加载私钥
-                        private_key = paramiko.RSAKey.from_private_key_file(key_path)
-                        connect_params['pkey'] = private_key
-                    except paramiko.SSHException:
-                        try:
-                            private_key = paramiko.DSSKey.from_private_key_file(key_path)
-                            connect_params['pkey'] = private_key
-                        except paramiko.SSHException:
-                            try:
-                                private_key = paramiko.ECDSAKey.from_private_key_file(key_path)
-                                connect_params['pkey'] = private_key
-                            except paramiko.SSHException:
-                                try:
-                                    private_key = paramiko.Ed25519Key.from_private_key_file(key_path)
-                                    connect_params['pkey'] = private_key
-                                except paramiko.SSHException:
-                                    print(f"无法解析密钥文件: {key_path}")
-                                    return False
-            else:
-                # 密码认证
-                connect_params['password'] = self.server.password
-            
-            self.ssh_client.connect(**connect_params)
+            self.ssh_client = ssh_pool.acquire(self.server, timeout=self.connect_timeout, deadline=self.deadline)
+            self.last_error = None
             return True
+        except ServerUnavailableError as e:
+            self.last_error = str(e)
+            self.ssh_client = None
+            return False
         except Exception as e:
             print(f"连接服务器 {self.server.name} 失败: {e}")
+            self.last_error = f"连接失败: {e}"
+            self.ssh_client = None
             return False
     
     def disconnect(self):
+        """归还连接到连接池（不关闭底层传输）"""
         if self.ssh_client:
-            self.ssh_client.close()
+            ssh_pool.release(self.server, client=self.ssh_client)
+            self.ssh_client = None
     
-    def execute_command(self, command):
+    def execute_command(self, command, timeout=None):
         if not self.ssh_client:
             return None
+        if timeout is None:
+            timeout = self.time_left()
         
         try:
-            stdin, stdout, stderr = self.ssh_client.exec_command(command)
+            stdin, stdout, stderr = self.ssh_client.exec_command(command, timeout=timeout)
             output = stdout.read().decode('utf-8').strip()
             error = stderr.read().decode('utf-8').strip()
             
@@ -187,6 +585,46 @@ class ServerMonitor:
         result = self.execute_command(command)
         return result.strip() if result else "0.00, 0.00, 0.00"
     
+    def parse_metrics_output(self, output):
+        """解析一条采集脚本输出并计算CPU差值，无法解析时返回 None"""
+        metrics = parse_probe_metrics(output) if output else None
+        if metrics:
+            metrics.update(compute_cpu_usage(self.server.id, metrics.pop('cpu_counters')))
+            metrics.update(compute_io_rates(self.server.id, metrics.pop('io_counters')))
+        return metrics
+    
+    def get_metrics_snapshot(self):
+        """一次远程调用获取CPU/内存/磁盘/负载，采集脚本不可用时（如非Linux主机）回退到逐项命令"""
+        output = self.execute_command(METRICS_PROBE_COMMAND, timeout=self.time_left())
+        metrics = self.parse_metrics_output(output)
+        if metrics:
+            return metrics
+        
+        print(f"🔍 [DEBUG] 服务器 {self.server.name} 采集脚本解析失败，回退到逐项采集")
+        load_average = self.get_load_average()
+        load1, load5, load15 = parse_load_average(load_average)
+        return {
+            'cpu_usage': self.get_cpu_usage(),
+            'memory_usage': self.get_memory_usage(),
+            'disk_usage': self.get_disk_usage(),
+            'load_average': load_average,
+            'load1': load1,
+            'load5': load5,
+            'load15': load15
+        }
+    
+    def open_metrics_stream(self, interval):
+        """在已建立的连接上开启一个持久通道，远端每 interval 秒输出一条采集记录
+
+        返回 paramiko Channel；读取超时设为3个周期，远端卡死时读取方会收到超时异常
+        """
+        if not self.ssh_client:
+            return None
+        channel = self.ssh_client.get_transport().open_session()
+        channel.settimeout(interval * 3)
+        channel.exec_command(build_metrics_stream_command(interval))
+        return channel
+    
     def get_hostname(self):
         """获取主机名称"""
         command = "hostname"
@@ -348,97 +786,10 @@ class ServerMonitor:
                     result = None
         
         if result:
-            memory_devices = []
-            total_size_gb = 0
-            
-            # 使用Python解析dmidecode输出，更加可靠
-            lines = result.split('\n')
-            current_device = {}
-            
-            for line in lines:
-                line = line.strip()
-                
-                if line.startswith('Memory Device'):
-                    # 开始新的内存设备
-                    if current_device and current_device.get('size_gb', 0) > 0:
-                        memory_devices.append(current_device)
-                    current_device = {}
-                    
-                elif line.startswith('Size:'):
-                    size_str = line.split(':', 1)[1].strip()
-                    if ('No Module Installed' not in size_str and 
-                        'Unknown' not in size_str and 
-                        any(c.isdigit() for c in size_str)):
-                        # 解析大小 (例如: "32 GB", "32768 MB")
-                        if 'GB' in size_str:
-                            try:
-                                size_gb = int(''.join(filter(str.isdigit, size_str.split('GB')[0])))
-                                if size_gb > 0:
-                                    current_device['size_gb'] = size_gb
-                                    total_size_gb += size_gb
-                                    print(f"🔍 [DEBUG] 发现内存容量: {size_gb}GB")
-                            except (ValueError, IndexError):
-                                pass
-                        elif 'MB' in size_str:
-                            try:
-                                size_mb = int(''.join(filter(str.isdigit, size_str.split('MB')[0])))
-                                size_gb = size_mb // 1024
-                                if size_gb > 0:
-                                    current_device['size_gb'] = size_gb
-                                    total_size_gb += size_gb
-                                    print(f"🔍 [DEBUG] 发现内存容量: {size_mb}MB -> {size_gb}GB")
-                            except (ValueError, IndexError):
-                                pass
-                                
-                elif line.startswith('Manufacturer:'):
-                    manufacturer = line.split(':', 1)[1].strip()
-                    if manufacturer not in ['Unknown', 'Not Specified', '']:
-                        current_device['manufacturer'] = manufacturer
-                        print(f"🔍 [DEBUG] 发现制造商: {manufacturer}")
-                        
-                elif line.startswith('Part Number:'):
-                    part_number = line.split(':', 1)[1].strip()
-                    if part_number not in ['Unknown', 'Not Specified', '']:
-                        current_device['part_number'] = part_number
-                        print(f"🔍 [DEBUG] 发现型号: {part_number}")
-            
-            # 处理最后一个设备
-            if current_device and current_device.get('size_gb', 0) > 0:
-                memory_devices.append(current_device)
-            
-            print(f"🔍 [DEBUG] 总共发现 {len(memory_devices)} 个内存设备")
-            
-            # 生成内存信息字符串
-            if memory_devices:
-                # 获取第一个内存条的信息作为主要信息
-                first_device = memory_devices[0]
-                
-                # 构建内存型号字符串，格式：Samsung M393A4K40EB3-CWE 32GB
-                memory_model_parts = []
-                if first_device.get('manufacturer'):
-                    memory_model_parts.append(first_device['manufacturer'])
-                if first_device.get('part_number'):
-                    memory_model_parts.append(first_device['part_number'])
-                
-                if memory_model_parts:
-                    memory_model = ' '.join(memory_model_parts)
-                    # 添加单条容量信息
-                    memory_model += f" {first_device['size_gb']}GB"
-                    
-                    # 如果有多条内存，添加标识
-                    if len(memory_devices) > 1:
-                        memory_model += " 和其他"
-                else:
-                    memory_model = f"DDR Memory {first_device['size_gb']}GB"
-                    if len(memory_devices) > 1:
-                        memory_model += " 和其他"
-                
-                print(f"🔍 [DEBUG] 解析内存信息 - 型号: {memory_model}, 总大小: {total_size_gb}GB, 设备数量: {len(memory_devices)}")
-                
-                return {
-                    'memory_count': total_size_gb,
-                    'memory_model': memory_model
-                }
+            memory_info = parse_dmidecode_memory(result)
+            if memory_info:
+                print(f"🔍 [DEBUG] 解析内存信息 - 型号: {memory_info['memory_model']}, 总大小: {memory_info['memory_count']}GB")
+                return memory_info
         
         print(f"🔍 [DEBUG] dmidecode方法失败，尝试备用方法...")
         
@@ -675,84 +1026,33 @@ class ServerMonitor:
         print(f"💿 [DEBUG] lsblk 原始输出: {result[:500] if result else 'None'}")
         
         if result:
-            lines = result.strip().split('\n')
-            if len(lines) > 1:  # 跳过表头
-                disks = []
-                total_size_gb = 0
-                
-                for line in lines[1:]:  # 跳过表头行
-                    parts = line.split()
-                    if len(parts) >= 6 and parts[3] == 'disk':  # TYPE = disk
-                        name = parts[0]
-                        model = parts[1] if parts[1] != 'N/A' else ''
-                        vendor = parts[2] if parts[2] != 'N/A' else ''
-                        disk_type = parts[3]
-                        transport = parts[4] if parts[4] != 'N/A' else ''
-                        size_str = parts[5]
-                        
-                        # 解析磁盘大小
+            disks = []
+            for line in result.strip().split('\n')[1:]:  # 跳过表头行
+                parts = line.split()
+                if len(parts) >= 6 and parts[3] == 'disk':  # TYPE = disk
+                    size_str = parts[5]
+                    # 解析磁盘大小
+                    size_gb = 0
+                    try:
+                        if 'T' in size_str:
+                            size_gb = int(float(size_str.replace('T', '')) * 1024)
+                        elif 'G' in size_str:
+                            size_gb = int(float(size_str.replace('G', '')))
+                        elif 'M' in size_str:
+                            size_gb = int(float(size_str.replace('M', '')) / 1024)
+                    except (ValueError, IndexError):
                         size_gb = 0
-                        try:
-                            if 'T' in size_str:
-                                size_gb = int(float(size_str.replace('T', '')) * 1024)
-                            elif 'G' in size_str:
-                                size_gb = int(float(size_str.replace('G', '')))
-                            elif 'M' in size_str:
-                                size_gb = int(float(size_str.replace('M', '')) / 1024)
-                        except (ValueError, IndexError):
-                            size_gb = 0
-                        
-                        # 只处理大于10GB的磁盘
-                        if size_gb > 10:
-                            # 构建磁盘型号信息，格式：Samsung 980 Pro 1TB
-                            disk_info = {
-                                'name': name,
-                                'model': model,
-                                'vendor': vendor,
-                                'transport': transport,
-                                'size_gb': size_gb
-                            }
-                            
-                            # 构建显示字符串
-                            display_parts = []
-                            if vendor and vendor.strip():
-                                display_parts.append(vendor.strip())
-                            if model and model.strip():
-                                display_parts.append(model.strip())
-                            
-                            if display_parts:
-                                disk_display = ' '.join(display_parts)
-                                # 添加容量信息
-                                if size_gb >= 1024:
-                                    disk_display += f" {size_gb//1024}TB"
-                                else:
-                                    disk_display += f" {size_gb}GB"
-                            else:
-                                # 如果没有型号信息，使用设备名
-                                if size_gb >= 1024:
-                                    disk_display = f"{name} {size_gb//1024}TB"
-                                else:
-                                    disk_display = f"{name} {size_gb}GB"
-                            
-                            disk_info['display'] = disk_display
-                            disks.append(disk_info)
-                            total_size_gb += size_gb
-                
-                if disks:
-                    # 获取第一个磁盘的信息作为主要信息
-                    first_disk = disks[0]
-                    ssd_model = first_disk['display']
-                    
-                    # 如果有多个磁盘，添加标识
-                    if len(disks) > 1:
-                        ssd_model += " 和其他"
-                    
-                    print(f"💿 [DEBUG] 解析磁盘信息 - 型号: {ssd_model}, 总大小: {total_size_gb}GB, 磁盘数量: {len(disks)}")
-                    
-                    return {
-                        'ssd_count': total_size_gb,
-                        'ssd_model': ssd_model
-                    }
+                    disks.append({
+                        'name': parts[0],
+                        'model': parts[1] if parts[1] != 'N/A' else '',
+                        'vendor': parts[2] if parts[2] != 'N/A' else '',
+                        'size_gb': size_gb
+                    })
+            
+            disk_info = summarize_disks(disks)
+            if disk_info:
+                print(f"💿 [DEBUG] 解析磁盘信息 - 型号: {disk_info['ssd_model']}, 总大小: {disk_info['ssd_count']}GB, 磁盘数量: {len(disks)}")
+                return disk_info
         
         print(f"💿 [DEBUG] lsblk方法失败，尝试备用方法...")
         # 备用方法：使用 df 获取根分区大小
@@ -816,92 +1116,544 @@ class ServerMonitor:
             'system_arch': self.get_system_arch()
         }
     
+    def get_inventory(self):
+        """执行内联采集脚本一次获取系统和硬件信息，返回 (信息字典, 需要补齐的项目)，失败时返回 (None, None)"""
+        output = self.execute_command(build_inventory_command(), timeout=Config.INVENTORY_TIMEOUT)
+        if not output:
+            return None, None
+        return parse_inventory(output)
+    
     def get_complete_info(self):
-        """获取完整的系统和硬件信息"""
-        complete_info = {}
-        complete_info.update(self.get_system_info())
-        complete_info.update(self.get_hardware_info())
-        return complete_info
+        """获取完整的系统和硬件信息
+
+        优先用一次SSH调用执行采集脚本；远端没有 Python（或非Linux主机）时回退到逐项命令，
+        脚本拿不到的单项（如需要sudo密码的内存型号）用原有方法补齐
+        """
+        info, missing = self.get_inventory()
+        if info is None or info.pop('os') != 'Linux':
+            complete_info = {}
+            complete_info.update(self.get_system_info())
+            complete_info.update(self.get_hardware_info())
+            return complete_info
+        
+        if 'system' in missing:
+            info['system_version'] = self.get_system_version()
+        if 'cpu' in missing:
+            info.update(self.get_cpu_info())
+        if 'memory' in missing:
+            info.update(self._get_memory_info_linux())
+        if 'disk' in missing:
+            info.update(self._get_disk_info_linux())
+        return info
     
-    def collect_metrics(self):
+    def sample_metrics(self):
+        """连接服务器并采集一次监控数据（不访问数据库），连接失败返回 None"""
         if not self.connect():
             return None
         
         try:
-            cpu_usage = self.get_cpu_usage()
-            memory_usage = self.get_memory_usage()
-            disk_usage = self.get_disk_usage()
-            load_average = self.get_load_average()
-            
-            # 保存监控数据到数据库
-            metric = ServerMetric(
-                server_id=self.server.id,
-                cpu_usage=cpu_usage,
-                memory_usage=memory_usage,
-                disk_usage=disk_usage,
-                load_average=load_average
-            )
-            
-            db.session.add(metric)
-            
-            # 更新服务器状态
-            self.server.status = 'online'
-            db.session.commit()
-            
-            return {
-                'cpu_usage': cpu_usage,
-                'memory_usage': memory_usage,
-                'disk_usage': disk_usage,
-                'load_average': load_average,
-                'timestamp': datetime.utcnow().isoformat()
-            }
-            
+            snapshot = self.get_metrics_snapshot()
+            snapshot['timestamp'] = datetime.utcnow()
+            return snapshot
+        finally:
+            self.disconnect()
+    
+    def collect_metrics(self):
+        try:
+            sample = self.sample_metrics()
         except Exception as e:
             print(f"收集监控数据失败: {e}")
-            self.server.status = 'offline'
+            sample = None
+        
+        try:
+            save_metric_samples([(self.server, sample)])
+        except Exception as e:
+            print(f"保存监控数据失败: {e}")
+            db.session.rollback()
+        
+        return format_metric_sample(sample) if sample else None
+
+def format_metric_sample(sample):
+    """将采样结果转换为API返回格式"""
+    return {
+        'cpu_usage': sample['cpu_usage'],
+        'cpu_iowait': sample.get('cpu_iowait'),
+        'cpu_steal': sample.get('cpu_steal'),
+        'cpu_per_core': sample.get('cpu_per_core'),
+        'memory_usage': sample['memory_usage'],
+        'swap_usage': sample.get('swap_usage'),
+        'disk_usage': sample['disk_usage'],
+        'load_average': sample['load_average'],
+        'load1': sample.get('load1'),
+        'load5': sample.get('load5'),
+        'load15': sample.get('load15'),
+        'process_count': sample.get('process_count'),
+        'uptime_seconds': sample.get('uptime_seconds'),
+        'net_rx_rate': sample.get('net_rx_rate'),
+        'net_tx_rate': sample.get('net_tx_rate'),
+        'disk_read_rate': sample.get('disk_read_rate'),
+        'disk_write_rate': sample.get('disk_write_rate'),
+        'disk_read_iops': sample.get('disk_read_iops'),
+        'disk_write_iops': sample.get('disk_write_iops'),
+        'network': sample.get('network') or [],
+        'disk_io': sample.get('disk_io') or [],
+        'filesystems': sample.get('filesystems') or [],
+        'gpus': sample.get('gpus') or [],
+        'timestamp': sample['timestamp'].isoformat()
+    }
+
+class MetricsWriter:
+    """监控数据批量写入器
+
+    累积一轮采集（或一段时间窗口内流式采集）的样本，flush 时用一次批量 INSERT 写入 server_metrics
+    （以及 server_gpu_metrics、server_user_usage）并增量合并到降采样汇总表，
+    再用一条 UPDATE ... CASE 批量更新 servers.status，整个过程只提交一次事务。
+    每条样本加入时由告警引擎增量判断，触发的告警在同一事务中生成管理员通知。
+    样本数达到 flush_size 或距上次写入超过 flush_interval 秒时由 flush_if_due 触发写入。
+    """
+    
+    def __init__(self, flush_size=None, flush_interval=None):
+        self.flush_size = flush_size or Config.MONITOR_WRITE_FLUSH_SIZE
+        self.flush_interval = flush_interval or Config.MONITOR_WRITE_FLUSH_INTERVAL
+        self._rows = []
+        self._gpu_rows = []
+        self._user_rows = []
+        self._alerts = []
+        self._statuses = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def add(self, server_id, sample):
+        """加入一条采样结果，sample 为 None 表示服务器不可达
+
+        样本同时发布到最新数据缓存和事件总线，接口和页面不必等到批量写入数据库后才能看到；
+        启用告警时会按需从数据库加载规则（需在应用上下文中调用）
+        """
+        if sample:
+            metrics = format_metric_sample(sample)
+            latest_metrics.publish(server_id, metrics)
+            publish_metric_sample(server_id, 'online', metrics)
+        else:
+            latest_metrics.publish(server_id, None, status='offline')
+            publish_metric_sample(server_id, 'offline', None)
+        alerts = []
+        if sample and Config.ALERT_ENABLED:
+            # 先按需加载规则，进程启动后第一次写入之前的样本同样参与判断
+            try:
+                alert_engine.refresh_rules_if_due()
+            except Exception as e:
+                print(f"加载告警规则失败: {e}")
+            alerts = alert_engine.evaluate(server_id, sample, sample['timestamp'])
+        with self._lock:
+            self._alerts.extend(alerts)
+            if sample:
+                self._rows.append({
+                    'server_id': server_id,
+                    'cpu_usage': sample['cpu_usage'],
+                    'cpu_iowait': sample.get('cpu_iowait'),
+                    'memory_usage': sample['memory_usage'],
+                    'swap_usage': sample.get('swap_usage'),
+                    'disk_usage': sample['disk_usage'],
+                    'load_average': sample['load_average'],
+                    'load1': sample.get('load1'),
+                    'load5': sample.get('load5'),
+                    'load15': sample.get('load15'),
+                    'process_count': sample.get('process_count'),
+                    'uptime_seconds': sample.get('uptime_seconds'),
+                    'net_rx_rate': sample.get('net_rx_rate'),
+                    'net_tx_rate': sample.get('net_tx_rate'),
+                    'disk_read_rate': sample.get('disk_read_rate'),
+                    'disk_write_rate': sample.get('disk_write_rate'),
+                    'disk_read_iops': sample.get('disk_read_iops'),
+                    'disk_write_iops': sample.get('disk_write_iops'),
+                    'timestamp': sample['timestamp']
+                })
+                self._gpu_rows.extend({
+                    'server_id': server_id,
+                    'gpu_index': gpu['index'],
+                    'utilization': gpu['utilization'],
+                    'memory_used': gpu['memory_used'],
+                    'memory_total': gpu['memory_total'],
+                    'temperature': gpu['temperature'],
+                    'timestamp': sample['timestamp']
+                } for gpu in sample.get('gpus') or [])
+                self._user_rows.extend(dict(usage, server_id=server_id, timestamp=sample['timestamp'])
+                                       for usage in sample.get('user_usage') or [])
+                self._statuses[server_id] = 'online'
+            else:
+                self._statuses[server_id] = 'offline'
+    
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
+    
+    def flush_if_due(self):
+        """达到批量大小或时间窗口时写入（需在应用上下文中调用）"""
+        with self._lock:
+            due = (len(self._rows) >= self.flush_size or
+                   (self._statuses and time.monotonic() - self._last_flush >= self.flush_interval))
+        if due:
+            return self.flush()
+        return 0
+    
+    def flush(self):
+        """写入所有累积的样本和状态，返回写入的样本数（需在应用上下文中调用）"""
+        with self._lock:
+            rows, gpu_rows, user_rows, statuses = self._rows, self._gpu_rows, self._user_rows, self._statuses
+            alerts = self._alerts
+            self._rows, self._gpu_rows, self._user_rows, self._statuses = [], [], [], {}
+            self._alerts = []
+            self._last_flush = time.monotonic()
+        
+        if not rows and not statuses:
+            return 0
+        
+        admin_ids, messages = [], []
+        try:
+            if rows:
+                db.session.execute(ServerMetric.__table__.insert(), rows)
+                upsert_rollups(rows)
+            if gpu_rows:
+                db.session.execute(ServerGpuMetric.__table__.insert(), gpu_rows)
+            if user_rows:
+                db.session.execute(ServerUserUsage.__table__.insert(), user_rows)
+            if statuses:
+                servers_table = Server.__table__
+                db.session.execute(
+                    servers_table.update()
+                    .where(servers_table.c.id.in_(list(statuses)))
+                    .values(status=db.case(statuses, value=servers_table.c.id))
+                )
+            admin_ids, messages = create_alert_notifications(alerts)
             db.session.commit()
-            return None
-        finally:
-            self.disconnect()
+        except Exception as e:
+            db.session.rollback()
+            print(f"批量写入监控数据失败，丢弃 {len(rows)} 条样本: {e}")
+            raise
+        
+        publish_alerts(admin_ids, messages)
+        return len(rows)
+
+# 进程级共享写入器（批量采集和流式采集共用）
+metrics_writer = MetricsWriter()
+
+def save_metric_samples(samples):
+    """在一个事务中写入一批采样结果并更新服务器状态
 
-def collect_all_servers_metrics():
-    """收集所有服务器的监控数据"""
-    servers = Server.query.all()
+    samples: [(server, sample 或 None), ...]，sample 为 None 表示服务器不可达
+    """
+    for server, sample in samples:
+        metrics_writer.add(server.id, sample)
+    metrics_writer.flush()
+
+def _sample_server(snapshot, host_timeout):
+    """采集线程任务：返回 (采样结果, 错误信息, 耗时秒数)"""
+    started = time.monotonic()
+    # 连接和命令共用一个截止时间，单台服务器总耗时不超过 host_timeout
+    monitor = ServerMonitor(snapshot, connect_timeout=host_timeout, deadline=started + host_timeout)
+    try:
+        sample = monitor.sample_metrics()
+        error = None if sample else (monitor.last_error or '连接失败')
+    except Exception as e:
+        sample, error = None, str(e)
+    return sample, error, time.monotonic() - started
+
+def collect_all_servers_metrics(servers=None, max_workers=None, host_timeout=None, sweep_timeout=None):
+    """并发收集服务器的监控数据（servers 为空时收集所有服务器）
+
+    - 采集线程数不超过 max_workers，单台服务器的连接和命令合计受 host_timeout 限制
+    - 整轮采集超过 sweep_timeout 后立即返回已完成的部分结果，未完成的服务器标记为 timeout 且不修改状态
+    - 所有结果在主线程中用一个事务写入数据库
+    """
+    max_workers = max_workers or Config.MONITOR_MAX_WORKERS
+    host_timeout = host_timeout or Config.MONITOR_HOST_TIMEOUT
+    sweep_timeout = sweep_timeout or Config.MONITOR_SWEEP_TIMEOUT
+    
+    started = time.monotonic()
+    if servers is None:
+        servers = Server.query.all()
     results = {}
+    hosts = {}
+    samples = []
     
-    for server in servers:
-        monitor = ServerMonitor(server)
-        metrics = monitor.collect_metrics()
-        results[server.id] = metrics
+    if servers:
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(servers)),
+                                      thread_name_prefix='metrics-sweep')
+        futures = {executor.submit(_sample_server, ServerSnapshot(server), host_timeout): server
+                   for server in servers}
+        try:
+            for future in as_completed(futures, timeout=sweep_timeout):
+                server = futures[future]
+                sample, error, elapsed = future.result()
+                samples.append((server, sample))
+                results[server.id] = format_metric_sample(sample) if sample else None
+                hosts[server.id] = {
+                    'status': 'online' if sample else 'offline',
+                    'elapsed_ms': round(elapsed * 1000),
+                    'error': error
+                }
+        except FuturesTimeoutError:
+            for future, server in futures.items():
+                if server.id not in hosts:
+                    results[server.id] = None
+                    hosts[server.id] = {
+                        'status': 'timeout',
+                        'elapsed_ms': round((time.monotonic() - started) * 1000),
+                        'error': '采集超时'
+                    }
+        finally:
+            # 不等待仍卡在连接中的线程，它们会在各自的超时后自行结束
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    try:
+        save_metric_samples(samples)
+    except Exception as e:
+        print(f"保存监控数据失败: {e}")
+        db.session.rollback()
     
-    return results
+    return {
+        'results': results,
+        'hosts': hosts,
+        'elapsed_ms': round((time.monotonic() - started) * 1000)
+    }
+
+def format_metric_row(metric):
+    """将数据库中的 ServerMetric 转换为API返回格式"""
+    return {
+        'cpu_usage': metric.cpu_usage,
+        'cpu_iowait': metric.cpu_iowait,
+        'memory_usage': metric.memory_usage,
+        'swap_usage': metric.swap_usage,
+        'disk_usage': metric.disk_usage,
+        'load_average': metric.load_average,
+        'load1': metric.load1,
+        'load5': metric.load5,
+        'load15': metric.load15,
+        'process_count': metric.process_count,
+        'uptime_seconds': metric.uptime_seconds,
+        'net_rx_rate': metric.net_rx_rate,
+        'net_tx_rate': metric.net_tx_rate,
+        'disk_read_rate': metric.disk_read_rate,
+        'disk_write_rate': metric.disk_write_rate,
+        'disk_read_iops': metric.disk_read_iops,
+        'disk_write_iops': metric.disk_write_iops,
+        'timestamp': metric.timestamp.isoformat()
+    }
+
+def format_gpu_row(gpu):
+    """将数据库中的 ServerGpuMetric 转换为API返回格式（与采样结果中的 gpus 一致）"""
+    return {
+        'index': gpu.gpu_index,
+        'utilization': gpu.utilization,
+        'memory_used': gpu.memory_used,
+        'memory_total': gpu.memory_total,
+        'temperature': gpu.temperature
+    }
+
+def get_latest_gpu_metrics(server_ids):
+    """批量读取多台服务器最近一次采样的GPU数据 {server_id: [gpu, ...]}"""
+    latest = db.session.query(
+        ServerGpuMetric.server_id, db.func.max(ServerGpuMetric.timestamp).label('timestamp')
+    ).filter(ServerGpuMetric.server_id.in_(server_ids)).group_by(ServerGpuMetric.server_id).subquery()
+    rows = ServerGpuMetric.query.join(latest, db.and_(
+        ServerGpuMetric.server_id == latest.c.server_id,
+        ServerGpuMetric.timestamp == latest.c.timestamp
+    )).order_by(ServerGpuMetric.server_id, ServerGpuMetric.gpu_index).all()
+    gpus = {}
+    for gpu in rows:
+        gpus.setdefault(gpu.server_id, []).append(format_gpu_row(gpu))
+    return gpus
+
+def is_gpu_free(gpu):
+    """利用率和显存占用都低于阈值的GPU视为空闲"""
+    if gpu.get('utilization') is None or not gpu.get('memory_total'):
+        return False
+    return (gpu['utilization'] < Config.GPU_FREE_UTILIZATION and
+            gpu['memory_used'] is not None and
+            gpu['memory_used'] / gpu['memory_total'] * 100 < Config.GPU_FREE_MEMORY_PERCENT)
 
 def get_server_latest_metrics(server_id):
-    """获取指定服务器的最新监控数据"""
+    """获取指定服务器的最新监控数据，优先读取进程内缓存，缓存缺失或过期时查询数据库并回填"""
+    entry = latest_metrics.get(server_id)
+    if entry is not None:
+        return entry.metrics
+    
     metric = ServerMetric.query.filter_by(server_id=server_id).order_by(ServerMetric.timestamp.desc()).first()
-    if metric:
-        return {
-            'cpu_usage': metric.cpu_usage,
-            'memory_usage': metric.memory_usage,
-            'disk_usage': metric.disk_usage,
-            'load_average': metric.load_average,
-            'timestamp': metric.timestamp.isoformat()
+    result = format_metric_row(metric) if metric else None
+    if result:
+        result['gpus'] = get_latest_gpu_metrics([server_id]).get(server_id, [])
+    latest_metrics.fill(server_id, result)
+    return result
+
+def get_fleet_metrics(server_ids=None):
+    """一次返回多台服务器（默认全部）的最新监控数据和状态
+
+    服务器列表一次查询；最新数据优先读缓存，缓存未命中的服务器用一条 GROUP BY 查询批量读取后回填缓存
+    """
+    query = db.session.query(Server.id, Server.status)
+    if server_ids:
+        query = query.filter(Server.id.in_(server_ids))
+    servers = query.order_by(Server.id).all()
+    
+    entries = {server_id: latest_metrics.get(server_id) for server_id, _ in servers}
+    missing = [server_id for server_id, entry in entries.items() if entry is None]
+    if missing:
+        latest = db.session.query(
+            ServerMetric.server_id, db.func.max(ServerMetric.timestamp).label('timestamp')
+        ).filter(ServerMetric.server_id.in_(missing)).group_by(ServerMetric.server_id).subquery()
+        rows = ServerMetric.query.join(latest, db.and_(
+            ServerMetric.server_id == latest.c.server_id,
+            ServerMetric.timestamp == latest.c.timestamp
+        )).all()
+        found = {m.server_id: format_metric_row(m) for m in rows}
+        gpus = get_latest_gpu_metrics(list(found)) if found else {}
+        for server_id, metrics in found.items():
+            metrics['gpus'] = gpus.get(server_id, [])
+        for server_id in missing:
+            latest_metrics.fill(server_id, found.get(server_id))
+            entries[server_id] = latest_metrics.get(server_id)
+    
+    fleet = {}
+    for server_id, status in servers:
+        entry = entries[server_id]
+        metrics = entry.metrics if entry else None
+        if metrics:
+            # 列表接口不返回每核使用率，保持响应紧凑
+            metrics = {key: value for key, value in metrics.items() if key != 'cpu_per_core'}
+        gpus = (metrics or {}).get('gpus') or []
+        fleet[server_id] = {
+            # 采集器发布的状态比数据库中的状态更新
+            'status': (entry.status if entry and entry.status else status),
+            'metrics': metrics,
+            'gpu_count': len(gpus),
+            'gpu_free': sum(1 for gpu in gpus if is_gpu_free(gpu))
         }
-    return None
+    return {'servers': fleet, 'updated_at': datetime.utcnow().isoformat()}
+
+def get_server_metrics_last_modified(server_id):
+    """指定服务器最新一条监控数据的时间（历史数据的版本号，走 (server_id, timestamp) 索引）"""
+    return db.session.query(db.func.max(ServerMetric.timestamp)).filter(
+        ServerMetric.server_id == server_id
+    ).scalar()
 
-def get_server_metrics_history(server_id, hours=24):
-    """获取指定服务器的历史监控数据"""
+def get_server_metrics_history(server_id, hours=24, points=None, since=None):
+    """获取指定服务器的历史监控数据
+
+    points 为期望的数据点数（默认 Config.METRICS_HISTORY_TARGET_POINTS），
+    时间范围足够长时改用能提供该点数的最粗汇总粒度（1分钟/5分钟/1小时），否则返回原始数据。
+    since 为上次返回的最后一个时间戳时只返回其后的新数据；汇总数据会重新返回 since 所在的分桶（可能仍在更新）
+    """
     from datetime import timedelta
-    since = datetime.utcnow() - timedelta(hours=hours)
+    start = datetime.utcnow() - timedelta(hours=hours)
+    
+    resolution = select_resolution(hours, points or Config.METRICS_HISTORY_TARGET_POINTS)
+    if resolution:
+        return get_rollup_history(server_id, max(start, since) if since else start, resolution)
     
-    metrics = ServerMetric.query.filter(
+    # 已归档的自然日从归档文件读取，其余从数据库读取
+    history = read_archived_history(server_id, start, since) if Config.METRICS_ARCHIVE_ENABLED else []
+    
+    query = ServerMetric.query.filter(
         ServerMetric.server_id == server_id,
-        ServerMetric.timestamp >= since
-    ).order_by(ServerMetric.timestamp).all()
+        ServerMetric.timestamp >= start
+    )
+    if since:
+        query = query.filter(ServerMetric.timestamp > since)
+    metrics = query.order_by(ServerMetric.timestamp).all()
     
-    return [{
+    return history + [{
         'cpu_usage': m.cpu_usage,
         'memory_usage': m.memory_usage,
         'disk_usage': m.disk_usage,
+        'cpu_iowait': m.cpu_iowait,
+        'swap_usage': m.swap_usage,
+        'load1': m.load1,
+        'load5': m.load5,
+        'load15': m.load15,
+        'process_count': m.process_count,
+        'uptime_seconds': m.uptime_seconds,
+        'net_rx_rate': m.net_rx_rate,
+        'net_tx_rate': m.net_tx_rate,
+        'disk_read_rate': m.disk_read_rate,
+        'disk_write_rate': m.disk_write_rate,
+        'disk_read_iops': m.disk_read_iops,
+        'disk_write_iops': m.disk_write_iops,
         'timestamp': m.timestamp.isoformat()
-    } for m in metrics]
\ No newline at end of file
+    } for m in metrics]
+
+def get_server_gpu_history(server_id, hours=24):
+    """获取指定服务器每块GPU的历史数据 {gpu_index: [{utilization, memory_used, memory_total, temperature, timestamp}, ...]}
+
+    GPU数据只保留原始样本（不汇总、不归档），时间范围受 Config.METRICS_RAW_RETENTION_DAYS 限制
+    """
+    from datetime import timedelta
+    start = datetime.utcnow() - timedelta(hours=hours)
+    rows = ServerGpuMetric.query.filter(
+        ServerGpuMetric.server_id == server_id,
+        ServerGpuMetric.timestamp >= start
+    ).order_by(ServerGpuMetric.gpu_index, ServerGpuMetric.timestamp).all()
+    
+    history = {}
+    for gpu in rows:
+        history.setdefault(gpu.gpu_index, []).append({
+            'utilization': gpu.utilization,
+            'memory_used': gpu.memory_used,
+            'memory_total': gpu.memory_total,
+            'temperature': gpu.temperature,
+            'timestamp': gpu.timestamp.isoformat()
+        })
+    return history
+
+def get_server_user_usage(server_id):
+    """获取指定服务器最近一次采样中资源占用最多的用户
+
+    服务器账户名通过已批准申请的 server_username 关联到系统用户（优先匹配本服务器的申请）；
+    本服务器上没有指定 server_username 的已批准申请与账户管理使用相同的账户名：系统用户名或按姓名生成的用户名。
+    没有对应申请的账户（如 root、系统服务）user 为 None
+    """
+    latest = db.session.query(db.func.max(ServerUserUsage.timestamp)).filter(
+        ServerUserUsage.server_id == server_id
+    ).scalar()
+    if latest is None:
+        return {'server_id': server_id, 'timestamp': None, 'users': []}
+    
+    rows = ServerUserUsage.query.filter_by(server_id=server_id, timestamp=latest).order_by(
+        ServerUserUsage.cpu_percent.desc()).all()
+    usernames = {row.username for row in rows}
+    owners = {}
+    without_username = db.or_(Application.server_username.is_(None), Application.server_username == '')
+    applications = db.session.query(Application.server_username, Application.server_id, User).join(
+        User, Application.user_id == User.id
+    ).filter(Application.status == 'approved', db.or_(
+        Application.server_username.in_(usernames),
+        db.and_(Application.server_id == server_id, without_username)
+    )).all()
+    for server_username, application_server_id, user in applications:
+        if server_username and (server_username not in owners or application_server_id == server_id):
+            owners[server_username] = {'id': user.id, 'username': user.username, 'name': user.name}
+    
+    # 没有指定 server_username 的申请，明确指定的账户名优先
+    implicit_users = {user.id: user for server_username, _, user in applications if not server_username}
+    for user in implicit_users.values():
+        candidates = [user.username]
+        generated_username, _ = generate_username_for_user(user.name or user.username, server_id)
+        if generated_username:
+            candidates.append(generated_username)
+        for candidate in candidates:
+            if candidate in usernames and candidate not in owners:
+                owners[candidate] = {'id': user.id, 'username': user.username, 'name': user.name}
+                break
+    
+    return {
+        'server_id': server_id,
+        'timestamp': latest.isoformat(),
+        'users': [{
+            'username': row.username,
+            'cpu_percent': row.cpu_percent,
+            'memory_percent': row.memory_percent,
+            'rss_kb': row.rss_kb,
+            'process_count': row.process_count,
+            'gpu_memory': row.gpu_memory,
+            'user': owners.get(row.username)
+        } for row in rows]
+    }
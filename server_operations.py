@@ -12,6 +12,7 @@ import shlex
 from datetime import datetime
 from models import db, Server, User, PermissionType, Application
 from operation_log import OperationLogger
+from ssh_pool import ssh_pool
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -46,66 +47,32 @@ class ServerUserManager:
         return True, "组名合法"
         
     def connect(self):
-        """连接到服务器"""
+        """从共享连接池获取到服务器的连接"""
         try:
-            self.ssh_client = paramiko.SSHClient()
-            # 设置主机密钥策略 - 在生产环境中应该使用更严格的策略
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # 基础连接配置
-            connect_params = {
-                'hostname': self.server.host,
-                'port': self.server.port,
-                'username': self.server.username,
-                'timeout': 30,
-                'auth_timeout': 30,
-                'banner_timeout': 30
-            }
-            
-            # 根据认证类型设置认证参数
+            # 根据认证类型检查认证参数
             auth_type = getattr(self.server, 'auth_type', 'password') or 'password'
             
             if auth_type == 'key':
                 # 密钥认证
-                key_path = getattr(self.server, 'key_path', None)
-                if not key_path:
+                if not getattr(self.server, 'key_path', None):
                     raise ValueError("密钥认证需要提供密钥文件路径")
-                
-                try:
-                    # 尝试加载私钥
-                    private_key = paramiko.RSAKey.from_private_key_file(key_path)
-                    connect_params['pkey'] = private_key
-                except paramiko.SSHException:
-                    try:
-                        # 尝试DSA密钥
-                        private_key = paramiko.DSSKey.from_private_key_file(key_path)
-                        connect_params['pkey'] = private_key
-                    except paramiko.SSHException:
-                        try:
-                            # 尝试ECDSA密钥
-                            private_key = paramiko.ECDSAKey.from_private_key_file(key_path)
-                            connect_params['pkey'] = private_key
-                        except paramiko.SSHException:
-                            try:
-                                # 尝试Ed25519密钥
-                                private_key = paramiko.Ed25519Key.from_private_key_file(key_path)
-                                connect_params['pkey'] = private_key
-                            except paramiko.SSHException:
-                                raise ValueError(f"无法解析密钥文件: {key_path}")
-                
                 logger.info(f"使用密钥认证连接服务器 {self.server.name}")
             else:
                 # 密码认证
                 if not self.server.password:
                     raise ValueError("密码认证需要提供密码")
-                connect_params['password'] = self.server.password
                 logger.info(f"使用密码认证连接服务器 {self.server.name}")
             
             # 验证基础连接参数
             if not all([self.server.host, self.server.username]):
                 raise ValueError("服务器连接参数不完整")
             
-            self.ssh_client.connect(**connect_params)
+            self.ssh_client = ssh_pool.acquire(
+                self.server,
+                timeout=30,
+                auth_timeout=30,
+                banner_timeout=30
+            )
             
             # 验证连接是否真正可用
             test_command = "echo 'connection_test'"
@@ -118,19 +85,23 @@ class ServerUserManager:
             
         except paramiko.AuthenticationException:
             logger.error(f"服务器 {self.server.name} 认证失败")
-            return False
         except paramiko.SSHException as e:
             logger.error(f"SSH连接异常 {self.server.name}: {e}")
-            return False
         except Exception as e:
             logger.error(f"连接服务器 {self.server.name} 失败: {e}")
-            return False
+        
+        # 连接测试失败时丢弃池中可能已损坏的连接
+        if self.ssh_client:
+            ssh_pool.release(self.server, broken=True, client=self.ssh_client)
+            self.ssh_client = None
+        return False
     
     def disconnect(self):
-        """断开服务器连接"""
+        """归还服务器连接到连接池"""
         if self.ssh_client:
-            self.ssh_client.close()
-            logger.info(f"断开与服务器 {self.server.name} 的连接")
+            ssh_pool.release(self.server, client=self.ssh_client)
+            self.ssh_client = None
+            logger.info(f"释放与服务器 {self.server.name} 的连接")
     
     def execute_command(self, command, require_sudo=False, timeout=60):
         """执行SSH命令"""
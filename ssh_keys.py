@@ -0,0 +1,63 @@
+"""
+SSH私钥加载模块
+按 (路径, 修改时间) 缓存解析后的私钥对象，避免每次连接都重新读取并逐个尝试密钥类型
+"""
+
+import logging
+import os
+import threading
+import paramiko
+from cryptography.exceptions import UnsupportedAlgorithm
+
+logger = logging.getLogger(__name__)
+
+_key_cache = {}
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def load_private_key(key_path):
+    """加载私钥文件，返回 paramiko.PKey 对象
+
+    密钥类型由 paramiko.PKey.from_path 根据文件内容一次性识别（RSA/DSA/ECDSA/Ed25519），
+    解析结果按 (路径, 修改时间) 缓存，密钥文件被替换后自动重新加载。
+    """
+    key_path = os.path.expanduser(key_path)
+    try:
+        mtime = os.stat(key_path).st_mtime_ns
+    except OSError as e:
+        raise ValueError(f"无法读取密钥文件: {key_path} ({e})")
+
+    cache_key = (key_path, mtime)
+    with _cache_lock:
+        private_key = _key_cache.get(cache_key)
+        if private_key is not None:
+            _cache_stats['hits'] += 1
+            return private_key
+
+    try:
+        private_key = paramiko.PKey.from_path(key_path)
+    except (paramiko.SSHException, paramiko.pkey.UnknownKeyType, UnsupportedAlgorithm, ValueError, TypeError) as e:
+        raise ValueError(f"无法解析密钥文件: {key_path} ({e})")
+
+    with _cache_lock:
+        # 同一路径的旧版本密钥不再需要
+        for stale in [k for k in _key_cache if k[0] == key_path]:
+            del _key_cache[stale]
+        _key_cache[cache_key] = private_key
+        _cache_stats['misses'] += 1
+
+    logger.info(f"已加载 {private_key.get_name()} 私钥: {key_path}")
+    return private_key
+
+
+def key_cache_stats():
+    """私钥缓存统计信息"""
+    with _cache_lock:
+        return dict(_cache_stats, cached=len(_key_cache))
+
+
+def clear_key_cache():
+    """清空私钥缓存"""
+    with _cache_lock:
+        _key_cache.clear()
@@ -0,0 +1,257 @@
+"""
+SSH连接池模块
+按服务器ID复用已认证的SSH传输，供监控(ServerMonitor)和用户管理(ServerUserManager)共用
+"""
+
+import atexit
+import logging
+import threading
+import time
+import paramiko
+from config import Config
+from ssh_keys import load_private_key, key_cache_stats
+from server_health import server_health
+
+logger = logging.getLogger(__name__)
+
+
+def server_fingerprint(server):
+    """生成服务器连接参数指纹，主机/端口/凭据变化时指纹随之变化"""
+    return (
+        server.host,
+        server.port,
+        server.username,
+        getattr(server, 'auth_type', 'password') or 'password',
+        getattr(server, 'password', None),
+        getattr(server, 'key_path', None),
+    )
+
+
+class PooledConnection:
+    """连接池中的一条已认证连接"""
+
+    def __init__(self, client, fingerprint):
+        self.client = client
+        self.fingerprint = fingerprint
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.in_use = 0
+        self.stale = False  # 已从连接池移除，等待使用方全部归还后关闭
+
+    def is_alive(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+
+class SSHConnectionPool:
+    """进程级SSH连接池
+
+    - 以服务器ID为键保存已认证的 SSHClient，每次调用通过 exec_command 在同一传输上开新通道
+    - 传输开启 keepalive，空闲超过 idle_timeout 或已断开的连接会被回收
+    - 服务器的主机/端口/凭据变化后，旧连接在下一次获取时自动失效
+    - 新建连接受 server_health 熔断器保护，已知不可达的服务器直接抛出 ServerUnavailableError
+    - 被丢弃的连接如果仍有其他线程在使用，只标记为失效，等最后一个使用方归还后再关闭
+    """
+
+    def __init__(self, idle_timeout=None, keepalive_interval=None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else Config.SSH_POOL_IDLE_TIMEOUT
+        self.keepalive_interval = (keepalive_interval if keepalive_interval is not None
+                                   else Config.SSH_KEEPALIVE_INTERVAL)
+        self._connections = {}
+        self._retired = []  # 已移出连接池但仍在使用中的连接
+        self._server_locks = {}
+        self._lock = threading.Lock()
+        self.stats_counters = {'handshakes': 0, 'reused': 0, 'evicted': 0}
+
+    def _server_lock(self, server_id):
+        with self._lock:
+            lock = self._server_locks.get(server_id)
+            if lock is None:
+                lock = self._server_locks[server_id] = threading.Lock()
+            return lock
+
+    def _build_connect_params(self, server, timeout, extra_params):
+        """构建 paramiko 连接参数"""
+        connect_params = {
+            'hostname': server.host,
+            'port': server.port,
+            'username': server.username,
+            'timeout': timeout,
+        }
+        connect_params.update(extra_params)
+
+        # 根据认证类型设置认证参数
+        auth_type = getattr(server, 'auth_type', 'password') or 'password'
+
+        if auth_type == 'key':
+            # 密钥认证
+            key_path = getattr(server, 'key_path', None)
+            if key_path:
+                connect_params['pkey'] = load_private_key(key_path)
+        else:
+            # 密码认证
+            connect_params['password'] = server.password
+
+        return connect_params
+
+    def _open(self, server, timeout, extra_params):
+        """建立新的SSH连接（完整的TCP+密钥交换+认证握手）"""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(**self._build_connect_params(server, timeout, extra_params))
+
+        transport = client.get_transport()
+        if transport is not None and self.keepalive_interval:
+            transport.set_keepalive(self.keepalive_interval)
+
+        with self._lock:
+            self.stats_counters['handshakes'] += 1
+        logger.info(f"SSH连接池: 新建到服务器 {server.name} 的连接")
+        return client
+
+    def acquire(self, server, timeout=None, deadline=None, **extra_params):
+        """获取服务器的已认证SSH客户端，没有可用连接时新建
+
+        - 等待同一服务器上正在进行的握手最多 timeout 秒；设置了 deadline(time.monotonic()) 时
+          等待和新建连接合计不超过截止时间，等待超时按连接失败计入熔断器并抛出 TimeoutError
+        - extra_params 会透传给 paramiko.SSHClient.connect（仅在新建连接时生效）
+        """
+        self.evict_idle()
+        fingerprint = server_fingerprint(server)
+        timeout = timeout or Config.SSH_TIMEOUT
+        wait = timeout if deadline is None else min(timeout, deadline - time.monotonic())
+
+        server_lock = self._server_lock(server.id)
+        if wait <= 0 or not server_lock.acquire(timeout=wait):
+            error = TimeoutError(f"等待服务器 {server.name} 的连接超时")
+            server_health.record_failure(server.id, error)
+            raise error
+        try:
+            conn = self._connections.get(server.id)
+            if conn is not None and (conn.fingerprint != fingerprint or not conn.is_alive()):
+                reason = '连接参数已变化' if conn.fingerprint != fingerprint else '连接已断开'
+                logger.info(f"SSH连接池: 丢弃服务器 {server.name} 的旧连接（{reason}）")
+                self._discard(server.id)
+                conn = None
+
+            if conn is None:
+                # 已知不可达的服务器直接短路，不再等待连接超时
+                server_health.before_connect(server)
+                try:
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - time.monotonic())
+                        if timeout <= 0:
+                            raise TimeoutError(f"等待服务器 {server.name} 的连接超时")
+                    client = self._open(server, timeout, extra_params)
+                except Exception as e:
+                    server_health.record_failure(server.id, e)
+                    raise
+                server_health.record_success(server.id)
+                conn = PooledConnection(client, fingerprint)
+                with self._lock:
+                    self._connections[server.id] = conn
+                    conn.in_use += 1
+            else:
+                with self._lock:
+                    self.stats_counters['reused'] += 1
+                    conn.in_use += 1
+
+            conn.touch()
+            return conn.client
+        finally:
+            server_lock.release()
+
+    def release(self, server, broken=False, client=None):
+        """归还连接；broken=True 时将连接移出连接池，下次获取会重新握手
+
+        client 为获取到的 SSHClient，用于在连接已被替换后找到原连接；省略时归还池中的当前连接
+        """
+        to_close = None
+        with self._lock:
+            conn = self._connections.get(server.id)
+            if client is not None and (conn is None or conn.client is not client):
+                conn = next((retired for retired in self._retired if retired.client is client), None)
+            if conn is None:
+                return
+            conn.in_use = max(0, conn.in_use - 1)
+            conn.touch()
+            if broken and not conn.stale:
+                self._retire(server.id, conn)
+            if conn.stale and conn.in_use == 0:
+                if conn in self._retired:
+                    self._retired.remove(conn)
+                to_close = conn
+        if to_close is not None:
+            self._close(to_close)
+
+    def invalidate(self, server_id):
+        """移除指定服务器的连接并清除熔断状态（服务器配置修改或删除时调用）"""
+        with self._server_lock(server_id):
+            self._discard(server_id)
+        server_health.reset(server_id)
+
+    def _retire(self, server_id, conn):
+        """将连接移出连接池（需持有 self._lock）；仍在使用时放入待关闭列表"""
+        if self._connections.get(server_id) is conn:
+            del self._connections[server_id]
+        conn.stale = True
+        if conn.in_use:
+            self._retired.append(conn)
+
+    def _discard(self, server_id):
+        """移出连接池，没有使用方时立即关闭，否则等最后一个使用方归还后关闭"""
+        with self._lock:
+            conn = self._connections.get(server_id)
+            if conn is None:
+                return
+            self._retire(server_id, conn)
+            if conn.in_use:
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.client.close()
+        except Exception as e:
+            logger.warning(f"SSH连接池: 关闭连接失败: {e}")
+
+    def evict_idle(self):
+        """回收空闲超时或已断开的连接"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [server_id for server_id, conn in self._connections.items()
+                     if conn.in_use == 0 and
+                     (now - conn.last_used > self.idle_timeout or not conn.is_alive())]
+        for server_id in stale:
+            self._discard(server_id)
+        with self._lock:
+            self.stats_counters['evicted'] += len(stale)
+        return len(stale)
+
+    def close_all(self):
+        """关闭所有连接"""
+        with self._lock:
+            server_ids = list(self._connections.keys())
+        for server_id in server_ids:
+            self._discard(server_id)
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for conn in retired:
+            self._close(conn)
+
+    def stats(self):
+        """连接池统计信息"""
+        with self._lock:
+            active = len(self._connections)
+            in_use = sum(1 for conn in self._connections.values() if conn.in_use)
+            counters = dict(self.stats_counters, retired=len(self._retired))
+        return dict(counters, active=active, in_use=in_use, key_cache=key_cache_stats())
+
+
+# 进程级共享连接池
+ssh_pool = SSHConnectionPool()
+atexit.register(ssh_pool.close_all)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试监控告警规则引擎（直接构造规则快照），以及规则接口校验和写入器加载规则（使用 conftest.py 配置的临时数据库）
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from alert_engine import AlertEngine, Rule
+
+def make_rule(rule_id, **fields):
+    values = {'id': rule_id, 'name': f'rule-{rule_id}', 'server_id': None, 'operator': '>',
+              'duration': None, 'window': None, 'cooldown': 600}
+    values.update(fields)
+    return Rule(SimpleNamespace(**values))
+
+def run(engine, samples, start=datetime(2024, 1, 1)):
+    """按30秒间隔依次输入样本，返回 [(样本序号, 规则ID), ...]"""
+    fired = []
+    for i, sample in enumerate(samples):
+        for alert in engine.evaluate(1, sample, start + timedelta(seconds=30 * i)):
+            fired.append((i, alert['rule_id']))
+    return fired
+
+def test_alert_engine():
+    """测试各类规则的触发、去重和冷却"""
+    print("🧪 开始测试告警规则引擎...")
+
+    engine = AlertEngine()
+    engine.set_rules([
+        make_rule(1, metric='disk_usage', kind='threshold', threshold=90),
+        make_rule(2, metric='memory_usage', kind='sustained', threshold=95, duration=120),
+        make_rule(3, metric='disk_usage', kind='rate', threshold=5, window=300),
+        make_rule(4, metric='load1', kind='zscore', threshold=4, window=30),
+        make_rule(5, metric='cpu_usage', kind='threshold', threshold=50, server_id=2),
+    ])
+
+    samples = [{'disk_usage': 50.0, 'memory_usage': 50.0, 'load1': 1.0 + (i % 3) * 0.1, 'cpu_usage': 99.0}
+               for i in range(60)]
+    for i in range(10, 15):
+        samples[i]['disk_usage'] = 95.0  # 超过阈值：只触发一次
+    for i in range(20, 25):
+        samples[i]['disk_usage'] = 95.0  # 恢复后再次超过，但仍在冷却期内
+    for i in range(30, 36):
+        samples[i]['memory_usage'] = 97.0  # 持续 150 秒，第 4 个样本（120 秒）时触发
+    samples[50]['load1'] = 10.0  # 突增
+
+    fired = run(engine, samples)
+    print(f"🔍 [DEBUG] 触发的告警: {fired}")
+
+    assert (10, 1) in fired and not any(rule == 1 and i >= 20 for i, rule in fired)
+    assert (34, 2) in fired and sum(1 for _, rule in fired if rule == 2) == 1
+    # 磁盘使用率从 50% 跳到 95%，变化速率远超 5%/分钟
+    assert (10, 3) in fired
+    assert (50, 4) in fired
+    # 规则 5 只适用于服务器 2
+    assert not any(rule == 5 for _, rule in fired)
+
+    # 修改规则参数后状态重置，未修改的规则保留状态
+    engine.set_rules([make_rule(1, metric='disk_usage', kind='threshold', threshold=80)])
+    assert engine.evaluate(1, {'disk_usage': 85.0}, datetime(2024, 1, 2))
+
+    print("✅ 告警规则引擎测试通过")
+
+def test_alert_rules_loading():
+    """测试写入器在第一次写入数据库之前就加载规则，Z分数规则的窗口不能少于最少样本数"""
+    print("🧪 开始测试告警规则加载和校验...")
+    from app import app, create_tables
+    from models import db, User, AlertRule
+    from alert_engine import alert_engine
+    from server_monitor import MetricsWriter
+    from config import Config
+    create_tables()
+
+    client = app.test_client()
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').first().id
+    with client.session_transaction() as session:
+        session['user_id'] = admin_id
+
+    # 窗口小于 ALERT_ZSCORE_MIN_SAMPLES 的Z分数规则永远不会触发，拒绝保存
+    rule = {'name': 'load spike', 'metric': 'load1', 'kind': 'zscore', 'threshold': 4}
+    for window in (1, Config.ALERT_ZSCORE_MIN_SAMPLES - 1):
+        response = client.post('/api/alert_rules', json=dict(rule, window=window))
+        print(f"🔍 [DEBUG] window={window}: {response.status_code} {response.get_json()}")
+        assert response.status_code == 400
+    assert client.post('/api/alert_rules', json=dict(rule, window=Config.ALERT_ZSCORE_MIN_SAMPLES)).status_code == 200
+    # 未填写窗口时使用默认窗口
+    assert client.post('/api/alert_rules', json=rule).status_code == 200
+    response = client.post('/api/alert_rules', json={'name': 'cpu high', 'metric': 'cpu_usage',
+                                                     'kind': 'threshold', 'threshold': 90})
+    assert response.status_code == 200
+
+    # 新进程的写入器：第一条样本即按数据库中的规则判断，不必等到第一次 flush
+    alert_engine.set_rules([])
+    alert_engine.invalidate_rules()
+    writer = MetricsWriter()
+    sample = {'cpu_usage': 99.0, 'memory_usage': 50.0, 'disk_usage': 40.0, 'load_average': '0.10, 0.10, 0.10',
+              'timestamp': datetime.utcnow()}
+    with app.app_context():
+        writer.add(-1, sample)
+        print(f"🔍 [DEBUG] 待写入告警: {writer._alerts}")
+        assert [alert['rule_name'] for alert in writer._alerts] == ['cpu high']
+
+        AlertRule.query.delete()
+        db.session.commit()
+    alert_engine.invalidate_rules()
+
+    print("✅ 告警规则加载和校验测试通过")
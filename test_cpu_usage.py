@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+测试按两次 /proc/stat 计数差值计算CPU使用率、iowait/steal 占比和每核使用率（使用预先录制的 /proc/stat 输出）
+"""
+from server_monitor import parse_cpu_counters, compute_cpu_usage
+
+# cpu user nice system idle iowait irq softirq steal guest guest_nice
+FIRST_STAT = """cpu  1000 0 500 8000 200 0 0 100 50 0
+""" + "".join(f"cpu{i} 100 0 50 800 20 0 0 10 0 0\n" for i in range(12))
+
+# 总计数增加 1000：user+system 500、idle 300、iowait 100、steal 100；cpu10 满载，cpu2 空闲
+SECOND_STAT = """cpu  1400 0 600 8300 300 0 0 200 50 0
+""" + "".join(
+    f"cpu{i} {100 + (100 if i == 10 else 10)} 0 50 {800 + (0 if i == 10 else 90)} 20 0 0 10 0 0\n"
+    if i != 2 else "cpu2 100 0 50 900 20 0 0 10 0 0\n"
+    for i in range(12))
+
+def test_cpu_usage():
+    """测试首次采集为空、差值计算、每核排序和计数回绕"""
+    print("🧪 开始测试CPU使用率差值计算...")
+    server_id = -101
+
+    first = parse_cpu_counters(FIRST_STAT.splitlines())
+    assert first['cpu'] == [1000, 0, 500, 8000, 200, 0, 0, 100]
+    # 首次采集没有基准
+    assert compute_cpu_usage(server_id, first) == {'cpu_usage': None, 'cpu_iowait': None,
+                                                   'cpu_steal': None, 'cpu_per_core': None}
+
+    usage = compute_cpu_usage(server_id, parse_cpu_counters(SECOND_STAT.splitlines()))
+    print(f"🔍 [DEBUG] CPU使用率: {usage}")
+    # 使用率不含 idle 和 iowait，steal 计入使用率
+    assert usage['cpu_usage'] == 60.0 and usage['cpu_iowait'] == 10.0 and usage['cpu_steal'] == 10.0
+    # 每核按编号数值排序（cpu10 在 cpu9 之后，而不是 cpu1 之后）
+    assert len(usage['cpu_per_core']) == 12
+    assert usage['cpu_per_core'][10] == 100.0 and usage['cpu_per_core'][2] == 0.0
+    assert usage['cpu_per_core'][1] == 10.0
+
+    # 两次计数相同（没有经过时间）时为空
+    assert compute_cpu_usage(server_id, parse_cpu_counters(SECOND_STAT.splitlines()))['cpu_usage'] is None
+
+    # 服务器重启后计数变小：本次为空，下一次以重启后的计数为基准
+    assert compute_cpu_usage(server_id, first)['cpu_usage'] is None
+    assert compute_cpu_usage(server_id, parse_cpu_counters(SECOND_STAT.splitlines()))['cpu_usage'] == 60.0
+
+    print("✅ CPU使用率差值计算测试通过")
+
+if __name__ == "__main__":
+    test_cpu_usage()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+测试 Server-Sent Events 推送接口：连接到期后结束响应，连接数已满时返回204（使用 conftest.py 配置的临时数据库）
+"""
+import time
+from unittest import mock
+from app import app, create_tables
+from config import Config
+from event_bus import event_bus
+
+def test_event_stream_limits():
+    """测试推送连接的最长保持时间和每进程连接数上限"""
+    print("🧪 开始测试推送连接限制...")
+    create_tables()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    with mock.patch.object(Config, 'SSE_MAX_LIFETIME', 0.3), mock.patch.object(Config, 'SSE_MAX_CONNECTIONS', 1):
+        # 到期后响应结束，连接从事件总线移除
+        started = time.monotonic()
+        response = client.get('/api/events?channels=metrics')
+        body = response.get_data(as_text=True)
+        elapsed = time.monotonic() - started
+        print(f"🔍 [DEBUG] 推送响应 {elapsed:.2f} 秒后结束: {body!r}")
+        assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+        assert 'event: hello' in body and 'event: notifications' in body
+        assert elapsed < 2 and event_bus.subscriber_count() == 0
+
+        # 连接数已满时返回204，页面回退为轮询
+        held = event_bus.subscribe(['metrics'])
+        try:
+            assert client.get('/api/events?channels=metrics').status_code == 204
+        finally:
+            held.close()
+        response = client.get('/api/events')
+        assert response.status_code == 200 and 'event: hello' in response.get_data(as_text=True)
+        assert event_bus.subscriber_count() == 0
+
+    print("✅ 推送连接限制测试通过")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+测试采集脚本输出中的GPU数据解析（使用预先录制的 nvidia-smi 输出）
+"""
+from server_monitor import parse_gpu_metrics, parse_probe_metrics, is_gpu_free
+
+# nvidia-smi --query-gpu=index,utilization.gpu,memory.used,memory.total,temperature.gpu --format=csv,noheader,nounits
+NVIDIA_SMI_OUTPUT = """0, 97, 38120, 40960, 71
+1, 0, 4, 40960, 34
+2, [N/A], 1024, 40960, [Not Supported]
+"""
+
+def test_gpu_metrics(probe_output):
+    """测试 nvidia-smi 输出解析和空闲GPU判定"""
+    print("🧪 开始测试GPU监控数据解析...")
+
+    gpus = parse_gpu_metrics(NVIDIA_SMI_OUTPUT.strip().splitlines())
+    for gpu in gpus:
+        print(f"🔍 [DEBUG] GPU {gpu['index']}: {gpu}, 空闲: {is_gpu_free(gpu)}")
+
+    assert [gpu['index'] for gpu in gpus] == [0, 1, 2]
+    assert gpus[0] == {'index': 0, 'utilization': 97.0, 'memory_used': 38120.0,
+                       'memory_total': 40960.0, 'temperature': 71.0}
+    # 不支持的字段解析为 None
+    assert gpus[2]['utilization'] is None and gpus[2]['temperature'] is None
+    assert [is_gpu_free(gpu) for gpu in gpus] == [False, True, False]
+
+    # 采集脚本中的GPU段
+    metrics = parse_probe_metrics(probe_output + "@@gpu\n" + NVIDIA_SMI_OUTPUT)
+    assert metrics is not None and len(metrics['gpus']) == 3
+
+    # 没有 nvidia-smi 的主机GPU段为空
+    metrics = parse_probe_metrics(probe_output)
+    assert metrics is not None and metrics['gpus'] == []
+
+    print("✅ GPU监控数据解析测试通过")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试采集脚本输出中的网络/磁盘吞吐解析和差值计算（使用预先录制的 /proc 输出）
+"""
+from server_monitor import (parse_probe_metrics, parse_net_counters, parse_disk_counters, parse_filesystems,
+                            compute_io_rates)
+
+NET_DEV_OUTPUT = """Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: 5000 50 0 0 0 0 0 0 5000 50 0 0 0 0 0 0
+  eth0: {rx} 100 0 0 0 0 0 0 {tx} 100 0 0 0 0 0 0
+veth1a2b: 777 7 0 0 0 0 0 0 777 7 0 0 0 0 0 0
+"""
+
+DISKSTATS_OUTPUT = """   7       0 loop0 50 0 100 0 0 0 0 0 0 0 0
+   8       0 sda {reads} 0 {read_sectors} 0 {writes} 0 {write_sectors} 0 0 0 0
+   8       1 sda1 10 0 20 0 10 0 20 0 0 0 0
+ 259       0 nvme0n1 0 0 0 0 0 0 0 0 0 0 0
+ 259       1 nvme0n1p1 0 0 0 0 0 0 0 0 0 0 0
+"""
+
+# LVM + 软RAID 主机：dm-*/md* 由 sdb/sdaa 组成，dm-10/md12 与 dm-1/md1 名称前缀相同
+STACKED_DISKSTATS_OUTPUT = """   8       0 sda 10 0 20 0 10 0 20 0 0 0 0
+   8       1 sda1 10 0 20 0 10 0 20 0 0 0 0
+  65     160 sdaa {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+  65     161 sdaa1 {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+   8      16 sdb {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+   9       1 md1 {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+   9      12 md12 {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+ 259       2 md12p1 {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+ 253       1 dm-1 {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+ 253      10 dm-10 {sectors} 0 {sectors} 0 0 0 0 0 0 0 0
+ 179       0 mmcblk0 0 0 0 0 0 0 0 0 0 0 0
+ 179       1 mmcblk0p1 0 0 0 0 0 0 0 0 0 0 0
+"""
+
+# ls -d /sys/class/block/*/partition 列出的分区名
+PARTITIONS_OUTPUT = """sda1
+sdaa1
+md12p1
+mmcblk0p1
+"""
+
+DF_OUTPUT = """/dev/sda1 100000 40000 60000 40% /
+/dev/sdb1 1000000 900000 100000 90% /data
+/dev/sdb1 1000000 900000 100000 90% /home/shared
+/dev/sda2 500000 100000 400000 20% /boot
+"""
+
+def test_io_rates():
+    """测试网络/磁盘计数解析和差值计算"""
+    print("🧪 开始测试网络/磁盘吞吐计算...")
+
+    net = parse_net_counters(NET_DEV_OUTPUT.format(rx=1000, tx=2000).splitlines())
+    assert net == {'eth0': (1000, 2000)}
+    disk = parse_disk_counters(DISKSTATS_OUTPUT.format(reads=100, read_sectors=200,
+                                                       writes=300, write_sectors=400).splitlines())
+    assert set(disk) == {'sda', 'nvme0n1'}
+    assert disk['sda'] == (100, 200 * 512, 300, 400 * 512)
+
+    filesystems = parse_filesystems(DF_OUTPUT.splitlines())
+    print(f"🔍 [DEBUG] 文件系统: {filesystems}")
+    assert [fs['mount'] for fs in filesystems] == ['/', '/data']
+    assert filesystems[1]['usage'] == 90.0
+
+    # 首次采集没有基准，10秒后第二次采集按差值计算
+    first = compute_io_rates(-1, {'clock': 100.0, 'net': net, 'disk': disk})
+    assert first['net_rx_rate'] is None and first['network'] == []
+    net = parse_net_counters(NET_DEV_OUTPUT.format(rx=11000, tx=7000).splitlines())
+    disk = parse_disk_counters(DISKSTATS_OUTPUT.format(reads=150, read_sectors=2200,
+                                                       writes=400, write_sectors=400).splitlines())
+    rates = compute_io_rates(-1, {'clock': 110.0, 'net': net, 'disk': disk})
+    print(f"🔍 [DEBUG] 吞吐: {rates}")
+    assert rates['net_rx_rate'] == 1000.0 and rates['net_tx_rate'] == 500.0
+    sda = [d for d in rates['disk_io'] if d['device'] == 'sda'][0]
+    assert sda['read_iops'] == 5.0 and sda['write_iops'] == 10.0
+    assert sda['read_bytes_per_sec'] == 2000 * 512 / 10 and sda['write_bytes_per_sec'] == 0.0
+
+    # 计数回绕（网卡重置）时不产生负值
+    net = parse_net_counters(NET_DEV_OUTPUT.format(rx=10, tx=10).splitlines())
+    rates = compute_io_rates(-1, {'clock': 120.0, 'net': net, 'disk': disk})
+    assert rates['network'][0]['rx_bytes_per_sec'] is None and rates['net_rx_rate'] is None
+
+    print("✅ 网络/磁盘吞吐计算测试通过")
+
+def test_stacked_devices(probe_output):
+    """测试分区识别不误删名称前缀相同的设备，LVM/软RAID 设备不计入总吞吐"""
+    print("🧪 开始测试分区识别和叠加设备...")
+
+    whole_disks = {'sda', 'sdaa', 'sdb', 'md1', 'md12', 'dm-1', 'dm-10', 'mmcblk0'}
+    lines = STACKED_DISKSTATS_OUTPUT.format(sectors=0).splitlines()
+    # 按 /sys/class/block 的分区列表识别
+    assert set(parse_disk_counters(lines, PARTITIONS_OUTPUT.splitlines())) == whole_disks
+    # 没有分区列表时按设备名识别
+    assert set(parse_disk_counters(lines)) == whole_disks
+    assert set(parse_disk_counters(lines, [])) == whole_disks
+
+    # 采集脚本中的 partitions 段
+    probe = probe_output + "@@diskstats\n" + STACKED_DISKSTATS_OUTPUT.format(sectors=0) + \
+        "@@partitions\n" + PARTITIONS_OUTPUT
+    metrics = parse_probe_metrics(probe)
+    assert set(metrics['io_counters']['disk']) == whole_disks
+
+    # 每块设备10秒内读写1000个扇区：总吞吐只统计 sdaa 和 sdb
+    first = parse_disk_counters(lines, PARTITIONS_OUTPUT.splitlines())
+    compute_io_rates(-2, {'clock': 100.0, 'net': {}, 'disk': first})
+    second = parse_disk_counters(STACKED_DISKSTATS_OUTPUT.format(sectors=1000).splitlines(),
+                                 PARTITIONS_OUTPUT.splitlines())
+    rates = compute_io_rates(-2, {'clock': 110.0, 'net': {}, 'disk': second})
+    print(f"🔍 [DEBUG] 吞吐: {rates}")
+    assert {d['device'] for d in rates['disk_io']} == whole_disks
+    assert rates['disk_read_rate'] == 2 * 1000 * 512 / 10
+    assert rates['disk_read_iops'] == 2 * 1000 / 10
+
+    print("✅ 分区识别和叠加设备测试通过")
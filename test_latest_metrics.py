@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试最新监控数据缓存：采集器发布的数据优先，冷启动时回退到数据库并回填，回填数据按采集周期过期；
+以及服务器群最新数据接口 /api/fleet_metrics（使用 conftest.py 配置的临时数据库）
+"""
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+from app import app, create_tables
+from models import db, Server, ServerMetric
+from metrics_cache import latest_metrics
+
+def add_metric(server_id, timestamp, cpu_usage):
+    db.session.add(ServerMetric(server_id=server_id, cpu_usage=cpu_usage, memory_usage=50.0, disk_usage=40.0,
+                                load_average='0.10, 0.10, 0.10', timestamp=timestamp))
+    db.session.commit()
+
+def make_client():
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+def test_latest_metrics_cache():
+    """测试 /api/server_metrics 冷启动读数据库、之后读缓存，以及回填数据过期后重新查询"""
+    print("🧪 开始测试最新监控数据缓存...")
+    create_tables()
+    latest_metrics.clear()
+
+    now = datetime.utcnow()
+    with app.app_context():
+        server = Server(name='cache-test', host='127.0.0.1', port=22, username='test', password='test')
+        db.session.add(server)
+        db.session.commit()
+        server_id = server.id
+        add_metric(server_id, now - timedelta(minutes=1), 10.0)
+
+    client = make_client()
+    url = f'/api/server_metrics/{server_id}'
+    with mock.patch.object(latest_metrics, 'fallback_max_age', 0.2):
+        # 冷启动：缓存为空，回退到数据库并回填缓存
+        assert client.get(url).get_json()['cpu_usage'] == 10.0
+        assert latest_metrics.get(server_id) is not None
+
+        # 回填数据未过期时不再查询数据库
+        with app.app_context():
+            add_metric(server_id, now, 20.0)
+        assert client.get(url).get_json()['cpu_usage'] == 10.0
+
+        # 回填数据过期后重新查询数据库
+        time.sleep(0.25)
+        assert client.get(url).get_json()['cpu_usage'] == 20.0
+
+    # 采集器发布的数据直接返回；服务器不可达时保留上一条数据，只更新状态
+    latest_metrics.publish(server_id, {'cpu_usage': 30.0, 'gpus': []})
+    assert client.get(url).get_json()['cpu_usage'] == 30.0
+    latest_metrics.publish(server_id, None, status='offline')
+    entry = latest_metrics.get(server_id)
+    print(f"🔍 [DEBUG] 缓存条目: {entry.metrics}, 状态: {entry.status}")
+    assert entry.status == 'offline' and entry.metrics['cpu_usage'] == 30.0
+
+    # 没有任何监控数据的服务器返回空对象
+    latest_metrics.invalidate(server_id)
+    with app.app_context():
+        ServerMetric.query.filter_by(server_id=server_id).delete()
+        db.session.commit()
+    assert client.get(url).get_json() == {}
+
+    with app.app_context():
+        db.session.delete(db.session.get(Server, server_id))
+        db.session.commit()
+    latest_metrics.clear()
+
+    print("✅ 最新监控数据缓存测试通过")
+
+def test_fleet_metrics_api():
+    """测试 /api/fleet_metrics 合并缓存和数据库数据、按 ids 过滤，以及无效的 ids 返回 400"""
+    print("🧪 开始测试服务器群最新数据接口...")
+    create_tables()
+    latest_metrics.clear()
+
+    now = datetime.utcnow()
+    with app.app_context():
+        servers = [Server(name=name, host='127.0.0.1', port=22, username='test', password='test', status='online')
+                   for name in ('fleet-cached', 'fleet-db', 'fleet-empty')]
+        db.session.add_all(servers)
+        db.session.commit()
+        cached, from_db, empty = [server.id for server in servers]
+        add_metric(cached, now, 10.0)
+        add_metric(from_db, now - timedelta(minutes=2), 40.0)
+        add_metric(from_db, now, 50.0)
+
+    # 一台服务器由采集器发布（状态比数据库新），一台只有数据库数据，一台没有数据
+    latest_metrics.publish(cached, {'cpu_usage': 90.0, 'cpu_per_core': [90.0],
+                                    'gpus': [{'index': 0, 'utilization': 0.0, 'memory_used': 4.0,
+                                              'memory_total': 40960.0, 'temperature': 30.0}]})
+    latest_metrics.publish(cached, None, status='offline')
+
+    client = make_client()
+    ids = f'{cached},{from_db},{empty}'
+    servers = client.get(f'/api/fleet_metrics?ids={ids}').get_json()['servers']
+    print(f"🔍 [DEBUG] 服务器群数据: {servers}")
+    assert set(servers) == {str(cached), str(from_db), str(empty)}
+    assert servers[str(cached)]['status'] == 'offline' and servers[str(cached)]['metrics']['cpu_usage'] == 90.0
+    # 列表接口不返回每核使用率
+    assert 'cpu_per_core' not in servers[str(cached)]['metrics']
+    assert servers[str(cached)]['gpu_count'] == 1 and servers[str(cached)]['gpu_free'] == 1
+    # 缓存未命中时读取数据库中的最新一条并回填缓存
+    assert servers[str(from_db)]['status'] == 'online' and servers[str(from_db)]['metrics']['cpu_usage'] == 50.0
+    assert latest_metrics.get(from_db).metrics['cpu_usage'] == 50.0
+    assert servers[str(empty)]['metrics'] is None and servers[str(empty)]['gpu_count'] == 0
+
+    # ids 过滤；空的 ids 返回全部服务器
+    servers = client.get(f'/api/fleet_metrics?ids={from_db}').get_json()['servers']
+    assert list(servers) == [str(from_db)]
+    servers = client.get('/api/fleet_metrics?ids=').get_json()['servers']
+    assert {str(cached), str(from_db), str(empty)} <= set(servers)
+    for bad_ids in ('abc', f'{cached},x', '1.5'):
+        response = client.get(f'/api/fleet_metrics?ids={bad_ids}')
+        assert response.status_code == 400 and response.get_json()['success'] is False, bad_ids
+
+    with app.app_context():
+        server_ids = [cached, from_db, empty]
+        ServerMetric.query.filter(ServerMetric.server_id.in_(server_ids)).delete()
+        Server.query.filter(Server.id.in_(server_ids)).delete()
+        db.session.commit()
+    latest_metrics.clear()
+
+    print("✅ 服务器群最新数据接口测试通过")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+测试监控历史数据降采样（LTTB 选点和按桶平均）以及接口的 max_points 参数校验
+"""
+import math
+from datetime import datetime, timedelta
+from metric_downsample import downsample_history, lttb_indices, MIN_DOWNSAMPLE_POINTS
+
+def make_points(count):
+    """每30秒一个样本：CPU为带尖峰的正弦曲线，磁盘使用率恒定"""
+    start = datetime(2024, 1, 1)
+    points = []
+    for i in range(count):
+        points.append({
+            'cpu_usage': 100.0 if i == count // 3 else round(50 + 20 * math.sin(i / 10), 2),
+            'memory_usage': None if i % 7 == 0 else 60.0 + i % 5,
+            'disk_usage': 42.0,
+            'timestamp': (start + timedelta(seconds=30 * i)).isoformat()
+        })
+    return points
+
+def test_lttb():
+    """测试 LTTB：点数不超过 max_points，保留首尾点和尖峰，结果为原始点的子集"""
+    print("🧪 开始测试 LTTB 降采样...")
+
+    points = make_points(1000)
+    for max_points in (MIN_DOWNSAMPLE_POINTS, 10, 99, 500):
+        result = downsample_history(points, max_points, 'lttb')
+        print(f"🔍 [DEBUG] max_points={max_points}: {len(result)} 个点")
+        assert len(result) == max_points
+        assert result[0] is points[0] and result[-1] is points[-1]
+        timestamps = [p['timestamp'] for p in result]
+        assert timestamps == sorted(set(timestamps))
+    assert any(p['cpu_usage'] == 100.0 for p in downsample_history(points, 50, 'lttb'))
+
+    # 点数不多于 max_points 时原样返回
+    assert downsample_history(points[:20], 50, 'lttb') == points[:20]
+    assert list(lttb_indices([0.0, 1.0], [0.0, 1.0], 5)) == [0, 1]
+
+    print("✅ LTTB 降采样测试通过")
+
+def test_bucket_average():
+    """测试按桶平均：点数不超过 max_points，覆盖首尾时间，忽略缺失值"""
+    print("🧪 开始测试按桶平均降采样...")
+
+    points = make_points(1000)
+    for max_points in (MIN_DOWNSAMPLE_POINTS, 10, 99, 500):
+        result = downsample_history(points, max_points, 'avg')
+        assert len(result) == max_points
+        assert points[0]['timestamp'] <= result[0]['timestamp'] <= result[-1]['timestamp'] <= points[-1]['timestamp']
+        assert all(p['disk_usage'] == 42.0 for p in result)
+        assert all(p['memory_usage'] is not None for p in result)
+
+    # 每桶平均值的加权平均等于原始平均值（1000点分为10个等大的桶）
+    result = downsample_history(points, 10, 'avg')
+    raw_mean = sum(p['cpu_usage'] for p in points) / len(points)
+    assert abs(sum(p['cpu_usage'] for p in result) / len(result) - raw_mean) < 0.01
+
+    print("✅ 按桶平均降采样测试通过")
+
+def test_max_points_validation():
+    """测试 max_points 少于3时函数抛出 ValueError，接口返回400"""
+    print("🧪 开始测试 max_points 参数校验...")
+
+    points = make_points(100)
+    for method in ('lttb', 'avg'):
+        for max_points in (-3, 0, 2):
+            try:
+                downsample_history(points, max_points, method)
+                raise AssertionError(f'{method} max_points={max_points} 未报错')
+            except ValueError:
+                pass
+    assert downsample_history(points, None) is points
+
+    from app import app
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    for url in ('/api/server_metrics_history/1', '/api/server_gpu_history/1'):
+        for query in ('max_points=-3&method=avg', 'max_points=2', 'max_points=0'):
+            response = client.get(f'{url}?{query}')
+            print(f"🔍 [DEBUG] {url}?{query}: {response.status_code}")
+            assert response.status_code == 400
+
+    print("✅ max_points 参数校验测试通过")
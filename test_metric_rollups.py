@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+测试监控数据降采样汇总：增量汇总、历史数据回填和汇总粒度选择（使用临时数据库）
+"""
+import os
+import tempfile
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+os.environ.setdefault('MONITOR_SCHEDULER_ENABLED', '0')
+
+import random
+from datetime import datetime, timedelta
+from app import app, create_tables
+from models import db, Server, ServerMetric, ServerMetricRollup
+from metric_rollups import upsert_rollups, backfill_rollups, select_resolution, bucket_start, ROLLUP_METRICS
+from config import Config
+
+def make_rows(server_id, start, count):
+    """每7秒一个样本，内存使用率偶尔缺失"""
+    rng = random.Random(42)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'server_id': server_id,
+            'cpu_usage': round(rng.uniform(0, 100), 2),
+            'memory_usage': None if i % 11 == 0 else round(rng.uniform(20, 80), 2),
+            'disk_usage': 40.0 + i * 0.01,
+            'load_average': '0.00, 0.00, 0.00',
+            'timestamp': start + timedelta(seconds=7 * i)
+        })
+    return rows
+
+def expected_rollups(rows, resolution):
+    """直接由原始样本计算每个分桶的 平均值/最小值/最大值/有效样本数"""
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(bucket_start(row['timestamp'], resolution), []).append(row)
+    expected = {}
+    for start, bucket in buckets.items():
+        values = {'sample_count': len(bucket)}
+        for prefix, field in ROLLUP_METRICS.items():
+            present = [row[field] for row in bucket if row[field] is not None]
+            values[prefix] = (sum(present) / len(present) if present else None,
+                              min(present, default=None), max(present, default=None), len(present))
+        expected[start] = values
+    return expected
+
+def stored_rollups(server_id, resolution):
+    rollups = ServerMetricRollup.query.filter_by(server_id=server_id, resolution=resolution).all()
+    stored = {}
+    for rollup in rollups:
+        values = {'sample_count': rollup.sample_count}
+        for prefix in ROLLUP_METRICS:
+            count = getattr(rollup, f'{prefix}_count')
+            values[prefix] = (getattr(rollup, f'{prefix}_sum') / count if count else None,
+                              getattr(rollup, f'{prefix}_min'), getattr(rollup, f'{prefix}_max'), count)
+        stored[rollup.bucket_start] = values
+    return stored
+
+def assert_matches(stored, expected):
+    assert stored.keys() == expected.keys()
+    for start, values in expected.items():
+        assert stored[start]['sample_count'] == values['sample_count']
+        for prefix in ROLLUP_METRICS:
+            avg, low, high, count = stored[start][prefix]
+            expected_avg, expected_low, expected_high, expected_count = values[prefix]
+            assert (low, high, count) == (expected_low, expected_high, expected_count), (start, prefix)
+            assert (avg is None and expected_avg is None) or abs(avg - expected_avg) < 1e-9
+
+def test_metric_rollups():
+    """测试增量汇总和回填结果与原始数据一致，回填可重复执行"""
+    print("🧪 开始测试监控数据汇总...")
+    create_tables()
+
+    with app.app_context():
+        server = Server(name='rollup-test', host='127.0.0.1', port=22, username='test', password='test')
+        db.session.add(server)
+        db.session.commit()
+        server_id = server.id
+        rows = make_rows(server_id, datetime(2024, 1, 1, 0, 3, 5), 1200)
+
+        # 增量汇总：分两批写入，第二批与第一批的最后一个分桶重叠
+        ServerMetricRollup.query.delete()
+        upsert_rollups(rows[:500])
+        upsert_rollups(rows[500:])
+        db.session.commit()
+        for resolution in Config.METRICS_ROLLUP_RESOLUTIONS:
+            stored = stored_rollups(server_id, resolution)
+            print(f"🔍 [DEBUG] {resolution}秒粒度: {len(stored)} 个分桶")
+            assert_matches(stored, expected_rollups(rows, resolution))
+
+        # 回填：汇总表为空时由原始数据重建，结果与增量汇总一致
+        db.session.execute(ServerMetric.__table__.insert(), rows)
+        ServerMetricRollup.query.delete()
+        db.session.commit()
+        assert backfill_rollups() > 0
+        for resolution in Config.METRICS_ROLLUP_RESOLUTIONS:
+            assert_matches(stored_rollups(server_id, resolution), expected_rollups(rows, resolution))
+
+        # 重复回填不会重复累加
+        total = ServerMetricRollup.query.count()
+        assert backfill_rollups() == 0
+        assert ServerMetricRollup.query.count() == total
+        assert_matches(stored_rollups(server_id, 60), expected_rollups(rows, 60))
+
+        ServerMetric.query.filter_by(server_id=server_id).delete()
+        ServerMetricRollup.query.filter_by(server_id=server_id).delete()
+        db.session.delete(server)
+        db.session.commit()
+
+    # 粒度选择：点数足够时用最粗粒度，短时间范围使用原始数据
+    assert select_resolution(1, 300) is None
+    assert select_resolution(24, 300) == 60
+    assert select_resolution(24 * 7, 300) == 300
+    assert select_resolution(24 * 90, 300) == 3600
+
+    print("✅ 监控数据汇总测试通过")
+
+if __name__ == "__main__":
+    test_metric_rollups()
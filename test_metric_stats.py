@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试服务器群监控统计：分组百分位数与 numpy.percentile 一致，以及统计接口的排序（使用 conftest.py 配置的临时数据库）
+"""
+from datetime import datetime
+import numpy as np
+from app import app, create_tables
+from models import db, User, Server, ServerMetric
+from metric_stats import group_percentile, group_stats
+from config import Config
+
+def test_group_percentile():
+    """测试分组百分位数、平均值和最大值与逐组 numpy 计算结果一致（含 NaN 和空分组）"""
+    print("🧪 开始测试分组百分位数...")
+
+    rng = np.random.default_rng(3)
+    group_count = 6
+    groups = rng.integers(0, group_count - 1, size=5000)  # 最后一个分组没有样本
+    values = rng.gamma(2.0, 20.0, size=5000)
+    values[rng.random(5000) < 0.05] = np.nan
+    groups[:3], values[:3] = 4, np.nan  # 分组4包含 NaN
+
+    for q in (0, 1, 50, 95, 99.9, 100):
+        result = group_percentile(groups, values, group_count, q)
+        for g in range(group_count):
+            present = values[(groups == g) & ~np.isnan(values)]
+            if len(present):
+                assert np.isclose(result[g], np.percentile(present, q)), (q, g)
+            else:
+                assert np.isnan(result[g])
+
+    stats = group_stats(groups, values, group_count)
+    for g in range(group_count - 1):
+        present = values[(groups == g) & ~np.isnan(values)]
+        assert np.isclose(stats['mean'][g], present.mean()) and stats['max'][g] == present.max()
+        assert np.isclose(stats['p95'][g], np.percentile(present, 95))
+    assert np.isnan(stats['mean'][-1]) and np.isnan(stats['max'][-1])
+
+    # 单个样本、全部为 NaN
+    assert group_percentile(np.array([0]), np.array([7.0]), 1, 95)[0] == 7.0
+    assert np.isnan(group_percentile(np.array([0, 0]), np.array([np.nan, np.nan]), 1, 50)[0])
+
+    print("✅ 分组百分位数测试通过")
+
+def test_fleet_stats_sort():
+    """测试 sort=name 默认按名称升序，其余字段默认降序，以及 limit/hours 参数校验"""
+    print("🧪 开始测试服务器群统计排序...")
+    create_tables()
+
+    names = ['stats-c', 'stats-a', 'stats-b']
+    now = datetime.utcnow()
+    with app.app_context():
+        servers = [Server(name=name, host='127.0.0.1', port=22, username='test', password='test') for name in names]
+        db.session.add_all(servers)
+        db.session.commit()
+        ids = [server.id for server in servers]
+        for i, server_id in enumerate(ids):
+            db.session.add(ServerMetric(server_id=server_id, cpu_usage=10.0 * (i + 1), memory_usage=50.0,
+                                        disk_usage=40.0, load_average='0.00, 0.00, 0.00', timestamp=now))
+        db.session.commit()
+        admin_id = User.query.filter_by(username='admin').first().id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = admin_id
+    query = f"/api/fleet_stats?hours=1&ids={','.join(map(str, ids))}"
+
+    result = client.get(f'{query}&sort=name').get_json()
+    assert result['order'] == 'asc' and [s['name'] for s in result['servers']] == sorted(names)
+    result = client.get(f'{query}&sort=name&order=desc').get_json()
+    assert [s['name'] for s in result['servers']] == sorted(names, reverse=True)
+    result = client.get(f'{query}&sort=cpu_mean').get_json()
+    print(f"🔍 [DEBUG] 按CPU排序: {[(s['name'], s['cpu']['mean']) for s in result['servers']]}")
+    assert result['order'] == 'desc' and [s['name'] for s in result['servers']] == ['stats-b', 'stats-a', 'stats-c']
+    result = client.get(f'{query}&sort=cpu_mean&limit=2').get_json()
+    assert [s['name'] for s in result['servers']] == ['stats-b', 'stats-a']
+
+    # 无效的 limit/hours 返回 400，超过原始数据保留期的窗口按保留期计算
+    for params in ('limit=-3', 'limit=0', 'hours=0', 'hours=-1', 'hours=nan'):
+        assert client.get(f"/api/fleet_stats?ids={','.join(map(str, ids))}&{params}").status_code == 400, params
+    result = client.get(f"/api/fleet_stats?ids={','.join(map(str, ids))}&hours=1e12").get_json()
+    assert result['hours'] == Config.METRICS_RAW_RETENTION_DAYS * 24
+
+    with app.app_context():
+        ServerMetric.query.filter(ServerMetric.server_id.in_(ids)).delete()
+        Server.query.filter(Server.id.in_(ids)).delete()
+        db.session.commit()
+
+    print("✅ 服务器群统计排序测试通过")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试原始监控数据列式归档：归档范围、写入后读回的数值和历史接口的内存映射读取（使用 conftest.py 配置的临时数据库和归档目录）
+"""
+import os
+import random
+from datetime import datetime, timedelta
+from unittest import mock
+import numpy as np
+from app import app, create_tables
+from models import db, Server, ServerMetric
+import metrics_archive
+from metrics_archive import (archive_aged_metrics, archive_cutoff, archive_path, read_archived_arrays,
+                             ARCHIVE_COLUMNS)
+from server_monitor import get_server_metrics_history
+from config import Config
+
+def make_row(server_id, timestamp, rng):
+    return {
+        'server_id': server_id,
+        'cpu_usage': round(rng.uniform(0, 100), 2),
+        'memory_usage': round(rng.uniform(0, 100), 2),
+        'disk_usage': None if rng.random() < 0.1 else round(rng.uniform(0, 100), 2),
+        'cpu_iowait': round(rng.uniform(0, 30), 2),
+        'swap_usage': None if rng.random() < 0.5 else round(rng.uniform(0, 100), 2),
+        'load_average': '0.00, 0.00, 0.00',
+        'load1': round(rng.uniform(0, 64), 2),
+        'load5': round(rng.uniform(0, 64), 2),
+        'load15': round(rng.uniform(0, 64), 2),
+        'process_count': rng.randint(100, 5000),
+        'uptime_seconds': rng.randint(10 ** 6, 10 ** 9),
+        'net_rx_rate': None if rng.random() < 0.1 else round(rng.uniform(0, 10 ** 9), 2),
+        'net_tx_rate': round(rng.uniform(0, 10 ** 9), 2),
+        'disk_read_rate': round(rng.uniform(0, 10 ** 9), 2),
+        'disk_write_rate': round(rng.uniform(0, 10 ** 9), 2),
+        'disk_read_iops': round(rng.uniform(0, 10 ** 5), 2),
+        'disk_write_iops': round(rng.uniform(0, 10 ** 5), 2),
+        'timestamp': timestamp
+    }
+
+def test_metrics_archive():
+    """测试只归档超过原始数据保留期的完整自然日，读回的全部数值列与原始数据一致"""
+    print("🧪 开始测试监控数据列式归档...")
+    create_tables()
+
+    rng = random.Random(7)
+    now = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    cutoff = archive_cutoff(now)
+    assert cutoff <= now - timedelta(days=Config.METRICS_RAW_RETENTION_DAYS)
+
+    with app.app_context():
+        server = Server(name='archive-test', host='127.0.0.1', port=22, username='test', password='test')
+        db.session.add(server)
+        db.session.commit()
+        server_id = server.id
+
+        # 归档分界前两天（每5分钟一个样本）和分界之后的数据
+        old_rows = [make_row(server_id, cutoff - timedelta(days=2) + timedelta(minutes=5 * i, milliseconds=i), rng)
+                    for i in range(2 * 288)]
+        recent_rows = [make_row(server_id, cutoff + timedelta(minutes=5 * i), rng) for i in range(100)]
+        db.session.execute(ServerMetric.__table__.insert(), old_rows + recent_rows)
+        db.session.commit()
+
+        stats = archive_aged_metrics(now)
+        print(f"🔍 [DEBUG] 归档统计: {stats}")
+        assert stats['archived'] == len(old_rows) and stats['files'] == 2
+        assert os.path.exists(archive_path(server_id, (cutoff - timedelta(days=1)).date()))
+        # 分界之后（仍在原始数据保留期内）的数据留在数据库中
+        remaining = ServerMetric.query.filter_by(server_id=server_id).order_by(ServerMetric.timestamp).all()
+        assert [m.timestamp for m in remaining] == [row['timestamp'] for row in recent_rows]
+
+        # 读回归档：时间精确到毫秒，数值与原始数据一致（float32 精度），缺失值为 NaN
+        loads = []
+        real_load = np.load
+        with mock.patch.object(metrics_archive.np, 'load',
+                               lambda *args, **kwargs: loads.append(kwargs) or real_load(*args, **kwargs)):
+            timestamps, columns = read_archived_arrays(server_id, cutoff - timedelta(days=3))
+        assert loads and all(kwargs.get('mmap_mode') == 'r' for kwargs in loads)
+        assert [t.item() for t in timestamps] == [row['timestamp'] for row in old_rows]
+        for field in ARCHIVE_COLUMNS.values():
+            expected = np.array([np.nan if row[field] is None else row[field] for row in old_rows], dtype=float)
+            assert np.allclose(columns[field], expected, rtol=1e-6, equal_nan=True), field
+
+        # 按时间定位：after 为严格大于，start 为大于等于
+        middle = old_rows[300]['timestamp']
+        timestamps, _ = read_archived_arrays(server_id, middle)
+        assert timestamps[0].item() == middle and len(timestamps) == len(old_rows) - 300
+        timestamps, _ = read_archived_arrays(server_id, cutoff - timedelta(days=3), after=middle)
+        assert timestamps[0].item() == old_rows[301]['timestamp']
+
+        # 历史接口把归档数据和数据库数据按时间顺序拼接
+        hours = int((datetime.utcnow() - cutoff).total_seconds() / 3600) + 72
+        history = get_server_metrics_history(server_id, hours, points=100000)
+        assert [p['timestamp'] for p in history] == [row['timestamp'].isoformat() for row in old_rows + recent_rows]
+        # 吞吐在归档中为 float32，只保证7位有效数字
+        for field in ARCHIVE_COLUMNS.values():
+            expected = old_rows[10][field]
+            assert history[10][field] == expected or np.isclose(history[10][field], expected, rtol=1e-6), field
+            assert history[-1][field] == recent_rows[-1][field], field
+
+        # 重复归档不会产生重复数据
+        db.session.execute(ServerMetric.__table__.insert(), old_rows[:10])
+        db.session.commit()
+        archive_aged_metrics(now)
+        timestamps, _ = read_archived_arrays(server_id, cutoff - timedelta(days=3))
+        assert len(timestamps) == len(old_rows)
+
+        # 旧版本（只有 CPU/内存/磁盘三列）的归档文件：缺少的列读取为 NaN，再次归档时升级为当前格式
+        day = (cutoff - timedelta(days=5)).date()
+        legacy = np.zeros(2, dtype=[('t', '<u4'), ('cpu', '<f4'), ('memory', '<f4'), ('disk', '<f4')])
+        legacy['t'], legacy['cpu'] = [1000, 2000], [10.0, 20.0]
+        np.save(archive_path(server_id, day), legacy)
+        start = metrics_archive._day_start(day)
+        timestamps, columns = read_archived_arrays(server_id, start)
+        assert list(columns['cpu_usage'][:2]) == [10.0, 20.0] and np.isnan(columns['load1'][:2]).all()
+        db.session.execute(ServerMetric.__table__.insert(),
+                           [make_row(server_id, start + timedelta(seconds=3), rng)])
+        db.session.commit()
+        archive_aged_metrics(now)
+        upgraded = np.load(archive_path(server_id, day))
+        assert upgraded.dtype == metrics_archive.ARCHIVE_DTYPE and len(upgraded) == 3
+        assert upgraded['cpu'][0] == 10.0 and np.isnan(upgraded['load1'][0]) and not np.isnan(upgraded['load1'][2])
+
+        # 删除服务器时删除其归档目录，复用ID的新服务器读不到旧数据
+        metrics_archive.remove_server(server_id)
+        assert not os.path.exists(os.path.dirname(archive_path(server_id, day)))
+        assert len(read_archived_arrays(server_id, cutoff - timedelta(days=10))[0]) == 0
+
+        ServerMetric.query.filter_by(server_id=server_id).delete()
+        db.session.delete(db.session.get(Server, server_id))
+        db.session.commit()
+
+    print("✅ 监控数据列式归档测试通过")
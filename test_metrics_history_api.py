@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试历史监控数据接口的增量查询(since)和条件请求(ETag/304)（使用 conftest.py 配置的临时数据库）
+"""
+from datetime import datetime, timedelta
+from app import app, create_tables
+from models import db, Server, ServerMetric
+
+def add_metric(server_id, timestamp, cpu_usage):
+    db.session.add(ServerMetric(server_id=server_id, cpu_usage=cpu_usage, memory_usage=50.0, disk_usage=40.0,
+                                load_average='0.10, 0.10, 0.10', timestamp=timestamp))
+    db.session.commit()
+
+def test_metrics_history_api():
+    """测试没有新数据时返回304，since 只返回更新的数据"""
+    print("🧪 开始测试历史监控数据接口...")
+    create_tables()
+
+    now = datetime.utcnow().replace(microsecond=0)
+    with app.app_context():
+        server = Server(name='history-test', host='127.0.0.1', port=22, username='test', password='test')
+        db.session.add(server)
+        db.session.commit()
+        server_id = server.id
+        for i in range(10):
+            add_metric(server_id, now - timedelta(minutes=10 - i), float(i))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    url = f'/api/server_metrics_history/{server_id}?hours=1'
+
+    response = client.get(url)
+    assert response.status_code == 200
+    history = response.get_json()
+    etag = response.headers['ETag']
+    print(f"🔍 [DEBUG] 返回 {len(history)} 个点，ETag: {etag}")
+    assert [p['cpu_usage'] for p in history] == [float(i) for i in range(10)]
+
+    # 数据没有变化：条件请求返回304，增量请求同样返回304
+    last = history[-1]['timestamp']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(f'{url}&since={last}', headers={'If-None-Match': etag}).status_code == 304
+
+    # 写入新数据后 ETag 变化，since 只返回之后的数据
+    with app.app_context():
+        add_metric(server_id, now + timedelta(seconds=30), 10.0)
+        add_metric(server_id, now + timedelta(seconds=60), 11.0)
+    response = client.get(f'{url}&since={last}', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    newer = response.get_json()
+    print(f"🔍 [DEBUG] since={last} 返回: {newer}")
+    assert [p['cpu_usage'] for p in newer] == [10.0, 11.0]
+    assert all(p['timestamp'] > last for p in newer)
+
+    # 带时区的 since 按 UTC 解析，无效时间返回400
+    assert len(client.get(f"{url}&since={newer[0]['timestamp']}%2B00:00").get_json()) == 1
+    assert client.get(f'{url}&since=yesterday').status_code == 400
+
+    with app.app_context():
+        ServerMetric.query.filter_by(server_id=server_id).delete()
+        db.session.delete(db.session.get(Server, server_id))
+        db.session.commit()
+
+    print("✅ 历史监控数据接口测试通过")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试监控数据保留策略：分批删除过期数据和增量 VACUUM 归还空闲页（使用 conftest.py 配置的临时数据库）
+"""
+import time
+from unittest import mock
+from datetime import datetime, timedelta
+from app import app, create_tables
+from models import db, Server, ServerMetric
+import metrics_retention
+from metrics_retention import purge_expired_metrics, incremental_vacuum
+from config import Config
+
+def freelist_count():
+    return db.session.execute(db.text("PRAGMA freelist_count")).scalar()
+
+def test_metrics_retention():
+    """测试只删除过期数据，增量 VACUUM 分批归还全部空闲页"""
+    print("🧪 开始测试监控数据保留策略...")
+    create_tables()
+
+    now = datetime.utcnow()
+    with app.app_context():
+        server = Server(name='retention-test', host='127.0.0.1', port=22, username='test', password='test')
+        db.session.add(server)
+        db.session.commit()
+        server_id = server.id
+
+        expired_at = now - timedelta(days=Config.METRICS_RAW_RETENTION_DAYS + 3)
+        rows = [{'server_id': server_id, 'cpu_usage': 1.0, 'memory_usage': 2.0, 'disk_usage': 3.0,
+                 'load_average': '0.00, 0.00, 0.00', 'timestamp': expired_at + timedelta(seconds=i)}
+                for i in range(20000)]
+        rows += [{'server_id': server_id, 'cpu_usage': 1.0, 'memory_usage': 2.0, 'disk_usage': 3.0,
+                  'load_average': '0.00, 0.00, 0.00', 'timestamp': now - timedelta(minutes=i)}
+                 for i in range(10)]
+        db.session.execute(ServerMetric.__table__.insert(), rows)
+        db.session.commit()
+        assert db.session.execute(db.text("PRAGMA auto_vacuum")).scalar() == 2
+
+        started = time.monotonic()
+        stats = purge_expired_metrics(now, chunk_size=5000, pause=0)
+        elapsed = time.monotonic() - started
+        print(f"🔍 [DEBUG] 清理统计: {stats}，耗时 {elapsed:.2f}s")
+        assert stats['raw_deleted'] == 20000 and stats['chunks'] >= 4
+        assert ServerMetric.query.filter_by(server_id=server_id).count() == 10
+        assert stats['pages_freed'] > 0 and freelist_count() == 0
+        assert elapsed < 10
+
+        # 每批最多归还 max_pages 页，分多批直到空闲页全部归还
+        db.session.execute(ServerMetric.__table__.insert(), rows[:20000])
+        db.session.commit()
+        ServerMetric.query.filter(ServerMetric.timestamp < now - timedelta(days=1)).delete()
+        db.session.commit()
+        free_pages = freelist_count()
+        assert free_pages > 100
+        pauses = []
+        with mock.patch.object(metrics_retention.time, 'sleep', pauses.append):
+            assert incremental_vacuum(max_pages=50, pause=0.01) == free_pages
+        print(f"🔍 [DEBUG] 归还 {free_pages} 页，暂停 {len(pauses)} 次")
+        assert freelist_count() == 0
+        assert len(pauses) == (free_pages - 1) // 50
+
+        ServerMetric.query.filter_by(server_id=server_id).delete()
+        db.session.delete(db.session.get(Server, server_id))
+        db.session.commit()
+
+    print("✅ 监控数据保留策略测试通过")
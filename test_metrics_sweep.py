@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试并发采集：整轮截止时间到达后返回部分结果，未完成的服务器标记为 timeout 且不修改状态（使用临时数据库，不连接真实服务器）
+"""
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+from app import app, create_tables
+from models import db, Server, ServerMetric, ServerMetricRollup
+from server_monitor import ServerMonitor, collect_all_servers_metrics
+
+def make_sample():
+    return {'cpu_usage': 12.5, 'memory_usage': 50.0, 'disk_usage': 40.0, 'load_average': '0.50, 0.40, 0.30',
+            'timestamp': datetime.utcnow()}
+
+def test_sweep_deadline():
+    """测试一台服务器卡住时，整轮采集在 sweep_timeout 后返回其他服务器的结果"""
+    print("🧪 开始测试并发采集截止时间...")
+    create_tables()
+    release_slow = threading.Event()
+
+    def fake_sample_metrics(monitor):
+        if monitor.server.name == 'sweep-slow':
+            release_slow.wait(5)
+            return make_sample()
+        if monitor.server.name == 'sweep-down':
+            monitor.last_error = '连接失败: 连接被拒绝'
+            return None
+        return make_sample()
+
+    with app.app_context():
+        servers = [Server(name=name, host='127.0.0.1', port=22, username='test', password='test', status='online')
+                   for name in ('sweep-fast', 'sweep-down', 'sweep-slow')]
+        db.session.add_all(servers)
+        db.session.commit()
+        fast, down, slow = servers
+        ids = [server.id for server in servers]
+
+        started = time.monotonic()
+        with mock.patch.object(ServerMonitor, 'sample_metrics', fake_sample_metrics):
+            sweep = collect_all_servers_metrics(servers=servers, host_timeout=5, sweep_timeout=0.3)
+        elapsed = time.monotonic() - started
+        release_slow.set()
+        print(f"🔍 [DEBUG] 采集结果: {sweep['hosts']}, 耗时 {elapsed:.2f} 秒")
+
+        # 不等待卡住的服务器
+        assert elapsed < 2
+        assert sweep['hosts'][fast.id]['status'] == 'online' and sweep['results'][fast.id]['cpu_usage'] == 12.5
+        assert sweep['hosts'][down.id] == {'status': 'offline', 'elapsed_ms': mock.ANY,
+                                           'error': '连接失败: 连接被拒绝'}
+        assert sweep['hosts'][slow.id]['status'] == 'timeout' and sweep['results'][slow.id] is None
+
+        # 已完成的结果写入数据库；超时的服务器不写入样本，状态保持不变
+        db.session.expire_all()
+        assert db.session.get(Server, fast.id).status == 'online'
+        assert db.session.get(Server, down.id).status == 'offline'
+        assert db.session.get(Server, slow.id).status == 'online'
+        assert ServerMetric.query.filter_by(server_id=fast.id).count() == 1
+        assert ServerMetric.query.filter_by(server_id=slow.id).count() == 0
+
+        ServerMetric.query.filter(ServerMetric.server_id.in_(ids)).delete()
+        ServerMetricRollup.query.filter(ServerMetricRollup.server_id.in_(ids)).delete()
+        Server.query.filter(Server.id.in_(ids)).delete()
+        db.session.commit()
+
+    print("✅ 并发采集截止时间测试通过")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+测试删除服务器时一并删除监控数据、汇总、GPU数据、按用户资源统计和归档文件（使用 conftest.py 配置的临时数据库，需通过 pytest 运行）
+"""
+import os
+from datetime import datetime
+from app import app, create_tables
+from models import db, User, Server, ServerMetric, ServerMetricRollup, ServerGpuMetric, ServerUserUsage
+from metrics_archive import archive_path
+
+def test_delete_server_with_metrics():
+    """测试删除有监控数据的服务器不会因 NOT NULL 外键失败，且不留下孤立数据"""
+    print("🧪 开始测试删除有监控数据的服务器...")
+    create_tables()
+
+    now = datetime.utcnow()
+    with app.app_context():
+        server = Server(name='delete-test', host='127.0.0.1', port=22, username='test', password='test')
+        db.session.add(server)
+        db.session.commit()
+        server_id = server.id
+        db.session.add(ServerMetric(server_id=server_id, cpu_usage=10.0, memory_usage=50.0, disk_usage=40.0,
+                                    load_average='0.00, 0.00, 0.00', timestamp=now))
+        db.session.add(ServerMetricRollup(server_id=server_id, resolution=60, bucket_start=now, sample_count=1))
+        db.session.add(ServerGpuMetric(server_id=server_id, gpu_index=0, utilization=97.0, memory_used=38120.0,
+                                       memory_total=40960.0, temperature=71.0, timestamp=now))
+        db.session.add(ServerUserUsage(server_id=server_id, username='alice', cpu_percent=250.0, memory_percent=10.5,
+                                       rss_kb=1000000, process_count=2, timestamp=now))
+        db.session.commit()
+        admin_id = User.query.filter_by(username='admin').first().id
+
+        archive_file = archive_path(server_id, now.date())
+        os.makedirs(os.path.dirname(archive_file), exist_ok=True)
+        open(archive_file, 'wb').close()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = admin_id
+    response = client.post('/admin/servers', data={'action': 'delete', 'server_id': server_id})
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert db.session.get(Server, server_id) is None
+        for model in (ServerMetric, ServerMetricRollup, ServerGpuMetric, ServerUserUsage):
+            assert model.query.filter_by(server_id=server_id).count() == 0, model.__tablename__
+        assert not os.path.exists(os.path.dirname(archive_file))
+
+    print("✅ 删除有监控数据的服务器测试通过")
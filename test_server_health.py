@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试服务器连接熔断器的状态转换（使用很短的退避时间，不连接真实服务器）
+"""
+import time
+from types import SimpleNamespace
+from server_health import ServerHealthRegistry, ServerUnavailableError, CLOSED, OPEN, HALF_OPEN
+
+SERVER = SimpleNamespace(id=1, name='gpu01')
+
+def is_short_circuited(registry):
+    try:
+        registry.before_connect(SERVER)
+        return False
+    except ServerUnavailableError:
+        return True
+
+def test_circuit_breaker():
+    """测试 closed -> open -> half-open -> closed/open"""
+    print("🧪 开始测试服务器连接熔断器...")
+
+    registry = ServerHealthRegistry(failure_threshold=2, base_backoff=0.05, max_backoff=0.2)
+
+    # 未达到失败次数时保持 closed
+    registry.record_failure(SERVER.id, '连接超时')
+    assert registry.status(SERVER.id)['state'] == CLOSED
+    assert not is_short_circuited(registry)
+
+    # 连续失败 2 次后 open，连接被短路
+    registry.record_failure(SERVER.id, '连接超时')
+    status = registry.status(SERVER.id)
+    print(f"🔍 [DEBUG] 熔断状态: {status}")
+    assert status['state'] == OPEN and status['failures'] == 2 and status['last_error'] == '连接超时'
+    assert is_short_circuited(registry)
+
+    # 退避到期后 half-open，只放行一次探测
+    time.sleep(0.06)
+    assert not is_short_circuited(registry)
+    assert registry.status(SERVER.id)['state'] == HALF_OPEN
+    assert is_short_circuited(registry)
+
+    # 探测失败：退避时间翻倍后重新 open
+    registry.record_failure(SERVER.id, '连接被拒绝')
+    assert registry.status(SERVER.id)['state'] == OPEN
+    time.sleep(0.06)
+    assert is_short_circuited(registry)
+    time.sleep(0.05)
+    assert not is_short_circuited(registry)
+
+    # 探测成功：恢复 closed 并清零失败次数
+    registry.record_success(SERVER.id)
+    assert registry.status(SERVER.id) == {'state': CLOSED, 'failures': 0, 'retry_in': 0, 'last_error': None}
+    assert not is_short_circuited(registry)
+
+    # 修改服务器配置后立即清除熔断状态
+    registry.record_failure(SERVER.id)
+    registry.record_failure(SERVER.id)
+    assert registry.is_open(SERVER.id)
+    registry.reset(SERVER.id)
+    assert not registry.is_open(SERVER.id) and not is_short_circuited(registry)
+
+    print("✅ 服务器连接熔断器测试通过")
+
+if __name__ == "__main__":
+    test_circuit_breaker()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+测试服务器软硬件信息一次性采集（使用预先录制的采集脚本输出，不连接真实服务器）
+"""
+import json
+from types import SimpleNamespace
+from server_monitor import ServerMonitor
+from server_inventory import parse_inventory, build_inventory_command
+
+DMIDECODE_OUTPUT = """Handle 0x0040, DMI type 17, 84 bytes
+Memory Device
+	Size: 32 GB
+	Manufacturer: Samsung
+	Part Number: M393A4K40EB3-CWE
+
+Handle 0x0041, DMI type 17, 84 bytes
+Memory Device
+	Size: No Module Installed
+
+Handle 0x0042, DMI type 17, 84 bytes
+Memory Device
+	Size: 32768 MB
+	Manufacturer: Samsung
+	Part Number: M393A4K40EB3-CWE
+"""
+
+INVENTORY = {
+    'version': 1,
+    'os': 'Linux',
+    'hostname': 'gpu01',
+    'kernel': '5.15.0-91-generic',
+    'arch': 'x86_64',
+    'os_release': 'Ubuntu 22.04.3 LTS',
+    'cpu_model': 'Intel(R) Xeon(R) Gold 6330 CPU @ 2.00GHz',
+    'cpu_count': '112',
+    'mem_total_kb': '528000000',
+    'dmidecode': {'available': True, 'output': DMIDECODE_OUTPUT},
+    'dmi_vendor': 'Supermicro',
+    'dmi_product': 'SYS-420GP-TNR',
+    'gpus': ['NVIDIA A100-SXM4-80GB'] * 4,
+    'vga': None,
+    'lsblk': {'blockdevices': [
+        {'name': 'nvme0n1', 'model': 'Samsung SSD 980 PRO 2TB', 'vendor': None, 'type': 'disk', 'size': 2000398934016},
+        {'name': 'sda', 'model': 'ST8000NM000A-2KE1', 'vendor': 'ATA', 'type': 'disk', 'size': 8001563222016},
+        {'name': 'sr0', 'model': None, 'vendor': None, 'type': 'rom', 'size': 1073741312},
+    ]},
+}
+
+class FakeMonitor(ServerMonitor):
+    """用录制的输出代替SSH命令，记录执行过的命令"""
+
+    def __init__(self, inventory_output):
+        super().__init__(SimpleNamespace(id=1, name='gpu01', password=None))
+        self.ssh_client = object()
+        self.inventory_output = inventory_output
+        self.commands = []
+
+    def execute_command(self, command, timeout=None):
+        self.commands.append(command)
+        if command == build_inventory_command():
+            return self.inventory_output
+        return None
+
+def test_server_inventory():
+    """测试采集脚本输出解析和逐项检测补齐"""
+    print("🧪 开始测试服务器信息采集...")
+
+    info, missing = parse_inventory(json.dumps(INVENTORY))
+    print(f"🔍 [DEBUG] 解析结果: {info}")
+    assert missing == set()
+    assert info['hostname'] == 'gpu01' and info['system_version'] == 'Ubuntu 22.04.3 LTS'
+    assert info['cpu_count'] == 112
+    assert info['memory_count'] == 64 and info['memory_model'] == 'Samsung M393A4K40EB3-CWE 32GB 和其他'
+    assert info['gpu_model'] == 'NVIDIA A100-SXM4-80GB' and info['gpu_count'] == 4
+    # lsblk -J 中带空格的型号完整保留，非磁盘设备忽略
+    assert info['ssd_model'] == 'Samsung SSD 980 PRO 2TB 1TB 和其他'
+    assert info['ssd_count'] == 1863 + 7452
+
+    # 完整信息只需要一次SSH调用
+    monitor = FakeMonitor(json.dumps(INVENTORY))
+    complete_info = monitor.get_complete_info()
+    assert len(monitor.commands) == 1 and 'os' not in complete_info
+
+    # dmidecode 需要sudo密码时，内存信息用原有方法补齐
+    inventory = dict(INVENTORY, dmidecode={'available': True, 'output': None})
+    assert parse_inventory(json.dumps(inventory))[1] == {'memory'}
+
+    # 没有 dmidecode 时按 free -g 口径计算总容量，型号取 DMI 厂商信息
+    inventory = dict(INVENTORY, dmidecode={'available': False, 'output': None})
+    info, missing = parse_inventory(json.dumps(inventory))
+    assert missing == set() and info['memory_count'] == 503
+    assert info['memory_model'] == 'Supermicro SYS-420GP-TNR Memory'
+
+    # 远端没有 Python 或输出无法解析时返回 None，由调用方回退到逐项检测
+    assert parse_inventory('') == (None, None)
+    assert parse_inventory('python3: command not found') == (None, None)
+
+    print("✅ 服务器信息采集测试通过")
+
+if __name__ == "__main__":
+    test_server_inventory()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+测试私钥加载：解析结果按修改时间缓存，无法识别的密钥统一抛出 ValueError（使用临时生成的密钥文件）
+"""
+import os
+import tempfile
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, ed448
+from ssh_keys import load_private_key, key_cache_stats, clear_key_cache
+
+def write_key(path, private_key, private_format):
+    with open(path, 'wb') as f:
+        f.write(private_key.private_bytes(serialization.Encoding.PEM, private_format,
+                                          serialization.NoEncryption()))
+
+def test_load_private_key():
+    """测试私钥缓存命中，以及不支持的密钥类型返回 ValueError"""
+    print("🧪 开始测试私钥加载...")
+    clear_key_cache()
+    key_dir = tempfile.mkdtemp()
+
+    key_path = os.path.join(key_dir, 'id_ed25519')
+    write_key(key_path, ed25519.Ed25519PrivateKey.generate(), serialization.PrivateFormat.OpenSSH)
+    before = key_cache_stats()
+    key = load_private_key(key_path)
+    assert key.get_name() == 'ssh-ed25519'
+    assert load_private_key(key_path) is key
+    stats = key_cache_stats()
+    print(f"🔍 [DEBUG] 私钥缓存: {stats}")
+    assert stats['misses'] == before['misses'] + 1 and stats['hits'] == before['hits'] + 1
+
+    # paramiko 不支持的密钥类型（UnknownKeyType）、无效文件和不存在的文件
+    unsupported_path = os.path.join(key_dir, 'id_ed448')
+    write_key(unsupported_path, ed448.Ed448PrivateKey.generate(), serialization.PrivateFormat.PKCS8)
+    invalid_path = os.path.join(key_dir, 'invalid')
+    with open(invalid_path, 'w') as f:
+        f.write('not a key\n')
+    for path in (unsupported_path, invalid_path, os.path.join(key_dir, 'missing')):
+        try:
+            load_private_key(path)
+            assert False, f'应当抛出 ValueError: {path}'
+        except ValueError:
+            pass
+
+    clear_key_cache()
+    print("✅ 私钥加载测试通过")
+
+if __name__ == "__main__":
+    test_load_private_key()
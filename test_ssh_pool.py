@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+测试SSH连接池的复用、失效连接延迟关闭、连接参数变化、等待截止时间和空闲回收（使用假的 SSHClient，不连接真实服务器）
+"""
+import threading
+import time
+from types import SimpleNamespace
+from ssh_pool import SSHConnectionPool
+from server_health import server_health
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        pass
+
+class FakeClient:
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.closed = True
+        self.transport.active = False
+
+def make_pool(idle_timeout=300, connect_delay=0):
+    """返回连接池和其新建的客户端列表，新建连接耗时 connect_delay 秒"""
+    pool = SSHConnectionPool(idle_timeout=idle_timeout, keepalive_interval=0)
+    opened = []
+
+    def fake_open(server, timeout, extra_params):
+        time.sleep(connect_delay)
+        client = FakeClient()
+        opened.append(client)
+        return client
+
+    pool._open = fake_open
+    return pool, opened
+
+def make_server(server_id, password='test'):
+    server_health.reset(server_id)
+    return SimpleNamespace(id=server_id, name=f'gpu{server_id:02d}', host='127.0.0.1', port=22,
+                           username='test', password=password)
+
+def test_reuse_and_deferred_close():
+    """测试连接复用，以及被丢弃的连接等最后一个使用方归还后才关闭"""
+    print("🧪 开始测试连接复用和延迟关闭...")
+    pool, opened = make_pool()
+    server = make_server(901)
+
+    first = pool.acquire(server)
+    second = pool.acquire(server)
+    assert first is second and len(opened) == 1
+    assert pool.stats()['in_use'] == 1 and pool.stats_counters['reused'] == 1
+
+    # 一个使用方报告连接损坏：移出连接池，但另一个使用方仍在使用，暂不关闭
+    pool.release(server, broken=True, client=first)
+    assert not first.closed and pool.stats()['retired'] == 1
+    # 下一次获取重新握手
+    third = pool.acquire(server)
+    assert third is not first and len(opened) == 2
+    # 最后一个使用方归还旧连接后关闭
+    pool.release(server, client=second)
+    assert first.closed and pool.stats()['retired'] == 0
+    pool.release(server, client=third)
+    assert not third.closed
+
+    pool.close_all()
+    assert third.closed
+    print("✅ 连接复用和延迟关闭测试通过")
+
+def test_fingerprint_change():
+    """测试服务器凭据变化后旧连接被替换，正在使用的旧连接归还后关闭"""
+    print("🧪 开始测试连接参数变化...")
+    pool, opened = make_pool()
+    server = make_server(902)
+
+    old = pool.acquire(server)
+    server.password = 'changed'
+    new = pool.acquire(server)
+    assert new is not old and len(opened) == 2
+    assert not old.closed
+    pool.release(server, client=old)
+    assert old.closed
+    pool.release(server, client=new)
+    assert not new.closed
+
+    # 连接已断开时同样重新握手
+    new.transport.active = False
+    assert pool.acquire(server) is not new and new.closed
+    pool.close_all()
+    print("✅ 连接参数变化测试通过")
+
+def test_lock_wait_deadline():
+    """测试同一服务器的握手进行中时，其他调用方最多等待到截止时间，超时计入熔断器"""
+    print("🧪 开始测试等待连接的截止时间...")
+    pool, opened = make_pool(connect_delay=0.5)
+    server = make_server(903)
+
+    slow = threading.Thread(target=pool.acquire, args=(server,))
+    slow.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    try:
+        pool.acquire(server, timeout=5, deadline=time.monotonic() + 0.1)
+        assert False, '应当抛出 TimeoutError'
+    except TimeoutError:
+        pass
+    elapsed = time.monotonic() - started
+    print(f"🔍 [DEBUG] 等待 {elapsed:.2f} 秒后超时")
+    assert elapsed < 0.4
+    assert server_health.status(server.id)['failures'] == 1
+
+    # 截止时间已过时直接失败，不等待锁
+    try:
+        pool.acquire(server, deadline=time.monotonic() - 1)
+        assert False, '应当抛出 TimeoutError'
+    except TimeoutError:
+        pass
+
+    slow.join()
+    assert len(opened) == 1
+    pool.close_all()
+    server_health.reset(server.id)
+    print("✅ 等待连接的截止时间测试通过")
+
+def test_idle_eviction():
+    """测试空闲回收只关闭没有使用方的连接，回收后再次获取会重新握手"""
+    print("🧪 开始测试空闲连接回收...")
+    pool, opened = make_pool(idle_timeout=0.05)
+    server = make_server(904)
+
+    client = pool.acquire(server)
+    time.sleep(0.1)
+    # 使用中的连接即使超过空闲时间也不回收
+    assert pool.evict_idle() == 0 and not client.closed
+    pool.release(server, client=client)
+
+    time.sleep(0.1)
+    # acquire 先回收空闲连接，再新建连接
+    new = pool.acquire(server)
+    assert client.closed and new is not client and len(opened) == 2
+    assert pool.stats_counters['evicted'] == 1
+    pool.release(server, client=new)
+    pool.close_all()
+    print("✅ 空闲连接回收测试通过")
+
+if __name__ == "__main__":
+    test_reuse_and_deferred_close()
+    test_fingerprint_change()
+    test_lock_wait_deadline()
+    test_idle_eviction()
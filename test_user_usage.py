@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试按用户资源统计：ps / nvidia-smi 输出解析和服务器账户到系统用户的关联（使用 conftest.py 配置的临时数据库）
+"""
+from datetime import datetime
+from app import app, create_tables
+from models import db, User, Server, Application, ApplicationBatch, PermissionType, ServerUserUsage
+from server_monitor import parse_probe_metrics, parse_user_usage, get_server_user_usage
+
+# ps -eo user:64,pid,pcpu,pmem,rss --no-headers
+PS_OUTPUT = """root           1  0.1  0.1   5000
+alice        101 250.0 10.5 1000000
+alice        102 50.0  1.0  10000
+bob          200  5.0  2.0  20000
+carol        300  0.0  0.5   3000
+"""
+
+# nvidia-smi --query-compute-apps=pid,used_memory --format=csv,noheader,nounits
+GPU_APPS_OUTPUT = """101, 10240
+300, 2048
+999, 512
+"""
+
+def test_user_usage(probe_output):
+    """测试按用户汇总进程和显存占用"""
+    print("🧪 开始测试按用户资源统计...")
+
+    users = parse_user_usage(PS_OUTPUT.splitlines(), GPU_APPS_OUTPUT.splitlines(), top=2)
+    for usage in users:
+        print(f"🔍 [DEBUG] {usage}")
+
+    assert [u['username'] for u in users] == ['alice', 'bob', 'carol']
+    assert users[0]['cpu_percent'] == 300.0 and users[0]['process_count'] == 2
+    assert users[0]['rss_kb'] == 1010000 and users[0]['gpu_memory'] == 10240.0
+    # carol 的CPU排不进前2，但占用显存，仍然保留
+    assert users[2]['gpu_memory'] == 2048.0
+
+    # 采集脚本中包含 ps 段时解析 user_usage，否则为 None
+    metrics = parse_probe_metrics(probe_output + "@@ps\n" + PS_OUTPUT + "@@gpuapps\n" + GPU_APPS_OUTPUT)
+    assert metrics['user_usage'][0]['username'] == 'alice'
+    assert parse_probe_metrics(probe_output)['user_usage'] is None
+
+    print("✅ 按用户资源统计测试通过")
+
+def test_user_usage_owners():
+    """测试账户关联：明确的 server_username、未指定时的系统用户名和按姓名生成的用户名"""
+    print("🧪 开始测试服务器账户关联...")
+    create_tables()
+
+    with app.app_context():
+        server = Server(name='usage-test', host='127.0.0.1', port=22, username='test', password='test')
+        other = Server(name='usage-other', host='127.0.0.2', port=22, username='test', password='test')
+        db.session.add_all([server, other])
+        db.session.flush()
+        permission = PermissionType.query.first()
+
+        def add_user(username, name, server_id, server_username, status='approved'):
+            user = User(username=username, name=name)
+            user.set_password('test')
+            db.session.add(user)
+            db.session.flush()
+            batch = ApplicationBatch(user_id=user.id, server_id=server_id)
+            db.session.add(batch)
+            db.session.flush()
+            db.session.add(Application(batch_id=batch.id, user_id=user.id, server_id=server_id,
+                                       permission_type_id=permission.id, status=status,
+                                       server_username=server_username))
+            return user
+
+        explicit = add_user('u_explicit', '王五', server.id, 'alice')
+        by_username = add_user('bob', '鲍勃', server.id, None)
+        by_name = add_user('u_generated', '张伟', server.id, '')
+        add_user('carol', '卡罗', other.id, None)  # 其他服务器上未指定账户名的申请不参与关联
+        add_user('dave', '戴夫', server.id, None, status='pending')
+
+        timestamp = datetime.utcnow()
+        for username in ('alice', 'bob', 'zhangw', 'carol', 'dave', 'root'):
+            db.session.add(ServerUserUsage(server_id=server.id, username=username, cpu_percent=1.0,
+                                           memory_percent=1.0, rss_kb=1, process_count=1, timestamp=timestamp))
+        db.session.commit()
+
+        usage = get_server_user_usage(server.id)
+        owners = {row['username']: row['user'] and row['user']['username'] for row in usage['users']}
+        print(f"🔍 [DEBUG] 账户关联: {owners}")
+        assert owners == {'alice': explicit.username, 'bob': by_username.username, 'zhangw': by_name.username,
+                          'carol': None, 'dave': None, 'root': None}
+
+        user_ids = [a.user_id for a in Application.query.filter(Application.server_id.in_([server.id, other.id]))]
+        ServerUserUsage.query.filter_by(server_id=server.id).delete()
+        Application.query.filter(Application.user_id.in_(user_ids)).delete()
+        ApplicationBatch.query.filter(ApplicationBatch.user_id.in_(user_ids)).delete()
+        User.query.filter(User.id.in_(user_ids)).delete()
+        db.session.delete(server)
+        db.session.delete(other)
+        db.session.commit()
+
+    print("✅ 服务器账户关联测试通过")
@@ -0,0 +1,11 @@
+"""
+WSGI 入口
+供 gunicorn、waitress 等服务器加载应用，例如: gunicorn -k gthread --threads 16 wsgi:app
+与 python app.py 一样在本进程启动后台采集调度器，多个 worker 进程由采集锁保证只有一个在采集。
+首次部署前先创建数据库表: python -c "from app import create_tables; create_tables()"
+"""
+
+from app import app
+from metrics_scheduler import start_metrics_scheduler
+
+start_metrics_scheduler(app)